@@ -0,0 +1,78 @@
+"""Benchmark header parsing and serialisation in :mod:`age.format` for growing stanza counts
+
+Prints the time to load and dump a header with 1, 100, 1,000 and 10,000 stanzas of each shape:
+``X25519`` (one argument, one body line) and ``ssh-rsa`` (one argument, six body lines).
+
+Usage: python benchmarks/format_benchmark.py [--max-stanzas 10000] [--rounds 5]
+"""
+
+import argparse
+import io
+import os
+import time
+
+from age.format import Header, Recipient, dump_header, load_header
+from age.primitives.encode import encode
+
+DEFAULT_COUNTS = [1, 100, 1_000, 10_000]
+
+# sizes of the raw argument and body of each stanza shape
+STANZA_SHAPES = {"X25519": (32, 32), "ssh-rsa": (4, 256)}
+
+
+def _header_bytes(stanza_type: str, count: int) -> bytes:
+    argument_size, body_size = STANZA_SHAPES[stanza_type]
+    recipients = [
+        Recipient(
+            stanza_type.encode("ascii"),
+            [encode(os.urandom(argument_size)).encode("ascii")],
+            encode(os.urandom(body_size)).encode("ascii"),
+        )
+        for _ in range(count)
+    ]
+
+    stream = io.BytesIO()
+    dump_header(Header(recipients), stream, mac=os.urandom(32))
+    stream.write(b"\n")
+    return stream.getvalue()
+
+
+def _best_of(rounds: int, func, *args) -> float:
+    durations = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func(*args)
+        durations.append(time.perf_counter() - start)
+    return min(durations)
+
+
+def run(max_stanzas: int, rounds: int) -> None:
+    print(f"{'type':>8} {'stanzas':>8} {'size':>10} {'load':>10} {'dump':>10} {'us/stanza':>10}")
+    for stanza_type in STANZA_SHAPES:
+        for count in DEFAULT_COUNTS:
+            if count > max_stanzas:
+                break
+
+            data = _header_bytes(stanza_type, count)
+            header, mac = load_header(io.BytesIO(data))
+
+            load = _best_of(rounds, lambda: load_header(io.BytesIO(data)))
+            dump = _best_of(rounds, lambda: dump_header(header, io.BytesIO(), mac))
+
+            print(
+                f"{stanza_type:>8} {count:>8} {len(data):>10} {1000 * load:>8.2f}ms "
+                + f"{1000 * dump:>8.2f}ms {1e6 * load / count:>10.2f}"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--max-stanzas", type=int, default=10_000, help="Largest number of stanzas")
+    parser.add_argument("--rounds", type=int, default=5, help="Best of this many runs")
+    args = parser.parse_args()
+
+    run(args.max_stanzas, args.rounds)
+
+
+if __name__ == "__main__":
+    main()
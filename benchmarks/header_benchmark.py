@@ -0,0 +1,67 @@
+"""Benchmark header generation in :func:`age.file.write_header` for growing recipient lists
+
+Prints the time to wrap the file key for 1, 100 and 10,000 recipients of each key type, with
+the given number of worker threads.
+
+Usage: python benchmarks/header_benchmark.py [--max-recipients 10000] [--workers 1] [--rsa]
+"""
+
+import argparse
+import io
+import os
+import time
+
+from age.file import write_header
+from age.keys.agekey import AgePrivateKey
+from age.keys.ed25519 import Ed25519PrivateKey
+from age.keys.rsa import RSAPrivateKey
+
+DEFAULT_COUNTS = [1, 100, 10_000]
+
+
+def _public_keys(key_type: str, count: int) -> list:
+    # key generation is not what is measured, so a handful of keys is repeated
+    if key_type == "x25519":
+        keys = [AgePrivateKey.generate().public_key() for _ in range(8)]
+    elif key_type == "ssh-ed25519":
+        keys = [Ed25519PrivateKey.generate().public_key() for _ in range(8)]
+    else:
+        keys = [RSAPrivateKey.generate(2048).public_key() for _ in range(2)]
+    return [keys[i % len(keys)] for i in range(count)]
+
+
+def run(max_recipients: int, workers: int, key_types: list) -> None:
+    file_key = os.urandom(16)
+
+    print(f"{'type':>12} {'recipients':>10} {'total':>10} {'per stanza':>12}")
+    for key_type in key_types:
+        for count in DEFAULT_COUNTS:
+            if count > max_recipients:
+                break
+
+            keys = _public_keys(key_type, count)
+            start = time.perf_counter()
+            write_header(keys, file_key, io.BytesIO(), workers=workers)
+            duration = time.perf_counter() - start
+
+            print(
+                f"{key_type:>12} {count:>10} {1000 * duration:>8.1f}ms "
+                + f"{1e6 * duration / count:>10.1f}us"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--max-recipients", type=int, default=10_000, help="Largest number of recipients"
+    )
+    parser.add_argument("--workers", type=int, default=1, help="Number of threads")
+    parser.add_argument("--rsa", action="store_true", help="Include (slow) ssh-rsa recipients")
+    args = parser.parse_args()
+
+    key_types = ["x25519", "ssh-ed25519"] + (["ssh-rsa"] if args.rsa else [])
+    run(args.max_recipients, args.workers, key_types)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Benchmark unwrapping the file key from many X25519 stanzas with many identities
+
+X25519 stanzas carry no fingerprint, so every (stanza, identity) pair may have to be tried. The
+matching identity is the last one and its stanza is the last one in the header, the worst case.
+
+Usage: python benchmarks/identity_benchmark.py [--stanzas 50] [--identities 500] [--workers 1 4]
+"""
+
+import argparse
+import os
+import time
+
+from age.keys.agekey import AgePrivateKey
+from age.recipients.helpers import IdentityStore, decrypt_file_key
+from age.recipients.x25519 import X25519Recipient
+
+
+def run(stanzas: int, identities: int, workers: list) -> None:
+    file_key = os.urandom(16)
+
+    others = [AgePrivateKey.generate() for _ in range(stanzas - 1)]
+    identity = AgePrivateKey.generate()
+    recipients = [X25519Recipient.generate(key.public_key(), file_key) for key in others]
+    recipients.append(X25519Recipient.generate(identity.public_key(), file_key))
+
+    store = IdentityStore([AgePrivateKey.generate() for _ in range(identities - 1)] + [identity])
+
+    print(f"{stanzas} stanzas x {identities} identities = {stanzas * identities} attempts")
+    print(f"{'workers':>8} {'total':>10} {'per attempt':>12}")
+    for count in workers:
+        start = time.perf_counter()
+        assert decrypt_file_key(recipients, store, workers=count) == file_key
+        duration = time.perf_counter() - start
+
+        print(
+            f"{count:>8} {1000 * duration:>8.0f}ms "
+            + f"{1e6 * duration / (stanzas * identities):>10.1f}us"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stanzas", type=int, default=50, help="Number of X25519 stanzas")
+    parser.add_argument("--identities", type=int, default=500, help="Number of identities")
+    parser.add_argument(
+        "--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1], help="Thread counts"
+    )
+    args = parser.parse_args()
+
+    run(args.stanzas, args.identities, args.workers)
+
+
+if __name__ == "__main__":
+    main()
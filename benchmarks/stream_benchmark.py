@@ -0,0 +1,67 @@
+"""Benchmark payload encryption and decryption in :mod:`age.stream` for growing input sizes
+
+Prints the throughput for each size; with linear scaling, the time per MiB stays constant.
+
+Usage: python benchmarks/stream_benchmark.py [--max-size 4G] [--workers 1]
+"""
+
+import argparse
+import os
+import time
+
+from age.stream import stream_decrypt, stream_encrypt
+
+MiB = 1024 * 1024
+GiB = 1024 * MiB
+
+DEFAULT_SIZES = [1 * MiB, 4 * MiB, 16 * MiB, 64 * MiB, 256 * MiB, 1 * GiB, 4 * GiB]
+
+
+def _parse_size(value: str) -> int:
+    units = {"K": 1024, "M": MiB, "G": GiB}
+    value = value.strip().upper()
+    if value and value[-1] in units:
+        return int(value[:-1]) * units[value[-1]]
+    return int(value)
+
+
+def _measure(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def run(max_size: int, workers: int) -> None:
+    key = os.urandom(32)
+
+    print(f"{'size':>10} {'encrypt':>10} {'ms/MiB':>8} {'decrypt':>10} {'ms/MiB':>8}")
+    for size in DEFAULT_SIZES:
+        if size > max_size:
+            break
+
+        # random data is slow to generate, repeat a random MiB instead
+        data = bytearray(os.urandom(MiB)) * (size // MiB)
+
+        encrypt_time, ciphertext = _measure(stream_encrypt, key, data, workers=workers)
+        del data
+        decrypt_time, _ = _measure(stream_decrypt, key, ciphertext, workers=workers)
+        del ciphertext
+
+        mib = size / MiB
+        print(
+            f"{mib:>7.0f}MiB {mib / encrypt_time:>6.0f}MB/s {1000 * encrypt_time / mib:>8.2f} "
+            + f"{mib / decrypt_time:>6.0f}MB/s {1000 * decrypt_time / mib:>8.2f}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--max-size", type=_parse_size, default="4G", help="Largest input size")
+    parser.add_argument("--workers", type=int, default=1, help="Number of threads")
+    args = parser.parse_args()
+
+    run(args.max_size, args.workers)
+
+
+if __name__ == "__main__":
+    main()
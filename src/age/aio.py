@@ -0,0 +1,249 @@
+"""asyncio counterparts of :class:`age.file.Encryptor` and :class:`age.file.Decryptor`
+
+Both classes process one chunk at a time. CPU-heavy work (unwrapping or wrapping the file key,
+which may involve scrypt or RSA, and the AEAD of large chunks) runs in an executor, so it does not
+block the event loop.
+
+Backpressure is applied by awaiting :meth:`asyncio.StreamWriter.drain` after each chunk written.
+All methods are coroutines which may be cancelled (e.g. by :func:`asyncio.wait_for`); a cancelled
+encryptor or decryptor must not be used any further.
+"""
+
+import asyncio
+import concurrent.futures
+import functools
+import io
+import typing
+
+from age.exceptions import ParserError
+from age.file import decrypt_header, payload_key, write_header
+from age.format import FOOTER_PREFIX, MAX_HEADER_SIZE
+from age.keys.base import DecryptionKey, EncryptionKey
+from age.primitives.aead import AEAD, new_aead
+from age.primitives.random import random
+from age.stream import CIPHERTEXT_BLOCK_SIZE, PLAINTEXT_BLOCK_SIZE, decrypt_chunk, encrypt_chunk
+
+__all__ = ["AsyncEncryptor", "AsyncDecryptor"]
+
+OFFLOAD_THRESHOLD = 16 * 1024
+"""Chunks of at least this size are encrypted or decrypted in the executor"""
+
+
+class _AsyncBase:
+    def __init__(self, executor: typing.Optional[concurrent.futures.Executor]):
+        self._executor: typing.Optional[concurrent.futures.Executor] = executor
+
+    async def _run(self, func: typing.Callable, *args):
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args))
+
+    async def _run_chunk(self, func: typing.Callable, *args) -> bytes:
+        block = args[2]
+        if len(block) >= OFFLOAD_THRESHOLD:
+            return await self._run(func, *args)
+        else:
+            return func(*args)
+
+
+class AsyncEncryptor(_AsyncBase):
+    """Encrypt data for ``keys`` and write the ciphertext to ``writer``
+
+    Use as an asynchronous context manager: the header is written on entry and the final chunk
+    on exit. ``writer`` is not closed.
+
+    :param keys: Recipient public keys
+    :param writer: Output stream
+    :param executor: Executor for CPU-heavy work (defaults to the loop's default executor)
+    """
+
+    def __init__(
+        self,
+        keys: typing.Collection[EncryptionKey],
+        writer: asyncio.StreamWriter,
+        executor: typing.Optional[concurrent.futures.Executor] = None,
+    ):
+        super().__init__(executor)
+        self._keys = keys
+        self._writer: asyncio.StreamWriter = writer
+        self._file_key: bytes = random(16)
+
+        self._aead: typing.Optional[AEAD] = None
+        self._plaintext_buffer: bytearray = bytearray()
+        self._chunk_counter: int = 0
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            await self.close()
+
+    async def start(self) -> None:
+        """Write the header and the payload nonce"""
+        header = io.BytesIO()
+        await self._run(write_header, self._keys, self._file_key, header)
+
+        nonce = random(16)
+        self._aead = new_aead(payload_key(self._file_key, nonce))
+
+        self._writer.write(header.getvalue() + b"\n" + nonce)
+        await self._writer.drain()
+
+    async def write(self, data) -> int:
+        """Encrypt ``data``, waiting for the writer to drain after each chunk"""
+        view = memoryview(data).cast("B")
+        size = len(view)
+
+        while view:
+            if len(self._plaintext_buffer) == PLAINTEXT_BLOCK_SIZE:
+                # more data follows, so the buffered chunk is not the last one
+                await self._encrypt_buffer(last_block=False)
+
+            missing = PLAINTEXT_BLOCK_SIZE - len(self._plaintext_buffer)
+            self._plaintext_buffer += view[:missing]
+            view = view[missing:]
+
+        return size
+
+    async def close(self) -> None:
+        """Encrypt the final chunk"""
+        await self._encrypt_buffer(last_block=True)
+
+    async def _encrypt_buffer(self, last_block: bool) -> None:
+        assert self._aead is not None, "start() has not been called"
+
+        block = bytes(self._plaintext_buffer)
+        self._plaintext_buffer.clear()
+
+        ciphertext = await self._run_chunk(
+            encrypt_chunk, self._aead, self._chunk_counter, block, last_block
+        )
+        self._chunk_counter += 1
+
+        self._writer.write(ciphertext)
+        await self._writer.drain()
+
+
+class AsyncDecryptor(_AsyncBase):
+    """Decrypt data read from ``reader``
+
+    Use as an asynchronous context manager: the header is read and decrypted on entry. Plaintext
+    is available through :meth:`read` or by iterating over the decryptor, which yields the
+    plaintext chunk by chunk. Ciphertext is read one chunk ahead to recognize the last chunk.
+
+    :param identities: Private keys to try
+    :param reader: Input stream
+    :param executor: Executor for CPU-heavy work (defaults to the loop's default executor)
+    """
+
+    def __init__(
+        self,
+        identities: typing.Collection[DecryptionKey],
+        reader: asyncio.StreamReader,
+        executor: typing.Optional[concurrent.futures.Executor] = None,
+    ):
+        super().__init__(executor)
+        self._identities = identities
+        self._reader: asyncio.StreamReader = reader
+
+        self._aead: typing.Optional[AEAD] = None
+        self._chunk_counter: int = 0
+        self._next_block: typing.Optional[bytes] = None
+        self._plaintext_chunk: bytes = b""
+        self._chunk_offset: int = 0
+        self._failure: typing.Optional[Exception] = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        pass
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> bytes:
+        if self._chunk_offset < len(self._plaintext_chunk):
+            chunk = self._plaintext_chunk[self._chunk_offset :]
+            self._chunk_offset = len(self._plaintext_chunk)
+            return chunk
+
+        next_chunk = await self._decrypt_next_chunk()
+        if next_chunk is None:
+            raise StopAsyncIteration
+        return next_chunk
+
+    async def start(self) -> None:
+        """Read and decrypt the header and read the payload nonce"""
+        header = io.BytesIO()
+        while True:
+            line = await self._reader.readline()
+            header.write(line)
+
+            if header.tell() > MAX_HEADER_SIZE:
+                raise ParserError("Header too large.")
+            if not line.endswith(b"\n"):
+                raise ParserError("Unexpected end of header.")
+            if line.startswith(FOOTER_PREFIX):
+                break
+
+        header.seek(0)
+        file_key = await self._run(decrypt_header, self._identities, header)
+
+        nonce = await self._reader.readexactly(16)
+        self._aead = new_aead(payload_key(file_key, nonce))
+        self._next_block = await self._read_block()
+
+    async def read(self, size: int = -1) -> bytes:
+        """Read up to ``size`` bytes of plaintext (everything if ``size`` is negative)"""
+        parts = []
+        while size != 0:
+            if self._chunk_offset == len(self._plaintext_chunk):
+                chunk = await self._decrypt_next_chunk()
+                if chunk is None:
+                    break
+                self._plaintext_chunk = chunk
+                self._chunk_offset = 0
+
+            end = len(self._plaintext_chunk)
+            if size > 0:
+                end = min(end, self._chunk_offset + size)
+                size -= end - self._chunk_offset
+
+            parts.append(self._plaintext_chunk[self._chunk_offset : end])
+            self._chunk_offset = end
+
+        return b"".join(parts)
+
+    async def _read_block(self) -> bytes:
+        try:
+            return await self._reader.readexactly(CIPHERTEXT_BLOCK_SIZE)
+        except asyncio.IncompleteReadError as e:
+            return e.partial
+
+    async def _decrypt_next_chunk(self) -> typing.Optional[bytes]:
+        assert self._aead is not None, "start() has not been called"
+
+        if self._failure is not None:
+            # never skip a chunk that failed to decrypt
+            raise self._failure
+
+        block = self._next_block
+        if not block:
+            return None
+
+        try:
+            self._next_block = await self._read_block()
+            last_block = not self._next_block
+
+            plaintext = await self._run_chunk(
+                decrypt_chunk, self._aead, self._chunk_counter, block, last_block
+            )
+        except Exception as e:
+            self._failure = e
+            raise
+
+        self._chunk_counter += 1
+        return plaintext
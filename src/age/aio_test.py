@@ -0,0 +1,94 @@
+import asyncio
+import io
+import os
+
+import pytest
+from cryptography.exceptions import InvalidTag
+
+from age.aio import AsyncDecryptor, AsyncEncryptor
+from age.file import Decryptor, Encryptor
+from age.keys.agekey import AgePrivateKey
+from age.stream import PLAINTEXT_BLOCK_SIZE
+
+
+class _Writer:
+    def __init__(self):
+        self.buffer = io.BytesIO()
+        self.drained = 0
+
+    def write(self, data):
+        self.buffer.write(data)
+
+    async def drain(self):
+        self.drained += 1
+
+
+def _reader(data: bytes) -> asyncio.StreamReader:
+    reader = asyncio.StreamReader()
+    reader.feed_data(data)
+    reader.feed_eof()
+    return reader
+
+
+@pytest.mark.parametrize("size", [0, 100, PLAINTEXT_BLOCK_SIZE, 3 * PLAINTEXT_BLOCK_SIZE + 1])
+def test_async_encrypt(size):
+    key = AgePrivateKey.generate()
+    data = os.urandom(size)
+
+    async def encrypt():
+        writer = _Writer()
+        async with AsyncEncryptor([key.public_key()], writer) as encryptor:
+            for i in range(0, len(data), 1000):
+                await encryptor.write(data[i : i + 1000])
+        return writer
+
+    writer = asyncio.run(encrypt())
+    # header and one drain per chunk
+    assert writer.drained == 1 + max((size + PLAINTEXT_BLOCK_SIZE - 1) // PLAINTEXT_BLOCK_SIZE, 1)
+
+    with Decryptor([key], io.BytesIO(writer.buffer.getvalue())) as decryptor:
+        assert decryptor.read() == data
+
+
+@pytest.mark.parametrize("size", [0, 100, PLAINTEXT_BLOCK_SIZE, 3 * PLAINTEXT_BLOCK_SIZE + 1])
+def test_async_decrypt(size):
+    key = AgePrivateKey.generate()
+    data = os.urandom(size)
+
+    stream = io.BytesIO()
+    with Encryptor([key.public_key()], stream) as encryptor:
+        encryptor.write(data)
+    ciphertext = stream.getvalue()
+
+    async def decrypt_read():
+        async with AsyncDecryptor([key], _reader(ciphertext)) as decryptor:
+            first = await decryptor.read(10)
+            return first + await decryptor.read()
+
+    async def decrypt_iterate():
+        async with AsyncDecryptor([key], _reader(ciphertext)) as decryptor:
+            return b"".join([chunk async for chunk in decryptor])
+
+    assert asyncio.run(decrypt_read()) == data
+    assert asyncio.run(decrypt_iterate()) == data
+
+
+def test_async_decrypt_corrupted():
+    key = AgePrivateKey.generate()
+    data = os.urandom(3 * PLAINTEXT_BLOCK_SIZE)
+
+    stream = io.BytesIO()
+    with Encryptor([key.public_key()], stream) as encryptor:
+        encryptor.write(data)
+    ciphertext = bytearray(stream.getvalue())
+    ciphertext[-100] ^= 1
+
+    async def decrypt():
+        async with AsyncDecryptor([key], _reader(bytes(ciphertext))) as decryptor:
+            assert await decryptor.read(PLAINTEXT_BLOCK_SIZE) == data[:PLAINTEXT_BLOCK_SIZE]
+            with pytest.raises(InvalidTag):
+                await decryptor.read()
+            with pytest.raises(InvalidTag):
+                await decryptor.read()
+
+    asyncio.run(decrypt())
@@ -0,0 +1,168 @@
+"""Precomputed X25519 ephemeral key pairs
+
+Every X25519 (and ssh-ed25519) recipient stanza needs a fresh ephemeral secret and the
+corresponding point ``X25519(ephemeral secret, basepoint)``. An :class:`EphemeralKeyPool`
+computes these pairs on a background thread ahead of time, which takes one scalar
+multiplication off the critical path of every stanza.
+
+The pool is opt-in, see :func:`enable_ephemeral_key_pool`. Every pair is handed out exactly
+once. If the pool is disabled or empty, :func:`ephemeral_key_pair` generates a pair inline.
+
+A pool is never used in a process forked from the one which created it: parent and child would
+hand out the same ephemeral secrets, and the X25519 stanzas are encrypted with a zero nonce.
+"""
+
+import os
+import queue
+import threading
+import typing
+
+from age.primitives.random import random
+from age.primitives.x25519 import ECPoint, ECScalar, x25519_scalarmult_base
+
+__all__ = [
+    "EphemeralKeyPool",
+    "enable_ephemeral_key_pool",
+    "disable_ephemeral_key_pool",
+    "ephemeral_key_pair",
+]
+
+KeyPair = typing.Tuple[ECScalar, ECPoint]
+
+
+def _generate_key_pair() -> KeyPair:
+    ephemeral_secret = ECScalar(random(32))
+    return ephemeral_secret, x25519_scalarmult_base(ephemeral_secret)
+
+
+class EphemeralKeyPool:
+    """Bounded queue of ``(ephemeral secret, derived secret)`` pairs, refilled by a background thread
+
+    The pool only hands out pairs in the process which created it.
+
+    :param size: Maximum number of precomputed pairs
+    """
+
+    def __init__(self, size: int = 64):
+        if size < 1:
+            raise ValueError("size must be positive")
+
+        self.size: int = size
+        self.hits: int = 0
+        self.misses: int = 0
+
+        self._pid: int = os.getpid()
+        self._queue: "queue.Queue[KeyPair]" = queue.Queue(maxsize=size)
+        self._stopped = threading.Event()
+        self._thread: typing.Optional[threading.Thread] = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def start(self) -> None:
+        """Start filling the pool in the background"""
+        if self._thread is None:
+            self._stopped.clear()
+            self._thread = threading.Thread(
+                target=self._fill, name="age-ephemeral-keys", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background thread and discard all precomputed pairs"""
+        if self._thread is not None:
+            self._stopped.set()
+            self._thread.join()
+            self._thread = None
+
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+
+    def get(self) -> typing.Optional[KeyPair]:
+        """Take a precomputed pair out of the pool, or return ``None`` if the pool is empty
+
+        In a forked child process, the pool is always empty: its pairs are the parent's.
+        """
+        if os.getpid() != self._pid:
+            # checked before touching the queue, whose lock may have been held when forking
+            self.misses += 1
+            return None
+
+        try:
+            key_pair = self._queue.get_nowait()
+        except queue.Empty:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return key_pair
+
+    def _fill(self) -> None:
+        key_pair = None
+        while not self._stopped.is_set():
+            if key_pair is None:
+                key_pair = _generate_key_pair()
+            try:
+                # wake up regularly to notice stop()
+                self._queue.put(key_pair, timeout=0.1)
+            except queue.Full:
+                pass
+            else:
+                key_pair = None
+
+
+_pool: typing.Optional[EphemeralKeyPool] = None
+
+
+def enable_ephemeral_key_pool(size: int = 64) -> EphemeralKeyPool:
+    """Start a global pool used by :func:`ephemeral_key_pair`, replacing any previous one
+
+    :param size: Maximum number of precomputed pairs
+    :returns: The new pool
+    """
+    global _pool
+
+    disable_ephemeral_key_pool()
+    _pool = EphemeralKeyPool(size)
+    _pool.start()
+    return _pool
+
+
+def disable_ephemeral_key_pool() -> None:
+    """Stop the global pool, if any, and discard its pairs"""
+    global _pool
+
+    if _pool is not None:
+        _pool.stop()
+        _pool = None
+
+
+def _forget_pool_after_fork() -> None:
+    # the background thread does not survive fork(), and the pairs belong to the parent
+    global _pool
+    _pool = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_forget_pool_after_fork)
+
+
+def ephemeral_key_pair() -> KeyPair:
+    """Return a new ``(ephemeral secret, X25519(ephemeral secret, basepoint))`` pair
+
+    The pair is taken from the global pool if it is enabled and not empty, otherwise it is
+    generated inline.
+    """
+    pool = _pool
+    if pool is not None:
+        key_pair = pool.get()
+        if key_pair is not None:
+            return key_pair
+    return _generate_key_pair()
@@ -0,0 +1,93 @@
+import os
+import time
+
+import pytest
+from pytest import raises
+
+from age.algorithms.ephemeral import (
+    EphemeralKeyPool,
+    disable_ephemeral_key_pool,
+    enable_ephemeral_key_pool,
+    ephemeral_key_pair,
+)
+from age.algorithms.x25519 import x25519_decrypt_file_key, x25519_encrypt_file_key
+from age.keys.agekey import AgePrivateKey
+from age.primitives.x25519 import x25519_scalarmult_base
+
+
+def _wait_full(pool):
+    for _ in range(1000):
+        if pool._queue.full():
+            return
+        time.sleep(0.01)
+    raise AssertionError("pool was not filled")
+
+
+def test_pool():
+    with EphemeralKeyPool(size=4) as pool:
+        _wait_full(pool)
+
+        pairs = [pool.get() for _ in range(4)]
+        for secret, derived_secret in pairs:
+            assert x25519_scalarmult_base(secret) == derived_secret
+
+        # every pair is used only once
+        assert len({secret for secret, _ in pairs}) == 4
+        assert pool.hits == 4
+
+    assert pool.get() is None
+    assert pool.misses == 1
+
+    with raises(ValueError):
+        EphemeralKeyPool(size=0)
+
+
+def test_global_pool():
+    secret, derived_secret = ephemeral_key_pair()
+    assert x25519_scalarmult_base(secret) == derived_secret
+
+    pool = enable_ephemeral_key_pool(size=2)
+    try:
+        _wait_full(pool)
+
+        key = AgePrivateKey.generate()
+        for _ in range(3):
+            args = x25519_encrypt_file_key(key.public_key(), b"x" * 16)
+            assert x25519_decrypt_file_key(key, *args) == b"x" * 16
+
+        assert pool.hits >= 2
+    finally:
+        disable_ephemeral_key_pool()
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requires fork()")
+@pytest.mark.parametrize("use_global_pool", [False, True])
+def test_fork(use_global_pool):
+    pool = enable_ephemeral_key_pool(size=4) if use_global_pool else EphemeralKeyPool(size=4)
+    pool.start()
+    try:
+        _wait_full(pool)
+
+        read_end, write_end = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            # the child must not hand out any of the parent's precomputed secrets
+            try:
+                key_pair = ephemeral_key_pair() if use_global_pool else pool.get()
+                os.write(write_end, b"empty" if key_pair is None else key_pair[0])
+            finally:
+                os._exit(0)
+
+        os.close(write_end)
+        with os.fdopen(read_end, "rb") as pipe:
+            child_secret = pipe.read()
+        os.waitpid(pid, 0)
+
+        parent_secrets = [key_pair[0] for key_pair in (pool.get() for _ in range(4)) if key_pair]
+        assert len(parent_secrets) == 4
+        assert child_secret not in parent_secrets
+        if not use_global_pool:
+            assert child_secret == b"empty"
+    finally:
+        pool.stop()
+        disable_ephemeral_key_pool()
@@ -1,5 +1,6 @@
 import typing
 
+from age.algorithms.scrypt_cache import get_scrypt_cache
 from age.keys.password import PasswordKey
 from age.primitives.encrypt import decrypt, encrypt
 from age.primitives.random import random
@@ -8,11 +9,12 @@ from age.primitives.scrypt import scrypt
 __all__ = ["scrypt_encrypt_file_key", "scrypt_decrypt_file_key"]
 
 MAX_LOG_COST = 22
+DEFAULT_LOG_COST = 18
 AGE_SCRYPT_LABEL = b"age-encryption.org/v1/scrypt"
 
 
 def scrypt_encrypt_file_key(
-    password: PasswordKey, file_key: bytes, log_cost: int = 18
+    password: PasswordKey, file_key: bytes, log_cost: int = DEFAULT_LOG_COST
 ) -> typing.Tuple[bytes, int, bytes]:
     # https://blog.filippo.io/the-scrypt-parameters/
 
@@ -35,6 +37,18 @@ def scrypt_decrypt_file_key(
     if not (0 <= log_cost <= MAX_LOG_COST):
         raise ValueError("Invalid scrypt cost")
 
+    cache = get_scrypt_cache()
+    if cache is not None:
+        cached_key = cache.get(password.value, salt, log_cost)
+        if cached_key is not None:
+            return decrypt(cached_key, encrypted_file_key)
+
     cost = 1 << log_cost
     key = scrypt(AGE_SCRYPT_LABEL + salt, cost, password.value)
-    return decrypt(key, encrypted_file_key)
+    file_key = decrypt(key, encrypted_file_key)
+
+    # only keys for the right password are worth keeping
+    if cache is not None:
+        cache.put(password.value, salt, log_cost, key)
+
+    return file_key
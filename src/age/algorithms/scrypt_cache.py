@@ -0,0 +1,141 @@
+"""Cache of scrypt-derived keys
+
+Deriving the key for an ``scrypt`` stanza is deliberately expensive. When files sharing a salt
+are decrypted in a batch, or the same file is opened repeatedly, a :class:`ScryptKeyCache` keeps
+the derived keys in memory for a limited time.
+
+The cache is opt-in, see :func:`enable_scrypt_cache`. Entries are keyed by a keyed digest of the
+password (the password itself is not stored), the salt and the work factor. Only keys which
+successfully unwrapped a file key are cached. Evicted and expired keys are overwritten with zeros.
+"""
+
+import collections
+import hashlib
+import hmac
+import threading
+import time
+import typing
+
+from age.primitives.random import random
+
+__all__ = ["ScryptKeyCache", "enable_scrypt_cache", "disable_scrypt_cache", "get_scrypt_cache"]
+
+CacheKey = typing.Tuple[bytes, bytes, int]
+
+
+def _zeroize(buffer: bytearray) -> None:
+    buffer[:] = bytes(len(buffer))
+
+
+class ScryptKeyCache:
+    """Thread-safe LRU cache of derived keys with a time to live
+
+    :param max_entries: Maximum number of cached keys, the least recently used one is evicted
+    :param ttl: Seconds after which a cached key expires
+    :param clock: Monotonic time source
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 16,
+        ttl: float = 300.0,
+        clock: typing.Callable[[], float] = time.monotonic,
+    ):
+        if max_entries < 1 or ttl <= 0:
+            raise ValueError("max_entries and ttl must be positive")
+
+        self.max_entries: int = max_entries
+        self.ttl: float = ttl
+        self.hits: int = 0
+        self.misses: int = 0
+
+        self._clock = clock
+        self._digest_key: bytes = random(32)
+        self._lock = threading.Lock()
+        self._entries: "collections.OrderedDict[CacheKey, typing.Tuple[float, bytearray]]" = (
+            collections.OrderedDict()
+        )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, password: bytes, salt: bytes, log_cost: int) -> typing.Optional[bytes]:
+        """Return the cached key for these parameters, or ``None``"""
+        cache_key = self._cache_key(password, salt, log_cost)
+
+        with self._lock:
+            self._expire()
+            entry = self._entries.get(cache_key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(cache_key)
+            self.hits += 1
+            return bytes(entry[1])
+
+    def put(self, password: bytes, salt: bytes, log_cost: int, key: bytes) -> None:
+        """Cache the derived ``key`` for these parameters"""
+        cache_key = self._cache_key(password, salt, log_cost)
+
+        with self._lock:
+            self._expire()
+            self._remove(cache_key)
+            self._entries[cache_key] = (self._clock() + self.ttl, bytearray(key))
+
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def clear(self) -> None:
+        """Zero and drop all cached keys"""
+        with self._lock:
+            while self._entries:
+                self._remove(next(iter(self._entries)))
+
+    def _cache_key(self, password: bytes, salt: bytes, log_cost: int) -> CacheKey:
+        digest = hmac.new(self._digest_key, password, hashlib.sha256).digest()
+        return digest, bytes(salt), log_cost
+
+    def _expire(self) -> None:
+        now = self._clock()
+        expired = [cache_key for cache_key, (expiry, _) in self._entries.items() if expiry <= now]
+        for cache_key in expired:
+            self._remove(cache_key)
+
+    def _remove(self, cache_key: CacheKey) -> None:
+        entry = self._entries.pop(cache_key, None)
+        if entry is not None:
+            _zeroize(entry[1])
+
+
+_cache: typing.Optional[ScryptKeyCache] = None
+
+
+def enable_scrypt_cache(max_entries: int = 16, ttl: float = 300.0) -> ScryptKeyCache:
+    """Start caching derived keys in :func:`age.algorithms.scrypt.scrypt_decrypt_file_key`
+
+    Any previously enabled cache is cleared and replaced.
+
+    :param max_entries: Maximum number of cached keys
+    :param ttl: Seconds after which a cached key expires
+    :returns: The new cache
+    """
+    global _cache
+
+    disable_scrypt_cache()
+    _cache = ScryptKeyCache(max_entries, ttl)
+    return _cache
+
+
+def disable_scrypt_cache() -> None:
+    """Stop caching derived keys and zero all cached keys"""
+    global _cache
+
+    if _cache is not None:
+        _cache.clear()
+        _cache = None
+
+
+def get_scrypt_cache() -> typing.Optional[ScryptKeyCache]:
+    """Return the enabled cache, if any"""
+    return _cache
@@ -0,0 +1,88 @@
+import os
+
+from cryptography.exceptions import InvalidTag
+from pytest import raises
+
+from age.algorithms.scrypt import scrypt_decrypt_file_key, scrypt_encrypt_file_key
+from age.algorithms.scrypt_cache import (
+    ScryptKeyCache,
+    disable_scrypt_cache,
+    enable_scrypt_cache,
+    get_scrypt_cache,
+)
+from age.keys.password import PasswordKey
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lru_eviction():
+    cache = ScryptKeyCache(max_entries=2)
+    cache.put(b"password", b"salt1", 10, b"k" * 32)
+    cache.put(b"password", b"salt2", 10, b"l" * 32)
+
+    # zeroed on eviction
+    evicted = cache._entries[next(iter(cache._entries))][1]
+
+    assert cache.get(b"password", b"salt2", 10) == b"l" * 32
+    cache.put(b"password", b"salt3", 10, b"m" * 32)
+
+    assert len(cache) == 2
+    assert evicted == bytes(32)
+    assert cache.get(b"password", b"salt1", 10) is None
+    assert cache.get(b"password", b"salt2", 10) == b"l" * 32
+    assert cache.get(b"other", b"salt2", 10) is None
+    assert cache.get(b"password", b"salt2", 11) is None
+    assert (cache.hits, cache.misses) == (2, 3)
+
+    cache.clear()
+    assert len(cache) == 0
+
+    with raises(ValueError):
+        ScryptKeyCache(max_entries=0)
+
+
+def test_ttl():
+    clock = _Clock()
+    cache = ScryptKeyCache(ttl=10, clock=clock)
+    cache.put(b"password", b"salt", 10, b"k" * 32)
+    entry = cache._entries[next(iter(cache._entries))][1]
+
+    clock.now = 9.9
+    assert cache.get(b"password", b"salt", 10) == b"k" * 32
+
+    clock.now = 10
+    assert cache.get(b"password", b"salt", 10) is None
+    assert entry == bytes(32)
+
+
+def test_scrypt_decrypt_cached(monkeypatch):
+    password = PasswordKey(os.urandom(10))
+    file_key = os.urandom(16)
+    args = scrypt_encrypt_file_key(password, file_key, log_cost=10)
+
+    cache = enable_scrypt_cache()
+    try:
+        assert get_scrypt_cache() is cache
+
+        with raises(InvalidTag):
+            scrypt_decrypt_file_key(PasswordKey(b"wrong"), *args)
+        assert len(cache) == 0
+
+        assert scrypt_decrypt_file_key(password, *args) == file_key
+        assert len(cache) == 1
+
+        def fail(*args):
+            raise AssertionError("key was not cached")
+
+        monkeypatch.setattr("age.algorithms.scrypt.scrypt", fail)
+        assert scrypt_decrypt_file_key(password, *args) == file_key
+    finally:
+        disable_scrypt_cache()
+
+    assert get_scrypt_cache() is None
@@ -0,0 +1,107 @@
+"""Calibration of the scrypt work factor for the current host
+
+:func:`calibrate_log_cost` measures :func:`age.primitives.scrypt.scrypt` and picks the largest
+``log_cost`` which takes at most a target time and fits a memory budget. As calibrating takes
+about twice the target time, :func:`cached_log_cost` stores the result per host name in a JSON
+file (by default ``~/.cache/age/scrypt.json``).
+"""
+
+import json
+import os
+import socket
+import time
+import typing
+
+from age.algorithms.scrypt import MAX_LOG_COST
+from age.primitives.random import random
+from age.primitives.scrypt import scrypt, scrypt_memory
+
+__all__ = ["calibrate_log_cost", "cached_log_cost"]
+
+MIN_LOG_COST = 10
+"""Smallest work factor chosen by the calibration, even if it exceeds the target time"""
+
+DEFAULT_MAX_MEMORY = 1024 * 1024 * 1024
+"""Default memory budget for a single scrypt derivation (1 GiB, i.e. ``log_cost`` 20)"""
+
+
+def _cache_path() -> str:
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(cache_home, "age", "scrypt.json")
+
+
+def _time_scrypt(log_cost: int) -> float:
+    start = time.perf_counter()
+    scrypt(random(16), 1 << log_cost, b"calibration")
+    return time.perf_counter() - start
+
+
+def calibrate_log_cost(target_ms: float, max_memory: int = DEFAULT_MAX_MEMORY) -> int:
+    """Find the largest scrypt work factor which takes at most ``target_ms`` on this host
+
+    Starting at :data:`MIN_LOG_COST`, the work factor is increased while the measured time of the
+    next step, which doubles the work, is expected to stay within the target.
+
+    :param target_ms: Target time for one key derivation in milliseconds
+    :param max_memory: Memory budget in bytes for one key derivation
+    :returns: ``log_cost`` between :data:`MIN_LOG_COST` and
+        :data:`age.algorithms.scrypt.MAX_LOG_COST`
+    """
+    target = target_ms / 1000
+    log_cost = MIN_LOG_COST
+    duration = _time_scrypt(log_cost)
+
+    while log_cost < MAX_LOG_COST and scrypt_memory(1 << (log_cost + 1)) <= max_memory:
+        if 2 * duration > target:
+            break
+
+        duration = _time_scrypt(log_cost + 1)
+        if duration > target:
+            break
+        log_cost += 1
+
+    return log_cost
+
+
+def cached_log_cost(
+    target_ms: float,
+    max_memory: int = DEFAULT_MAX_MEMORY,
+    path: typing.Optional[str] = None,
+) -> int:
+    """Like :func:`calibrate_log_cost`, but reuse an earlier result for this host
+
+    Failing to read or write the cache file is not an error: the work factor is calibrated
+    (again) in that case.
+
+    :param path: Cache file (defaults to ``$XDG_CACHE_HOME/age/scrypt.json``)
+    """
+    if path is None:
+        path = _cache_path()
+
+    host = socket.gethostname()
+    entry = f"{target_ms:g}ms/{max_memory}"
+
+    cache: typing.Any = {}
+    try:
+        with open(path, "r") as f:
+            cache = json.load(f)
+        return int(cache[host][entry])
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+    log_cost = calibrate_log_cost(target_ms, max_memory)
+
+    if not isinstance(cache, dict):
+        cache = {}
+    if not isinstance(cache.get(host), dict):
+        cache[host] = {}
+    cache[host][entry] = log_cost
+
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(cache, f, indent=2)
+    except OSError:
+        pass
+
+    return log_cost
@@ -0,0 +1,49 @@
+import json
+
+from age.algorithms import scrypt_calibration
+from age.algorithms.scrypt_calibration import cached_log_cost, calibrate_log_cost
+from age.primitives.scrypt import scrypt_memory
+
+
+def _fake_timing(monkeypatch, calls=None):
+    def time_scrypt(log_cost):
+        if calls is not None:
+            calls.append(log_cost)
+        # 1 ms at log_cost 10, doubling with every step
+        return 0.001 * 2 ** (log_cost - 10)
+
+    monkeypatch.setattr(scrypt_calibration, "_time_scrypt", time_scrypt)
+
+
+def test_calibrate(monkeypatch):
+    _fake_timing(monkeypatch)
+
+    assert calibrate_log_cost(100) == 16
+    assert calibrate_log_cost(128) == 17
+    assert calibrate_log_cost(0.1) == 10
+    assert calibrate_log_cost(1e9) == 20
+    assert calibrate_log_cost(1e9, max_memory=2 ** 40) == 22
+    assert calibrate_log_cost(1e9, max_memory=scrypt_memory(2 ** 14)) == 14
+
+
+def test_cached(monkeypatch, tmp_path):
+    calls = []
+    _fake_timing(monkeypatch, calls)
+    path = str(tmp_path / "cache" / "scrypt.json")
+
+    assert cached_log_cost(100, path=path) == 16
+    assert calls
+
+    calls.clear()
+    assert cached_log_cost(100, path=path) == 16
+    assert cached_log_cost(128, path=path) == 17
+    assert calls == [10, 11, 12, 13, 14, 15, 16, 17]
+
+    with open(path) as f:
+        cache = json.load(f)
+    assert len(next(iter(cache.values()))) == 2
+
+    # a broken cache file is replaced
+    with open(path, "w") as f:
+        f.write("{")
+    assert cached_log_cost(100, path=path) == 16
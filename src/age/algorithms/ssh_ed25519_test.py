@@ -3,7 +3,7 @@ import os
 from pytest import raises
 
 from age.algorithms.ssh_ed25519 import ssh_ed25519_decrypt_file_key, ssh_ed25519_encrypt_file_key
-from age.keys.ed25519 import Ed25519PrivateKey
+from age.keys.ed25519 import Ed25519PrivateKey, Ed25519PublicKey
 
 
 def test_ed25519_algorithm():
@@ -30,3 +30,22 @@ def test_ed25519_failed_decryption():
 
     with raises(ValueError):
         ssh_ed25519_decrypt_file_key(Ed25519PrivateKey.generate(), *args)
+
+
+def test_ed25519_identity_material_cached(monkeypatch):
+    key = Ed25519PrivateKey.generate()
+    file_key = os.urandom(16)
+
+    args = ssh_ed25519_encrypt_file_key(key.public_key(), file_key)
+    assert ssh_ed25519_decrypt_file_key(key, *args) == file_key
+    assert key.stanza_material() is key.stanza_material()
+
+    def fail(self):
+        raise AssertionError("derived material was not cached")
+
+    monkeypatch.setattr(Ed25519PrivateKey, "to_age_private_key", fail)
+    monkeypatch.setattr(Ed25519PrivateKey, "public_key", fail)
+
+    for _ in range(2):
+        args = ssh_ed25519_encrypt_file_key(Ed25519PublicKey(key._key.public_key()), file_key)
+        assert ssh_ed25519_decrypt_file_key(key, *args) == file_key
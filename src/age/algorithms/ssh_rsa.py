@@ -21,8 +21,7 @@ def ssh_rsa_encrypt_file_key(
 def ssh_rsa_decrypt_file_key(
     private_key: RSAPrivateKey, fingerprint: bytes, encrypted_file_key: bytes
 ) -> bytes:
-    expected_fingerprint = sha256(private_key.public_key().binary_encoding())[:4]
-    if fingerprint != expected_fingerprint:
+    if fingerprint != private_key.stanza_fingerprint():
         raise ValueError("Wrong SSH-RSA public key")
 
     return rsa_decrypt(
@@ -1,10 +1,10 @@
 import typing
 
+from age.algorithms.ephemeral import ephemeral_key_pair
 from age.keys.agekey import AgePrivateKey, AgePublicKey
 from age.primitives.encrypt import decrypt, encrypt
 from age.primitives.hkdf import hkdf
-from age.primitives.random import random
-from age.primitives.x25519 import ECPoint, ECScalar, x25519_scalarmult, x25519_scalarmult_base
+from age.primitives.x25519 import ECPoint, ECScalar, x25519_scalarmult
 
 __all__ = ["x25519_encrypt_file_key", "x25519_decrypt_file_key"]
 
@@ -25,12 +25,14 @@ def x25519_encrypt_file_key(
     ``salt`` is :func:`age.primitives.X25519` (``ephemeral secret``, ``basepoint``) || ``public key``,
     and ``label`` is ``b"age-encryption.org/v1/X25519"``.
 
+    The ephemeral secret and ``X25519(ephemeral secret, basepoint)`` come from
+    :func:`age.algorithms.ephemeral.ephemeral_key_pair`.
+
     :returns: ``derived_secret``, ``encrypted_file_key``
     """
-    ephemeral_secret = ECScalar(random(32))
+    ephemeral_secret, derived_secret = ephemeral_key_pair()
     public_key_bytes = public_key.public_bytes()
 
-    derived_secret = x25519_scalarmult_base(ephemeral_secret)
     salt = derived_secret + public_key_bytes
 
     key_material = x25519_scalarmult(ephemeral_secret, public_key_bytes)
@@ -42,10 +44,8 @@ def x25519_encrypt_file_key(
 
 
 def _x25519_decrypt_file_key2(
-    private_key: AgePrivateKey, derived_secret: ECPoint, encrypted_file_key: bytes, salt: bytes
+    private_key_bytes: ECScalar, derived_secret: ECPoint, encrypted_file_key: bytes, salt: bytes
 ):
-    private_key_bytes = private_key.private_bytes()
-
     # Public and private keys in are related as follows:
     # public_key = x25519(private_key, 9)
     # '9' is the curve 25519 base point.
@@ -83,7 +83,7 @@ def x25519_decrypt_file_key(
     salt = derived_secret + private_key.public_key().public_bytes()
 
     return _x25519_decrypt_file_key2(
-        private_key=private_key,
+        private_key_bytes=private_key.private_bytes(),
         derived_secret=derived_secret,
         encrypted_file_key=encrypted_file_key,
         salt=salt,
@@ -2,19 +2,25 @@
 
 import io
 import os
+import shutil
 import stat
 import sys
 import typing
 from datetime import datetime
 
 import click
+from cryptography.exceptions import InvalidSignature
 
 from age import __version__ as age_version
-from age.file import Decryptor, Encryptor
+from age.algorithms.scrypt_calibration import cached_log_cost
+from age.exceptions import NoIdentity, ParserError
+from age.file import Decryptor, Encryptor, inspect_file, verify_file
 from age.keyloader import load_aliases, load_keys_txt, load_ssh_keys, resolve_public_key
 from age.keys.agekey import AgePrivateKey
-from age.keys.base import DecryptionKey
 from age.keys.password import PasswordKey
+from age.primitives.encode import encode
+from age.recipients.helpers import IdentityStore
+from age.rekey import rekey_files, rekey_tree
 from age.utils.asciiarmor import AGE_PEM_LABEL, AsciiArmoredInput, AsciiArmoredOutput
 from age.utils.copy_doc import copy_doc
 
@@ -25,6 +31,8 @@ def encrypt(
     outfile: typing.Optional[typing.BinaryIO] = None,
     ask_password: bool = False,
     ascii_armored: bool = False,
+    jobs: int = 1,
+    target_ms: typing.Optional[int] = None,
 ) -> None:
     """Encrypt data for the given recipients.
 
@@ -48,6 +56,10 @@ def encrypt(
     with the message, therefore it is recommended to not mix password- and
     public key recipients.
 
+    With '--target-ms', the password is hashed with the largest scrypt work
+    factor that takes at most this many milliseconds on this host. The work
+    factor is measured once and cached in ~/.cache/age/scrypt.json.
+
     """
 
     if infile is None:
@@ -76,18 +88,27 @@ def encrypt(
                 file=sys.stderr,
             )
         password = click.prompt("Type passphrase", hide_input=True).encode("utf-8")
-        keys.append(PasswordKey(password))
+        log_cost = None if target_ms is None else cached_log_cost(target_ms)
+        keys.append(PasswordKey(password, log_cost))
+    elif target_ms is not None:
+        print("The option '--target-ms' requires '-p'.", file=sys.stderr)
+        sys.exit(1)
 
     if not keys:
         print("You must specify at least one recipient.", file=sys.stderr)
         sys.exit(1)
 
+    armored_outfile = None
     if ascii_armored:
         # ignoring mypy error because RawIOBase satisfies BinaryIO (doesn't it?)
-        outfile = AsciiArmoredOutput(AGE_PEM_LABEL, outfile)  # type: ignore
+        outfile = armored_outfile = AsciiArmoredOutput(AGE_PEM_LABEL, outfile)  # type: ignore
+
+    with Encryptor(keys, outfile, workers=jobs) as encryptor:
+        shutil.copyfileobj(infile, encryptor)
 
-    with Encryptor(keys, outfile) as encryptor:
-        encryptor.write(infile.read())
+    if armored_outfile is not None:
+        # writes the end marker
+        armored_outfile.close()
 
 
 def decrypt(
@@ -96,6 +117,7 @@ def decrypt(
     ask_password: bool = False,
     keyfiles: typing.Optional[typing.List[str]] = None,
     ascii_armored: bool = False,
+    jobs: int = 1,
 ) -> None:
     """Decrypt a file encrypted with 'age encrypt'.
 
@@ -117,29 +139,180 @@ def decrypt(
         infile = sys.stdin.buffer
     if outfile is None:
         outfile = sys.stdout.buffer
-    if keyfiles is None:
-        keyfiles = []
 
-    keys: typing.List[DecryptionKey] = []
-    keys.extend(load_keys_txt())
-    keys.extend(load_ssh_keys())
-    for keyfile in keyfiles:
-        keys.extend(load_keys_txt(keyfile))
+    keys = _load_identities(keyfiles, ask_password)
+
+    if ascii_armored:
+        # ignoring mypy error because RawIOBase satisfies BinaryIO (doesn't it?)
+        infile = AsciiArmoredInput(AGE_PEM_LABEL, infile)  # type: ignore
+
+    with Decryptor(keys, infile, workers=jobs) as decryptor:
+        shutil.copyfileobj(decryptor, outfile)
+
+
+def verify(
+    infile: str,
+    ask_password: bool = False,
+    keyfiles: typing.Optional[typing.List[str]] = None,
+    jobs: int = 1,
+) -> None:
+    """Check the integrity of a file encrypted with 'age encrypt'.
+
+    The header MAC and the authentication tag of every chunk are verified
+    without writing out any plaintext. Keys are loaded as for 'age decrypt'.
+
+    The command exits with status 1 if the file is corrupted and reports the
+    offset of the first chunk that fails to authenticate. It also exits with
+    status 1 if the header cannot be read or none of the keys matches.
+    """
+
+    keys = _load_identities(keyfiles, ask_password)
+
+    try:
+        offset = verify_file(infile, keys, workers=jobs)
+    except InvalidSignature:
+        print(f"{infile}: header MAC mismatch", file=sys.stderr)
+        sys.exit(1)
+    except (OSError, ParserError, NoIdentity) as e:
+        print(f"{infile}: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if offset is not None:
+        print(f"{infile}: corrupted chunk at offset {offset}", file=sys.stderr)
+        sys.exit(1)
+
+    print(f"{infile}: OK")
+
+
+def inspect(
+    infiles: typing.List[str],
+    identify: bool = False,
+    ask_password: bool = False,
+    keyfiles: typing.Optional[typing.List[str]] = None,
+) -> None:
+    """Show the recipients of files encrypted with 'age encrypt'.
+
+    Only the header of each file is read. Every recipient stanza is listed
+    with its type, the key fingerprint of 'ssh-rsa' and 'ssh-ed25519'
+    stanzas and the work factor of 'scrypt' stanzas.
+
+    With '--identify', keys are loaded as for 'age decrypt', and the key
+    which can decrypt each file is shown. Additional key files can be passed
+    with '-k', '-p' prompts for a password; both imply '--identify'.
+
+    The command exits with status 1 if any of the headers could not be read.
+    """
+
+    keys = None
+    if identify or ask_password or keyfiles:
+        keys = _load_identities(keyfiles, ask_password)
+
+    failed = False
+    for infile in infiles:
+        try:
+            info = inspect_file(infile, keys)
+        except InvalidSignature:
+            print(f"{infile}: header MAC mismatch", file=sys.stderr)
+            failed = True
+            continue
+        except (OSError, ParserError) as e:
+            print(f"{infile}: {e}", file=sys.stderr)
+            failed = True
+            continue
+
+        recipients = "recipient" if len(info.stanzas) == 1 else "recipients"
+        print(f"{infile}: {len(info.stanzas)} {recipients}, header {info.header_size} bytes")
+        for number, stanza in enumerate(info.stanzas, start=1):
+            description = stanza.type
+            if stanza.fingerprint is not None:
+                description += f" {encode(stanza.fingerprint)}"
+            if stanza.log_cost is not None:
+                description += f" work factor {stanza.log_cost}"
+            print(f"  {number}. {description}")
+
+        if keys is not None:
+            if info.stanza_index is None:
+                print("  identity: none")
+            else:
+                print(f"  identity: {info.identity!r} (stanza {info.stanza_index + 1})")
+
+    if failed:
+        sys.exit(1)
+
+
+def rekey(
+    paths: typing.List[str],
+    recipients: typing.Optional[typing.List[str]] = None,
+    ask_password: bool = False,
+    keyfiles: typing.Optional[typing.List[str]] = None,
+    jobs: int = 1,
+) -> None:
+    """Change the recipients of files encrypted with 'age encrypt'.
+
+    The file key of every file is unwrapped with keys loaded as for
+    'age decrypt' and wrapped for the recipients given with '-r', which
+    replace all previous recipients. The payload is not re-encrypted.
+    Recipients are specified as for 'age encrypt'.
+
+    PATHS can be files or directories, in which case all '*.age' files in
+    the directory tree are rekeyed.
+
+    The command exits with status 1 if any file could not be rekeyed; such
+    files are left unchanged.
+    """
+
+    aliases = load_aliases()
+
+    keys = []
+    for recipient in recipients or []:
+        keys.extend(resolve_public_key(recipient, aliases=aliases))
+
+    if not keys:
+        print("You must specify at least one recipient.", file=sys.stderr)
+        sys.exit(1)
+
+    identities = _load_identities(keyfiles, ask_password)
+
+    files = [path for path in paths if not os.path.isdir(path)]
+    results = rekey_files(files, identities, keys, workers=jobs)
+    for path in paths:
+        if os.path.isdir(path):
+            results.extend(rekey_tree(path, identities, keys, workers=jobs))
+
+    failed = False
+    for result in results:
+        if result.error is None:
+            print(f"{result.path}: OK")
+            continue
+
+        if isinstance(result.error, InvalidSignature):
+            message = "header MAC mismatch"
+        else:
+            message = str(result.error) or type(result.error).__name__
+        print(f"{result.path}: {message}", file=sys.stderr)
+        failed = True
+
+    if failed:
+        sys.exit(1)
+
+
+def _load_identities(
+    keyfiles: typing.Optional[typing.List[str]], ask_password: bool
+) -> IdentityStore:
+    keys = IdentityStore(load_keys_txt())
+    keys.update(load_ssh_keys())
+    for keyfile in keyfiles or []:
+        keys.update(load_keys_txt(keyfile))
 
     if ask_password:
         password = click.prompt("Type passphrase", hide_input=True).encode("utf-8")
-        keys.append(PasswordKey(password))
+        keys.add(PasswordKey(password))
 
     if not keys:
         print("No keys loaded.", file=sys.stderr)
         sys.exit(1)
 
-    if ascii_armored:
-        # ignoring mypy error because RawIOBase satisfies BinaryIO (doesn't it?)
-        infile = AsciiArmoredInput(AGE_PEM_LABEL, infile)  # type: ignore
-
-    with Decryptor(keys, infile) as decryptor:
-        outfile.write(decryptor.read())
+    return keys
 
 
 def generate(outfile: typing.Optional[typing.TextIO] = None) -> None:
@@ -193,15 +366,19 @@ def main():
 @click.option("-o", "--outfile", type=click.File("wb"))
 @click.option("-p", "--password", is_flag=True)
 @click.option("-a", "--ascii", is_flag=True)
+@click.option("-j", "--jobs", type=click.IntRange(min=1), default=1, help="Encryption threads")
+@click.option("--target-ms", type=click.IntRange(min=1), help="Calibrate the password hashing time")
 @click.argument("recipients", nargs=-1)
 @copy_doc(encrypt)
-def cli_encrypt(infile, outfile, password, ascii, recipients):
+def cli_encrypt(infile, outfile, password, ascii, jobs, target_ms, recipients):
     return encrypt(
         recipients=recipients,
         infile=infile,
         outfile=outfile,
         ask_password=password,
         ascii_armored=ascii,
+        jobs=jobs,
+        target_ms=target_ms,
     )
 
 
@@ -210,15 +387,50 @@ def cli_encrypt(infile, outfile, password, ascii, recipients):
 @click.option("-o", "--outfile", type=click.File("wb"))
 @click.option("-p", "--password", is_flag=True)
 @click.option("-a", "--ascii", is_flag=True)
+@click.option("-j", "--jobs", type=click.IntRange(min=1), default=1, help="Decryption threads")
 @click.argument("keyfiles", nargs=-1)
 @copy_doc(decrypt)
-def cli_decrypt(infile, outfile, password, ascii, keyfiles):
+def cli_decrypt(infile, outfile, password, ascii, jobs, keyfiles):
     return decrypt(
         infile=infile,
         outfile=outfile,
         ask_password=password,
         keyfiles=keyfiles,
         ascii_armored=ascii,
+        jobs=jobs,
+    )
+
+
+@main.command("verify")
+@click.option("-i", "--infile", type=click.Path(exists=True, dir_okay=False), required=True)
+@click.option("-p", "--password", is_flag=True)
+@click.option("-j", "--jobs", type=click.IntRange(min=1), default=1, help="Verification processes")
+@click.argument("keyfiles", nargs=-1)
+@copy_doc(verify)
+def cli_verify(infile, password, jobs, keyfiles):
+    return verify(infile=infile, ask_password=password, keyfiles=keyfiles, jobs=jobs)
+
+
+@main.command("inspect")
+@click.option("--identify", is_flag=True, help="Show the key which can decrypt each file")
+@click.option("-p", "--password", is_flag=True)
+@click.option("-k", "--keyfile", "keyfiles", multiple=True, type=click.Path(dir_okay=False))
+@click.argument("infiles", nargs=-1, required=True, type=click.Path(dir_okay=False))
+@copy_doc(inspect)
+def cli_inspect(identify, password, keyfiles, infiles):
+    return inspect(infiles=infiles, identify=identify, ask_password=password, keyfiles=keyfiles)
+
+
+@main.command("rekey")
+@click.option("-r", "--recipient", "recipients", multiple=True, help="New recipient")
+@click.option("-p", "--password", is_flag=True)
+@click.option("-k", "--keyfile", "keyfiles", multiple=True, type=click.Path(dir_okay=False))
+@click.option("-j", "--jobs", type=click.IntRange(min=1), default=1, help="Rekeying threads")
+@click.argument("paths", nargs=-1, required=True, type=click.Path(exists=True))
+@copy_doc(rekey)
+def cli_rekey(recipients, password, keyfiles, jobs, paths):
+    return rekey(
+        paths=paths, recipients=recipients, ask_password=password, keyfiles=keyfiles, jobs=jobs
     )
 
 
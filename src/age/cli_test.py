@@ -8,7 +8,9 @@ from unittest import mock
 from cryptography.hazmat.primitives.asymmetric.x25519 import X25519PrivateKey
 from pytest import raises
 
-from age.cli import decrypt, encrypt, generate
+from age.cli import decrypt, encrypt, generate, inspect, rekey, verify
+from age.file import Decryptor
+from age.keys.agekey import AgePrivateKey
 
 TEST_KEY = "# created: 2019-11-10T10:00:00\n# age1we7j2tm5yqmhc0we94eg3jcdtu46069dlapzm8qkg90eef08ya6q90qz3l\nAGE-SECRET-KEY-1MZ6SR3NFE7KTRHXPWN6X966HSL8R53ZW459EZ42EWUX204AFJ90QHA8935\n"
 TEST_KEY_PUBLIC = "age1we7j2tm5yqmhc0we94eg3jcdtu46069dlapzm8qkg90eef08ya6q90qz3l"
@@ -106,3 +108,125 @@ def test_decrypt_to_file(fs):
 
     with open(plaintext_filename, "rb") as plaintext_file:
         assert plaintext_file.read() == TEST_PLAINTEXT
+
+
+def test_verify(fs, capsys):
+    keys_filename = os.path.expanduser("~/.config/age/keys.txt")
+    fs.create_file(keys_filename, contents=TEST_KEY)
+
+    ciphertext_filename = "/tmp/test.age"
+    fs.create_file(ciphertext_filename, contents=TEST_CIPHERTEXT)
+
+    verify(ciphertext_filename)
+    captured = capsys.readouterr()
+    assert captured.out == "/tmp/test.age: OK\n"
+
+
+def test_verify_corrupted(fs, capsys):
+    keys_filename = os.path.expanduser("~/.config/age/keys.txt")
+    fs.create_file(keys_filename, contents=TEST_KEY)
+
+    ciphertext_filename = "/tmp/test.age"
+    fs.create_file(ciphertext_filename, contents=TEST_CIPHERTEXT[:-1] + b"\x00")
+
+    with should_exit(1):
+        verify(ciphertext_filename)
+    captured = capsys.readouterr()
+    assert captured.err == f"/tmp/test.age: corrupted chunk at offset {len(TEST_CIPHERTEXT) - 28}\n"
+
+
+def test_verify_unreadable(fs, capsys):
+    keys_filename = os.path.expanduser("~/.config/age/keys.txt")
+    fs.create_file(keys_filename, contents=TEST_KEY)
+
+    fs.create_file("/tmp/damaged.age", contents=b"age-encryption.org/v2\n")
+    with should_exit(1):
+        verify("/tmp/damaged.age")
+    assert capsys.readouterr().err == "/tmp/damaged.age: File signature not found.\n"
+
+    fs.remove_object(keys_filename)
+    fs.create_file(keys_filename, contents=AgePrivateKey.generate().private_string())
+    fs.create_file("/tmp/test.age", contents=TEST_CIPHERTEXT)
+    with should_exit(1):
+        verify("/tmp/test.age")
+    assert capsys.readouterr().err == "/tmp/test.age: No matching key\n"
+
+
+def test_encrypt_ascii_armored(fs, capsysbinary):
+    with mock.patch("os.urandom", fake_random):
+        encrypt(recipients=[TEST_KEY_PUBLIC], infile=io.BytesIO(TEST_PLAINTEXT), ascii_armored=True)
+    armored = capsysbinary.readouterr().out
+    assert armored.startswith(b"-----BEGIN AGE ENCRYPTED FILE-----\n")
+    assert armored.endswith(b"\n-----END AGE ENCRYPTED FILE-----\n")
+
+    keys_filename = os.path.expanduser("~/.config/age/keys.txt")
+    fs.create_file(keys_filename, contents=TEST_KEY)
+    decrypt(infile=io.BytesIO(armored), ascii_armored=True)
+    assert capsysbinary.readouterr().out == TEST_PLAINTEXT
+
+
+def test_inspect(fs, capsys):
+    ciphertext_filename = "/tmp/test.age"
+    fs.create_file(ciphertext_filename, contents=TEST_CIPHERTEXT)
+
+    inspect([ciphertext_filename])
+    captured = capsys.readouterr()
+    assert captured.out == "/tmp/test.age: 1 recipient, header 168 bytes\n  1. X25519\n"
+
+
+def test_inspect_identify(fs, capsys):
+    keys_filename = os.path.expanduser("~/.config/age/keys.txt")
+    fs.create_file(keys_filename, contents=TEST_KEY)
+
+    ciphertext_filename = "/tmp/test.age"
+    fs.create_file(ciphertext_filename, contents=TEST_CIPHERTEXT)
+
+    inspect([ciphertext_filename], identify=True)
+    captured = capsys.readouterr()
+    assert captured.out.endswith(f"  identity: <AgePrivateKey {TEST_KEY_PUBLIC}> (stanza 1)\n")
+
+
+def test_inspect_malformed(fs, capsys):
+    fs.create_file("/tmp/test.age", contents=TEST_CIPHERTEXT)
+    fs.create_file("/tmp/broken.age", contents=b"not an age file")
+
+    with should_exit(1):
+        inspect(["/tmp/broken.age", "/tmp/test.age"])
+    captured = capsys.readouterr()
+    assert captured.err == "/tmp/broken.age: File signature not found.\n"
+    assert captured.out.startswith("/tmp/test.age: 1 recipient")
+
+
+def test_rekey(fs, capsys):
+    keys_filename = os.path.expanduser("~/.config/age/keys.txt")
+    fs.create_file(keys_filename, contents=TEST_KEY)
+
+    fs.create_file("/tmp/a/test.age", contents=TEST_CIPHERTEXT)
+    fs.create_file("/tmp/b/test.age", contents=TEST_CIPHERTEXT)
+    fs.create_file("/tmp/b/c/broken.age", contents=b"not an age file")
+
+    other_key = AgePrivateKey.generate()
+    with should_exit(1):
+        rekey(
+            ["/tmp/a/test.age", "/tmp/b"],
+            recipients=[TEST_KEY_PUBLIC, other_key.public_key().public_string()],
+        )
+    captured = capsys.readouterr()
+    assert captured.out == "/tmp/a/test.age: OK\n/tmp/b/test.age: OK\n"
+    assert captured.err == "/tmp/b/c/broken.age: File signature not found.\n"
+
+    with open("/tmp/b/test.age", "rb") as infile:
+        assert infile.read().endswith(TEST_CIPHERTEXT[-44:])
+    with open("/tmp/b/test.age", "rb") as infile, Decryptor([other_key], infile) as decryptor:
+        assert decryptor.read() == TEST_PLAINTEXT
+
+
+def test_rekey_no_recipient(capsys):
+    with should_exit(1):
+        rekey(["/tmp/test.age"])
+    assert capsys.readouterr().err == "You must specify at least one recipient.\n"
+
+
+def test_encrypt_target_ms_requires_password(capsys):
+    with should_exit(1):
+        encrypt([TEST_KEY_PUBLIC], infile=io.BytesIO(TEST_PLAINTEXT), target_ms=100)
@@ -1,122 +1,877 @@
+import concurrent.futures
+import contextlib
 import io
+import math
+import mmap
+import os
 import sys
 import typing
 
-from age.exceptions import UnknownRecipient
+from cryptography.exceptions import InvalidTag
+
+from age.exceptions import NoIdentity, UnknownRecipient
 from age.format import Header, Recipient, dump_header, load_header
 from age.keys.base import DecryptionKey, EncryptionKey
+from age.primitives.aead import new_aead
 from age.primitives.hkdf import hkdf
 from age.primitives.hmac import HMAC
 from age.primitives.random import random
-from age.recipients.helpers import decrypt_file_key, generate_recipient_from_key, get_recipient
-from age.stream import stream_decrypt, stream_encrypt
-
-__all__ = ["Encryptor", "Decryptor"]
+from age.recipients.base import Recipient as RecipientStanza
+from age.recipients.helpers import (
+    decrypt_file_key,
+    generate_recipient_from_key,
+    get_recipient,
+    unwrap_file_key,
+)
+from age.recipients.scrypt import SCryptRecipient
+from age.stream import (
+    CIPHERTEXT_BLOCK_SIZE,
+    CIPHERTEXT_BUFFERS,
+    PLAINTEXT_BLOCK_SIZE,
+    PLAINTEXT_BUFFERS,
+    chunk_count,
+    ciphertext_size,
+    decrypt_chunk,
+    decrypt_chunk_into,
+    encrypt_chunk,
+    encrypt_chunk_into,
+    plaintext_size,
+    read_chunks,
+    read_chunks_pooled,
+    stream_decrypt_into,
+    stream_encrypt_into,
+)
+from age.utils.concurrency import OrderedExecutor
+
+__all__ = [
+    "Encryptor",
+    "Decryptor",
+    "encrypt_file",
+    "decrypt_file",
+    "verify_file",
+    "write_header",
+    "decrypt_header",
+    "inspect_header",
+    "inspect_file",
+    "StanzaInfo",
+    "HeaderInfo",
+    "payload_key",
+]
 
 HEADER_HKDF_LABEL = b"header"
 PAYLOAD_HKDF_LABEL = b"payload"
 
 
+def _hkdf(file_key: bytes, label: bytes, salt: bytes = b"") -> bytes:
+    return hkdf(salt, label, file_key, 32)
+
+
+def payload_key(file_key: bytes, nonce: bytes) -> bytes:
+    """Derive the payload key from the ``file_key`` and the 16-byte payload ``nonce``"""
+    return _hkdf(file_key, PAYLOAD_HKDF_LABEL, nonce)
+
+
+def _generate_stanza(key: EncryptionKey, file_key: bytes) -> Recipient:
+    recipient = generate_recipient_from_key(key, file_key)
+    recipient_args, recipient_body = recipient.dump()
+    return Recipient(
+        recipient.TAG.encode("ascii"),
+        [argument.encode("ascii") for argument in recipient_args],
+        recipient_body.encode("ascii"),
+    )
+
+
+def write_header(
+    keys: typing.Collection[EncryptionKey],
+    file_key: bytes,
+    stream: typing.BinaryIO,
+    workers: int = 1,
+) -> None:
+    """Wrap ``file_key`` for each of the ``keys`` and write the authenticated header to ``stream``
+
+    With ``workers`` greater than one, the file key is wrapped for several keys in parallel on a
+    thread pool. The stanzas are written in the order of ``keys`` either way.
+
+    :param keys: Recipient public keys
+    :param file_key: 16-byte file key
+    :param stream: Output stream
+    :param workers: Number of threads wrapping the file key
+    """
+    header = Header()
+
+    if workers > 1 and len(keys) > 1:
+        with OrderedExecutor(min(workers, len(keys))) as executor:
+            header.recipients.extend(
+                executor.map(lambda key: _generate_stanza(key, file_key), keys)
+            )
+    else:
+        header.recipients.extend(_generate_stanza(key, file_key) for key in keys)
+
+    dump_header(header, stream, hmac=HMAC(_hkdf(file_key, HEADER_HKDF_LABEL)))
+
+
+def _start_payload(file_key: bytes, stream: typing.BinaryIO) -> bytes:
+    """Write the payload nonce to ``stream`` and return the payload key"""
+    stream.write(b"\n")
+
+    nonce = random(16)
+    stream.write(nonce)
+
+    return payload_key(file_key, nonce)
+
+
+def _load_recipient(header_recipient: Recipient) -> RecipientStanza:
+    # the parser only accepts ASCII headers
+    return get_recipient(
+        header_recipient.type.decode("ascii"),
+        [argument.decode("ascii") for argument in header_recipient.arguments],
+        header_recipient.body.decode("ascii"),
+    )
+
+
+def decrypt_header(
+    identities: typing.Collection[DecryptionKey], stream: typing.BinaryIO, workers: int = 1
+) -> bytes:
+    """Read the header from ``stream``, unwrap the file key and verify the header MAC
+
+    :param identities: Private keys to try (or an :class:`age.recipients.helpers.IdentityStore`)
+    :param stream: Input stream, positioned at the start of the file
+    :param workers: Number of threads trying identities on stanzas concurrently (see
+        :func:`age.recipients.helpers.decrypt_file_key`)
+    :returns: 16-byte file key
+    :raises age.exceptions.NoIdentity: if none of the ``identities`` matches
+    :raises cryptography.exceptions.InvalidSignature: if the header MAC does not verify
+    """
+    header, mac = load_header(stream)
+
+    recipients = []
+    for header_recipient in header.recipients:
+        try:
+            recipients.append(_load_recipient(header_recipient))
+        except UnknownRecipient:
+            type = header_recipient.type.decode("ascii")
+            print(f"Ignoring unknown recipient type '{type}'", file=sys.stderr)
+
+    file_key = decrypt_file_key(recipients, identities, workers)
+    # the MAC covers the header exactly as it was read
+    assert header.raw is not None
+    HMAC(_hkdf(file_key, HEADER_HKDF_LABEL)).verify(header.raw, mac)
+    # TODO: Should we try another identity if HMAC validation fails?
+
+    return file_key
+
+
+class StanzaInfo(typing.NamedTuple):
+    """Description of a recipient stanza, as returned by :func:`inspect_header`"""
+
+    type: str
+    """Stanza type, e.g. ``X25519`` or ``ssh-ed25519``"""
+
+    arguments: typing.List[str]
+    """Stanza arguments as they appear in the header"""
+
+    fingerprint: typing.Optional[bytes]
+    """Public key fingerprint of ``ssh-rsa`` and ``ssh-ed25519`` stanzas"""
+
+    log_cost: typing.Optional[int]
+    """Work factor (base-2 logarithm of the scrypt cost) of ``scrypt`` stanzas"""
+
+
+class HeaderInfo(typing.NamedTuple):
+    """Description of a header, as returned by :func:`inspect_header`"""
+
+    stanzas: typing.List[StanzaInfo]
+    """Recipient stanzas, in header order"""
+
+    header_size: int
+    """Size of the header in bytes, including the MAC line"""
+
+    identity: typing.Optional[DecryptionKey] = None
+    """Identity which unwraps the file key, if any was found"""
+
+    stanza_index: typing.Optional[int] = None
+    """Index of the stanza unwrapped by :attr:`identity`"""
+
+
+def inspect_header(
+    stream: typing.BinaryIO, identities: typing.Optional[typing.Collection[DecryptionKey]] = None
+) -> HeaderInfo:
+    """Describe the header read from ``stream``, without reading the payload
+
+    With ``identities``, the stanzas are matched against them as in :func:`decrypt_header`, and
+    the identity which unwraps the file key is reported. Its stanza is only reported if the header
+    MAC verifies.
+
+    :param stream: Input stream, positioned at the start of the file
+    :param identities: Private keys to try (or an :class:`age.recipients.helpers.IdentityStore`)
+    :returns: Description of the header
+    :raises age.exceptions.ParserError: if the header is malformed
+    :raises cryptography.exceptions.InvalidSignature: if an identity unwraps the file key, but the
+        header MAC does not verify
+    """
+    header, mac = load_header(stream)
+    assert header.raw is not None and header.size is not None
+
+    stanzas = []
+    recipients: typing.Dict[RecipientStanza, int] = {}
+    for index, header_recipient in enumerate(header.recipients):
+        type = header_recipient.type.decode("ascii")
+        arguments = [argument.decode("ascii") for argument in header_recipient.arguments]
+        try:
+            recipient = _load_recipient(header_recipient)
+        except UnknownRecipient:
+            stanzas.append(StanzaInfo(type, arguments, None, None))
+            continue
+
+        recipients[recipient] = index
+        log_cost = recipient.log_cost if isinstance(recipient, SCryptRecipient) else None
+        stanzas.append(StanzaInfo(type, arguments, recipient.fingerprint, log_cost))
+
+    info = HeaderInfo(stanzas, header.size)
+    if not identities:
+        return info
+
+    try:
+        recipient, identity, file_key = unwrap_file_key(list(recipients), identities)
+    except NoIdentity:
+        return info
+
+    HMAC(_hkdf(file_key, HEADER_HKDF_LABEL)).verify(header.raw, mac)
+    return info._replace(identity=identity, stanza_index=recipients[recipient])
+
+
+def inspect_file(
+    path: typing.Union[str, os.PathLike],
+    identities: typing.Optional[typing.Collection[DecryptionKey]] = None,
+) -> HeaderInfo:
+    """Describe the header of the file at ``path`` (see :func:`inspect_header`)"""
+    with open(path, "rb") as file:
+        return inspect_header(file, identities)
+
+
+def _check_open(stream: io.IOBase) -> None:
+    # the pooled buffers of a closed encryptor or decryptor may already be used by another one
+    if stream.closed:
+        raise ValueError("I/O operation on closed file.")
+
+
+def _read_payload_key(file_key: bytes, stream: typing.BinaryIO) -> bytes:
+    """Read the payload nonce from ``stream`` and return the payload key"""
+    nonce = stream.read(16)
+    assert len(nonce) == 16, "Could not read nonce"
+
+    return payload_key(file_key, nonce)
+
+
 class Encryptor(io.RawIOBase):
-    def __init__(self, keys: typing.Collection[EncryptionKey], stream: typing.BinaryIO):
+    """Encrypt data written to this object and pass the ciphertext on to ``stream``
+
+    Plaintext is encrypted in chunks of :data:`age.stream.PLAINTEXT_BLOCK_SIZE` bytes as soon as
+    it is known that more data follows, so at most one chunk is held in memory. The final chunk is
+    written on :meth:`close`.
+
+    With ``workers`` greater than one, the recipient stanzas are generated and chunks are
+    encrypted on a thread pool. At most ``window`` chunks are in flight; their ciphertext is
+    written to ``stream`` in order.
+    """
+
+    def __init__(
+        self,
+        keys: typing.Collection[EncryptionKey],
+        stream: typing.BinaryIO,
+        workers: int = 1,
+        window: typing.Optional[int] = None,
+    ):
         self._stream: typing.BinaryIO = stream
         self._file_key: bytes = random(16)
 
-        self._plaintext_buffer: bytes = b""
+        # given back to the pools on close()
+        self._plaintext_buffer: typing.Optional[bytearray] = PLAINTEXT_BUFFERS.acquire()
+        self._ciphertext_buffer: typing.Optional[bytearray] = CIPHERTEXT_BUFFERS.acquire()
+        self._buffered: int = 0
+        self._chunk_counter: int = 0
 
-        self._write_header(keys)
+        self._executor: typing.Optional[OrderedExecutor] = None
+        if workers > 1:
+            self._executor = OrderedExecutor(workers, window)
+
+        self._write_header(keys, workers)
+        self._start_payload()
 
     def writable(self):
         return True
 
     def write(self, data):
-        self._plaintext_buffer += data
-        return len(data)
+        _check_open(self)
+        assert self._plaintext_buffer is not None
 
-    def close(self):
-        if not self.closed:
-            self._encrypt_buffer()
-            super().close()
+        view = memoryview(data).cast("B")
+        size = len(view)
 
-    def _hkdf(self, label: bytes, salt: bytes = b"") -> bytes:
-        return hkdf(salt, label, self._file_key, 32)
+        while view:
+            if not self._buffered and len(view) > PLAINTEXT_BLOCK_SIZE:
+                # a whole chunk which is not the last one, no need to buffer it
+                self._encrypt_block(view[:PLAINTEXT_BLOCK_SIZE], last_block=False)
+                view = view[PLAINTEXT_BLOCK_SIZE:]
+                continue
 
-    def _write_header(self, keys):
-        header = Header()
+            if self._buffered == PLAINTEXT_BLOCK_SIZE:
+                # more data follows, so the buffered chunk is not the last one
+                self._encrypt_buffer(last_block=False)
 
-        for key in keys:
-            recipient = generate_recipient_from_key(key, self._file_key)
-            recipient_args, recipient_body = recipient.dump()
-            header.recipients.append(Recipient(recipient.TAG, recipient_args, recipient_body))
+            n = min(PLAINTEXT_BLOCK_SIZE - self._buffered, len(view))
+            self._plaintext_buffer[self._buffered : self._buffered + n] = view[:n]
+            self._buffered += n
+            view = view[n:]
 
-        header_stream = io.BytesIO()
-        dump_header(header, header_stream, mac=None)
+        return size
 
-        mac = HMAC(self._hkdf(HEADER_HKDF_LABEL)).generate(header_stream.getvalue())
-        dump_header(header, self._stream, mac=mac)
+    def close(self):
+        if not self.closed:
+            try:
+                self._encrypt_buffer(last_block=True)
+                if self._executor is not None:
+                    for ciphertext in self._executor.drain():
+                        self._stream.write(ciphertext)
+            finally:
+                if self._executor is not None:
+                    self._executor.shutdown(cancel=True)
+                super().close()
+
+                assert self._plaintext_buffer is not None and self._ciphertext_buffer is not None
+                PLAINTEXT_BUFFERS.release(self._plaintext_buffer)
+                CIPHERTEXT_BUFFERS.release(self._ciphertext_buffer)
+                self._plaintext_buffer = self._ciphertext_buffer = None
+
+    def _write_header(self, keys, workers: int):
+        write_header(keys, self._file_key, self._stream, workers)
+
+    def _start_payload(self):
+        self._aead = new_aead(_start_payload(self._file_key, self._stream))
+
+    def _encrypt_buffer(self, last_block: bool):
+        assert self._plaintext_buffer is not None
+        with memoryview(self._plaintext_buffer) as view:
+            self._encrypt_block(view[: self._buffered], last_block)
+        self._buffered = 0
+
+    def _encrypt_block(self, block, last_block: bool):
+        if self._executor is not None:
+            # the block is copied, as the caller may reuse its buffer before it is encrypted
+            args = (self._aead, self._chunk_counter, bytes(block), last_block)
+            for ciphertext in self._executor.submit(encrypt_chunk, *args):
+                self._stream.write(ciphertext)
+        else:
+            assert self._ciphertext_buffer is not None
+            size = encrypt_chunk_into(
+                self._aead, self._chunk_counter, block, last_block, self._ciphertext_buffer
+            )
+            with memoryview(self._ciphertext_buffer) as ciphertext_view:
+                self._stream.write(ciphertext_view[:size])
+
+        self._chunk_counter += 1
 
-    def _encrypt_buffer(self):
-        self._stream.write(b"\n")
 
-        nonce = random(16)
-        self._stream.write(nonce)
+class Decryptor(io.RawIOBase):
+    """Decrypt data read from ``stream``
+
+    The header is decrypted on construction. The payload is read, authenticated and decrypted
+    chunk by chunk while reading from this object, so only a few chunks are held in memory at
+    any time.
+
+    If ``stream`` is seekable, so is the decryptor: :meth:`seek` and :meth:`read_range` only
+    decrypt the chunks covering the requested data.
+
+    With ``workers`` greater than one, identities are tried on the header stanzas concurrently,
+    and chunks following the current position are read ahead and decrypted on a thread pool, with
+    at most ``window`` chunks in flight. Reading fails as soon as any of them fails to
+    authenticate.
+
+    ``identities`` may be an :class:`age.recipients.helpers.IdentityStore`, which is preferable
+    for large numbers of identities.
+    """
+
+    def __init__(
+        self,
+        identities: typing.Collection[DecryptionKey],
+        stream: typing.BinaryIO,
+        workers: int = 1,
+        window: typing.Optional[int] = None,
+    ):
+        self._stream: typing.BinaryIO = stream
+        self._file_key: typing.Optional[bytes] = None
 
-        stream_key = self._hkdf(PAYLOAD_HKDF_LABEL, nonce)
-        ciphertext = stream_encrypt(stream_key, self._plaintext_buffer)
-        self._stream.write(ciphertext)
+        self._executor: typing.Optional[OrderedExecutor] = None
+        if workers > 1:
+            self._executor = OrderedExecutor(workers, window)
 
-        self._plaintext_buffer = b""
+        self._position: int = 0
+        self._chunk_index: int = -1
+        # index of the chunk _plaintext_chunks yields next, -1 if the iterator is stale
+        self._next_chunk_index: int = -1
+        self._plaintext_chunk: typing.Union[bytes, memoryview] = b""
+        self._failure: typing.Optional[Exception] = None
 
+        # chunks are read and decrypted into the same buffers over and over, until close() gives
+        # them back to the pools
+        self._plaintext_buffer: typing.Optional[bytearray] = PLAINTEXT_BUFFERS.acquire()
+        self._ciphertext_buffer: typing.Optional[bytearray] = CIPHERTEXT_BUFFERS.acquire()
+        self._plaintext_view: typing.Optional[memoryview] = memoryview(self._plaintext_buffer)
+        self._ciphertext_view: typing.Optional[memoryview] = memoryview(self._ciphertext_buffer)
 
-class Decryptor(io.RawIOBase):
-    def __init__(self, identities: typing.Collection[DecryptionKey], stream: typing.BinaryIO):
-        self._stream: typing.BinaryIO = stream
-        self._file_key: typing.Optional[bytes] = None
-        self._plaintext_stream: typing.Optional[typing.BinaryIO] = None
+        # only known for seekable streams
+        self._payload_start: typing.Optional[int] = None
+        self._chunk_count: int = 0
+        self._plaintext_size: int = 0
 
-        self._decrypt_header(identities)
-        self._decrypt_body()
+        self._decrypt_header(identities, workers)
+        self._start_payload()
 
     def readable(self):
         return True
 
-    def read(self, size=-1):
-        assert self._plaintext_stream is not None
-        return self._plaintext_stream.read(size)
+    def close(self):
+        if not self.closed:
+            if self._executor is not None:
+                self._executor.shutdown(cancel=True)
 
-    def _hkdf(self, label: bytes, salt: bytes = b"") -> bytes:
-        assert self._file_key is not None
-        return hkdf(salt, label, self._file_key, 32)
+            # stop reading into the pooled buffers before giving them back
+            self._plaintext_chunks = iter(())
+            self._plaintext_chunk = b""
+            self._chunk_index = self._next_chunk_index = -1
+            super().close()
 
-    def _decrypt_header(self, identities: typing.Collection[DecryptionKey]):
-        header, mac = load_header(self._stream)
+            assert self._plaintext_view is not None and self._ciphertext_view is not None
+            assert self._plaintext_buffer is not None and self._ciphertext_buffer is not None
+            self._plaintext_view.release()
+            self._ciphertext_view.release()
+            PLAINTEXT_BUFFERS.release(self._plaintext_buffer)
+            CIPHERTEXT_BUFFERS.release(self._ciphertext_buffer)
+            self._plaintext_view = self._ciphertext_view = None
+            self._plaintext_buffer = self._ciphertext_buffer = None
+
+    def seekable(self):
+        return self._payload_start is not None
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        _check_open(self)
+        if not self.seekable():
+            raise io.UnsupportedOperation("underlying stream is not seekable")
+
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self._plaintext_size + offset
+        else:
+            raise ValueError(f"invalid whence ({whence!r})")
+
+        if position < 0:
+            raise ValueError(f"negative seek position {position}")
+
+        self._position = position
+        return self._position
 
-        recipients = []
-        for header_recipient in header.recipients:
-            try:
-                recipient = get_recipient(
-                    header_recipient.type, header_recipient.arguments, header_recipient.body
-                )
-            except UnknownRecipient:
-                print(f"Ignoring unknown recipient type '{header_recipient.type}'", file=sys.stderr)
-            else:
-                recipients.append(recipient)
-
-        self._file_key = decrypt_file_key(recipients, identities)
-        header_stream = io.BytesIO()
-        dump_header(header, header_stream, mac=None)
-        HMAC(self._hkdf(HEADER_HKDF_LABEL)).verify(header_stream.getvalue(), mac)
-        # TODO: Should we try another identity if HMAC validation fails?
-
-    def _decrypt_body(self):
+    def read(self, size=-1):
+        if size is None or size < 0:
+            return self.readall()
+
+        buffer = bytearray(size)
+        length = self.readinto(buffer)
+        del buffer[length:]
+        return bytes(buffer)
+
+    def readall(self):
+        parts = []
+        while True:
+            chunk = self.read(PLAINTEXT_BLOCK_SIZE)
+            if not chunk:
+                break
+            parts.append(chunk)
+        return b"".join(parts)
+
+    def readinto(self, buffer):
+        _check_open(self)
+        view = memoryview(buffer).cast("B")
+
+        length = 0
+        while length < len(view):
+            index, offset = divmod(self._position, PLAINTEXT_BLOCK_SIZE)
+            chunk = self._get_chunk(index)
+            if offset >= len(chunk):
+                break
+
+            n = min(len(view) - length, len(chunk) - offset)
+            view[length : length + n] = chunk[offset : offset + n]
+            self._position += n
+            length += n
+
+        return length
+
+    def decrypt_into(self, buffer) -> int:
+        """Decrypt the remaining plaintext into ``buffer``
+
+        For seekable streams, the size of ``buffer`` is checked first and every chunk is read
+        into one reused buffer and decrypted directly into ``buffer``, so nothing is allocated
+        per chunk. Other streams fall back to :meth:`readinto`.
+
+        :param buffer: Writable buffer
+        :returns: Number of bytes written to ``buffer``
+        :raises ValueError: if ``buffer`` cannot hold the remaining plaintext, or if the decryptor
+            is closed
+        """
+        _check_open(self)
+        view = memoryview(buffer).cast("B")
+        if not self.seekable():
+            length = self.readinto(view)
+            if self.read(1):
+                raise ValueError("buffer too small for the remaining plaintext")
+            return length
+
+        remaining = max(self._plaintext_size - self._position, 0)
+        if len(view) < remaining:
+            raise ValueError(f"buffer too small ({len(view)} < {remaining} bytes)")
+
+        # complete a partially read chunk from the cache, readinto() advances the position
+        length = 0
+        if self._position % PLAINTEXT_BLOCK_SIZE:
+            length = self.readinto(
+                view[: PLAINTEXT_BLOCK_SIZE - self._position % PLAINTEXT_BLOCK_SIZE]
+            )
+        completed = length
+
+        ciphertext_view = self._ciphertext_view
+        assert ciphertext_view is not None
+        for index in range(self._position // PLAINTEXT_BLOCK_SIZE, self._chunk_count):
+            block = ciphertext_view[: self._read_chunk_at(index, ciphertext_view)]
+            last_block = index == self._chunk_count - 1
+            length += decrypt_chunk_into(self._aead, index, block, last_block, view[length:])
+
+        self._position += length - completed
+        # the cached chunk and any read-ahead are stale now
+        self._chunk_index = self._next_chunk_index = -1
+        return length
+
+    def read_range(self, offset: int, length: int) -> bytes:
+        """Decrypt ``length`` bytes of plaintext starting at ``offset``
+
+        Only the chunks covering the requested range are read and decrypted. The current stream
+        position is not changed.
+
+        :param offset: Plaintext offset
+        :param length: Number of bytes to read
+        :returns: Plaintext, shorter than ``length`` if the range extends beyond the end
+        :raises io.UnsupportedOperation: if the underlying stream is not seekable
+        """
+        _check_open(self)
+        if not self.seekable():
+            raise io.UnsupportedOperation("underlying stream is not seekable")
+        if offset < 0 or length < 0:
+            raise ValueError("offset and length must not be negative")
+
+        end = min(offset + length, self._plaintext_size)
+        if end <= offset:
+            return b""
+
+        parts = []
+        for index in range(offset // PLAINTEXT_BLOCK_SIZE, math.ceil(end / PLAINTEXT_BLOCK_SIZE)):
+            chunk = self._decrypt_chunk_at(index)
+            chunk_start = index * PLAINTEXT_BLOCK_SIZE
+            parts.append(chunk[max(offset - chunk_start, 0) : end - chunk_start])
+
+        return b"".join(parts)
+
+    def _decrypt_header(self, identities: typing.Collection[DecryptionKey], workers: int):
+        self._file_key = decrypt_header(identities, self._stream, workers)
+
+    def _start_payload(self):
         assert self._file_key is not None
+        self._aead = new_aead(_read_payload_key(self._file_key, self._stream))
 
-        nonce = self._stream.read(16)
-        assert len(nonce) == 16, "Could not read nonce"
+        if self._stream.seekable():
+            self._payload_start = self._stream.tell()
+            ciphertext_size = self._stream.seek(0, io.SEEK_END) - self._payload_start
+            self._stream.seek(self._payload_start)
 
-        stream_key = self._hkdf(PAYLOAD_HKDF_LABEL, nonce)
-        ciphertext = self._stream.read()
-        plaintext = stream_decrypt(stream_key, ciphertext)
+            self._chunk_count = chunk_count(ciphertext_size)
+            self._plaintext_size = plaintext_size(ciphertext_size)
 
-        self._plaintext_stream = io.BytesIO(plaintext)
-        self._plaintext_stream.seek(0)
+        self._plaintext_chunks: typing.Iterator[bytes] = self._decrypt_chunks(0)
+        self._next_chunk_index = 0
+
+    def _get_chunk(self, index: int) -> typing.Union[bytes, memoryview]:
+        if index != self._chunk_index:
+            if self._failure is not None:
+                raise self._failure
+
+            if index != self._next_chunk_index:
+                # only reachable after seek() or decrypt_into(), which require a seekable stream
+                self._plaintext_chunks = self._decrypt_chunks(index)
+                self._next_chunk_index = index
+
+            # the cached chunk may be overwritten by the next one
+            self._chunk_index = -1
+            try:
+                self._plaintext_chunk = next(self._plaintext_chunks, b"")
+            except Exception as e:
+                # never skip a chunk that failed to decrypt: seekable streams retry the chunk on the
+                # next read, other streams keep failing
+                if self.seekable():
+                    self._plaintext_chunks = self._decrypt_chunks(index)
+                else:
+                    self._failure = e
+                raise
+            self._chunk_index = index
+            self._next_chunk_index = index + 1
+
+        return self._plaintext_chunk
+
+    def _decrypt_chunks(self, start: int) -> typing.Iterator[typing.Union[bytes, memoryview]]:
+        if self._executor is not None:
+
+            def decrypt(args: typing.Tuple[int, bytes, bool]) -> bytes:
+                return decrypt_chunk(self._aead, *args)
+
+            # discard chunks read ahead for the previous position
+            self._executor.cancel()
+            return self._executor.map(decrypt, self._read_chunks(start))
+        else:
+            plaintext_view = self._plaintext_view
+            assert plaintext_view is not None
+
+            def decrypt_into(args: typing.Tuple[int, memoryview, bool]) -> memoryview:
+                size = decrypt_chunk_into(self._aead, *args, plaintext_view)
+                return plaintext_view[:size]
+
+            return map(decrypt_into, self._read_chunks_into(start))
+
+    def _read_chunks(self, start: int) -> typing.Iterator[typing.Tuple[int, bytes, bool]]:
+        if self.seekable():
+            for index in range(start, self._chunk_count):
+                yield index, self._read_chunk_at(index), index == self._chunk_count - 1
+        else:
+            for index, (block, last_block) in enumerate(read_chunks(self._stream)):
+                yield index, block, last_block
+
+    def _read_chunks_into(self, start: int) -> typing.Iterator[typing.Tuple[int, memoryview, bool]]:
+        # every chunk is only valid until the next one is read
+        ciphertext_view = self._ciphertext_view
+        assert ciphertext_view is not None
+        if self.seekable():
+            for index in range(start, self._chunk_count):
+                block = ciphertext_view[: self._read_chunk_at(index, ciphertext_view)]
+                yield index, block, index == self._chunk_count - 1
+        else:
+            for index, (block, last_block) in enumerate(read_chunks_pooled(self._stream)):
+                yield index, block, last_block
+
+    @typing.overload
+    def _read_chunk_at(self, index: int) -> bytes:
+        ...
+
+    @typing.overload
+    def _read_chunk_at(self, index: int, buffer: memoryview) -> int:
+        ...
+
+    def _read_chunk_at(self, index, buffer=None):
+        assert self._payload_start is not None
+        self._stream.seek(self._payload_start + index * CIPHERTEXT_BLOCK_SIZE)
+        if buffer is None:
+            return self._stream.read(CIPHERTEXT_BLOCK_SIZE)
+        else:
+            return self._stream.readinto(buffer)
+
+    def _decrypt_chunk_at(self, index: int) -> bytes:
+        # the last chunk is identified by the payload length, as chunks may be read in any order
+        block = self._read_chunk_at(index)
+        return decrypt_chunk(self._aead, index, block, index == self._chunk_count - 1)
+
+
+@contextlib.contextmanager
+def _map_file(file: typing.BinaryIO, access: int) -> typing.Iterator[memoryview]:
+    size = os.fstat(file.fileno()).st_size
+    if size == 0:
+        # empty files cannot be mapped
+        yield memoryview(bytearray())
+        return
+
+    mapped = mmap.mmap(file.fileno(), 0, access=access)
+    try:
+        with memoryview(mapped) as view:
+            yield view
+    finally:
+        try:
+            mapped.close()
+        except BufferError:
+            # slices of the mapping are still referenced (e.g. by a traceback), it is unmapped
+            # once they are garbage collected
+            pass
+
+
+def encrypt_file(
+    src_path: typing.Union[str, os.PathLike],
+    dst_path: typing.Union[str, os.PathLike],
+    keys: typing.Collection[EncryptionKey],
+    workers: int = 1,
+) -> None:
+    """Encrypt the file at ``src_path`` for ``keys`` and write the result to ``dst_path``
+
+    Both files are memory-mapped: chunks are encrypted straight from the mapped source into the
+    mapped destination, which is preallocated to its final size. This handles files larger than
+    the available memory without copying data through Python buffers.
+
+    :param src_path: Plaintext file
+    :param dst_path: Ciphertext file (will be overwritten)
+    :param keys: Recipient public keys
+    :param workers: Number of threads generating stanzas and encrypting chunks in parallel
+    """
+    file_key = random(16)
+
+    with open(src_path, "rb") as src, open(dst_path, "wb+") as dst:
+        write_header(keys, file_key, dst, workers)
+        payload_key = _start_payload(file_key, dst)
+        payload_start = dst.tell()
+
+        size = os.fstat(src.fileno()).st_size
+        dst.truncate(payload_start + ciphertext_size(size))
+        dst.flush()
+
+        with _map_file(src, mmap.ACCESS_READ) as plaintext, _map_file(
+            dst, mmap.ACCESS_WRITE
+        ) as ciphertext:
+            stream_encrypt_into(payload_key, plaintext, ciphertext[payload_start:], workers)
+
+
+def decrypt_file(
+    src_path: typing.Union[str, os.PathLike],
+    dst_path: typing.Union[str, os.PathLike],
+    identities: typing.Collection[DecryptionKey],
+    workers: int = 1,
+) -> None:
+    """Decrypt the file at ``src_path`` with ``identities`` and write the result to ``dst_path``
+
+    Like :func:`encrypt_file`, both files are memory-mapped. If authentication of the payload
+    fails, ``dst_path`` is removed.
+
+    :param src_path: Ciphertext file
+    :param dst_path: Plaintext file (will be overwritten)
+    :param identities: Private keys to try
+    :param workers: Number of threads unwrapping the file key and decrypting chunks in parallel
+    :raises cryptography.exceptions.InvalidTag: if authentication of any chunk fails
+    """
+    with open(src_path, "rb") as src:
+        file_key = decrypt_header(identities, src, workers)
+        payload_key = _read_payload_key(file_key, src)
+        payload_start = src.tell()
+
+        size = os.fstat(src.fileno()).st_size
+        try:
+            with open(dst_path, "wb+") as dst:
+                dst.truncate(plaintext_size(size - payload_start))
+                dst.flush()
+
+                with _map_file(src, mmap.ACCESS_READ) as ciphertext, _map_file(
+                    dst, mmap.ACCESS_WRITE
+                ) as plaintext:
+                    stream_decrypt_into(payload_key, ciphertext[payload_start:], plaintext, workers)
+        except BaseException:
+            # do not leave (partially) unauthenticated plaintext behind
+            os.remove(dst_path)
+            raise
+
+
+VERIFY_BATCH_SIZE = 256
+"""Number of chunks authenticated per task by :func:`verify_file`"""
+
+
+def _verify_chunks(
+    path: typing.Union[str, os.PathLike],
+    key: bytes,
+    payload_start: int,
+    start: int,
+    stop: int,
+    count: int,
+) -> typing.Optional[int]:
+    """Authenticate chunks ``start`` to ``stop`` and return the index of the first bad one"""
+    aead = new_aead(key)
+
+    with open(path, "rb") as file, PLAINTEXT_BUFFERS.buffer() as plaintext:
+        with CIPHERTEXT_BUFFERS.buffer() as ciphertext, memoryview(ciphertext) as view:
+            for index in range(start, stop):
+                # positional read, so that any chunk range can be checked independently
+                file.seek(payload_start + index * CIPHERTEXT_BLOCK_SIZE)
+                block = view[: file.readinto(view)]
+                try:
+                    decrypt_chunk_into(aead, index, block, index == count - 1, plaintext)
+                except InvalidTag:
+                    return index
+                finally:
+                    block.release()
+
+    return None
+
+
+def verify_file(
+    path: typing.Union[str, os.PathLike],
+    identities: typing.Collection[DecryptionKey],
+    workers: int = 1,
+) -> typing.Optional[int]:
+    """Check the integrity of the file at ``path`` without keeping any plaintext
+
+    The file key is unwrapped with ``identities`` and the header MAC is verified. Then every
+    payload chunk is authenticated. With ``workers`` greater than one, ranges of
+    :data:`VERIFY_BATCH_SIZE` chunks are checked on a pool of processes, each of which reads
+    its chunks from its own file handle.
+
+    :param path: Ciphertext file
+    :param identities: Private keys to try
+    :param workers: Number of processes authenticating chunks in parallel
+    :returns: ``None`` if the file is intact, or the file offset of the first chunk which fails
+        to authenticate (or of the truncated payload nonce, or of the missing first chunk)
+    :raises age.exceptions.NoIdentity: if none of the ``identities`` matches
+    :raises cryptography.exceptions.InvalidSignature: if the header MAC does not verify
+    """
+    with open(path, "rb") as file:
+        file_key = decrypt_header(identities, file, workers)
+        nonce_start = file.tell()
+        nonce = file.read(16)
+        payload_start = file.tell()
+        size = os.fstat(file.fileno()).st_size
+
+    if len(nonce) != 16:
+        return nonce_start
+
+    key = payload_key(file_key, nonce)
+    count = chunk_count(size - payload_start)
+    if count == 0:
+        # even an empty plaintext is encrypted as one (empty) final chunk
+        return payload_start
+    batches = [
+        (path, key, payload_start, start, min(start + VERIFY_BATCH_SIZE, count), count)
+        for start in range(0, count, VERIFY_BATCH_SIZE)
+    ]
+
+    bad_index = None
+    if workers > 1:
+        with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+            futures = [executor.submit(_verify_chunks, *batch) for batch in batches]
+            for future in futures:
+                bad_index = future.result()
+                if bad_index is not None:
+                    # later chunks do not matter any more
+                    for pending in futures:
+                        pending.cancel()
+                    break
+    else:
+        for batch in batches:
+            bad_index = _verify_chunks(*batch)
+            if bad_index is not None:
+                break
+
+    if bad_index is None:
+        return None
+    return payload_start + bad_index * CIPHERTEXT_BLOCK_SIZE
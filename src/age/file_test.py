@@ -15,3 +15,462 @@
 #     key = PasswordKey(b"twitch.tv/filosottile")
 #     with Decryptor([key], stream) as decryptor:
 #         assert decryptor
+
+import io
+import os
+
+import pytest
+from cryptography.exceptions import InvalidTag
+
+from age.file import (
+    Decryptor,
+    Encryptor,
+    decrypt_file,
+    decrypt_header,
+    encrypt_file,
+    inspect_header,
+    verify_file,
+    write_header,
+)
+from age.format import load_header
+from age.keys.agekey import AgePrivateKey
+from age.keys.ed25519 import Ed25519PrivateKey
+from age.keys.password import PasswordKey
+from age.primitives.encode import encode
+from age.primitives.hkdf import hkdf
+from age.primitives.hmac import HMAC
+from age.stream import (
+    CIPHERTEXT_BLOCK_SIZE,
+    CIPHERTEXT_BUFFERS,
+    PLAINTEXT_BLOCK_SIZE,
+    PLAINTEXT_BUFFERS,
+)
+from age.utils.asciiarmor import AGE_PEM_LABEL, AsciiArmoredInput, AsciiArmoredOutput
+
+
+def _encrypt(keys, data, write_size):
+    stream = io.BytesIO()
+    with Encryptor(keys, stream) as encryptor:
+        for i in range(0, len(data), write_size):
+            encryptor.write(data[i : i + write_size])
+    return stream.getvalue()
+
+
+@pytest.mark.parametrize(
+    "size",
+    [0, 1, PLAINTEXT_BLOCK_SIZE - 1, PLAINTEXT_BLOCK_SIZE, PLAINTEXT_BLOCK_SIZE + 1, 200_000],
+)
+@pytest.mark.parametrize("write_size", [1000, PLAINTEXT_BLOCK_SIZE, 3 * PLAINTEXT_BLOCK_SIZE])
+def test_roundtrip(size, write_size):
+    key = AgePrivateKey.generate()
+    data = os.urandom(size)
+
+    ciphertext = _encrypt([key.public_key()], data, write_size)
+
+    with Decryptor([key], io.BytesIO(ciphertext)) as decryptor:
+        assert decryptor.read() == data
+
+
+def test_encryptor_streams_chunks():
+    key = AgePrivateKey.generate()
+    stream = io.BytesIO()
+
+    with Encryptor([key.public_key()], stream) as encryptor:
+        header_size = len(stream.getvalue())
+
+        encryptor.write(b"x" * PLAINTEXT_BLOCK_SIZE)
+        # the chunk might still be the last one, so it must not be written yet
+        assert len(stream.getvalue()) == header_size
+
+        encryptor.write(b"x" * (2 * PLAINTEXT_BLOCK_SIZE + 1))
+        assert len(stream.getvalue()) == header_size + 3 * CIPHERTEXT_BLOCK_SIZE
+
+    assert len(stream.getvalue()) == header_size + 3 * CIPHERTEXT_BLOCK_SIZE + 1 + 16
+
+
+def test_decryptor_partial_reads():
+    key = AgePrivateKey.generate()
+    data = os.urandom(3 * PLAINTEXT_BLOCK_SIZE + 100)
+    ciphertext = _encrypt([key.public_key()], data, PLAINTEXT_BLOCK_SIZE)
+
+    with Decryptor([key], io.BytesIO(ciphertext)) as decryptor:
+        assert decryptor.read(10) == data[:10]
+        assert decryptor.read(PLAINTEXT_BLOCK_SIZE) == data[10 : PLAINTEXT_BLOCK_SIZE + 10]
+
+        buffer = bytearray(PLAINTEXT_BLOCK_SIZE)
+        assert decryptor.readinto(buffer) == PLAINTEXT_BLOCK_SIZE
+        assert buffer == data[PLAINTEXT_BLOCK_SIZE + 10 : 2 * PLAINTEXT_BLOCK_SIZE + 10]
+
+        assert decryptor.read() == data[2 * PLAINTEXT_BLOCK_SIZE + 10 :]
+        assert decryptor.read(10) == b""
+
+
+def test_decryptor_truncated():
+    key = AgePrivateKey.generate()
+    data = os.urandom(2 * PLAINTEXT_BLOCK_SIZE + 100)
+    ciphertext = _encrypt([key.public_key()], data, PLAINTEXT_BLOCK_SIZE)
+
+    # drop the last chunk, the second chunk is not marked as the last one
+    truncated = ciphertext[: -(100 + 16)]
+    with Decryptor([key], io.BytesIO(truncated)) as decryptor:
+        assert decryptor.read(PLAINTEXT_BLOCK_SIZE) == data[:PLAINTEXT_BLOCK_SIZE]
+        with pytest.raises(InvalidTag):
+            decryptor.read()
+
+
+class _NonSeekable(io.BytesIO):
+    def seekable(self):
+        return False
+
+
+def test_decryptor_seek():
+    key = AgePrivateKey.generate()
+    data = os.urandom(3 * PLAINTEXT_BLOCK_SIZE + 100)
+    ciphertext = _encrypt([key.public_key()], data, PLAINTEXT_BLOCK_SIZE)
+
+    with Decryptor([key], io.BytesIO(ciphertext)) as decryptor:
+        assert decryptor.seekable()
+
+        assert decryptor.seek(2 * PLAINTEXT_BLOCK_SIZE + 5) == 2 * PLAINTEXT_BLOCK_SIZE + 5
+        assert (
+            decryptor.read(10) == data[2 * PLAINTEXT_BLOCK_SIZE + 5 : 2 * PLAINTEXT_BLOCK_SIZE + 15]
+        )
+        assert decryptor.tell() == 2 * PLAINTEXT_BLOCK_SIZE + 15
+
+        decryptor.seek(-50, io.SEEK_END)
+        assert decryptor.read() == data[-50:]
+        assert decryptor.read(1) == b""
+
+        decryptor.seek(10)
+        decryptor.seek(PLAINTEXT_BLOCK_SIZE, io.SEEK_CUR)
+        assert (
+            decryptor.read(PLAINTEXT_BLOCK_SIZE)
+            == data[PLAINTEXT_BLOCK_SIZE + 10 : 2 * PLAINTEXT_BLOCK_SIZE + 10]
+        )
+
+        decryptor.seek(0)
+        assert decryptor.read() == data
+
+
+def test_decryptor_read_range():
+    key = AgePrivateKey.generate()
+    data = os.urandom(3 * PLAINTEXT_BLOCK_SIZE)
+    ciphertext = _encrypt([key.public_key()], data, PLAINTEXT_BLOCK_SIZE)
+
+    with Decryptor([key], io.BytesIO(ciphertext)) as decryptor:
+        assert decryptor.read(10) == data[:10]
+
+        start = PLAINTEXT_BLOCK_SIZE - 10
+        assert (
+            decryptor.read_range(start, PLAINTEXT_BLOCK_SIZE + 20)
+            == data[start : start + PLAINTEXT_BLOCK_SIZE + 20]
+        )
+        assert decryptor.read_range(len(data) - 5, 100) == data[-5:]
+        assert decryptor.read_range(len(data), 100) == b""
+        assert decryptor.read_range(5, 0) == b""
+
+        # the stream position is unaffected
+        assert decryptor.tell() == 10
+        assert decryptor.read(10) == data[10:20]
+
+
+def test_decryptor_not_seekable():
+    key = AgePrivateKey.generate()
+    data = os.urandom(PLAINTEXT_BLOCK_SIZE + 100)
+    ciphertext = _encrypt([key.public_key()], data, PLAINTEXT_BLOCK_SIZE)
+
+    with Decryptor([key], _NonSeekable(ciphertext)) as decryptor:
+        assert not decryptor.seekable()
+        with pytest.raises(io.UnsupportedOperation):
+            decryptor.seek(10)
+        with pytest.raises(io.UnsupportedOperation):
+            decryptor.read_range(0, 10)
+        assert decryptor.read() == data
+
+
+@pytest.mark.parametrize("size", [0, PLAINTEXT_BLOCK_SIZE, 10 * PLAINTEXT_BLOCK_SIZE + 1])
+def test_encryptor_parallel(size):
+    key = AgePrivateKey.generate()
+    data = os.urandom(size)
+
+    stream = io.BytesIO()
+    with Encryptor([key.public_key()], stream, workers=4, window=3) as encryptor:
+        encryptor.write(data)
+
+    with Decryptor([key], io.BytesIO(stream.getvalue())) as decryptor:
+        assert decryptor.read() == data
+
+
+@pytest.mark.parametrize("stream_type", [io.BytesIO, _NonSeekable])
+def test_decryptor_parallel(stream_type):
+    key = AgePrivateKey.generate()
+    data = os.urandom(10 * PLAINTEXT_BLOCK_SIZE + 1)
+    ciphertext = _encrypt([key.public_key()], data, PLAINTEXT_BLOCK_SIZE)
+
+    with Decryptor([key], stream_type(ciphertext), workers=4, window=3) as decryptor:
+        assert decryptor.read(100) == data[:100]
+        assert decryptor.read() == data[100:]
+
+
+@pytest.mark.parametrize("stream_type", [io.BytesIO, _NonSeekable])
+@pytest.mark.parametrize("workers", [1, 4])
+def test_decryptor_corrupted_chunk(stream_type, workers):
+    key = AgePrivateKey.generate()
+    data = os.urandom(10 * PLAINTEXT_BLOCK_SIZE)
+    ciphertext = bytearray(_encrypt([key.public_key()], data, PLAINTEXT_BLOCK_SIZE))
+
+    # flip a bit in the fourth chunk
+    ciphertext[-7 * CIPHERTEXT_BLOCK_SIZE] ^= 1
+
+    # a small window keeps the corrupted chunk out of the read-ahead for the first read
+    with Decryptor([key], stream_type(bytes(ciphertext)), workers=workers, window=2) as decryptor:
+        assert decryptor.read(PLAINTEXT_BLOCK_SIZE) == data[:PLAINTEXT_BLOCK_SIZE]
+        with pytest.raises(InvalidTag):
+            decryptor.read()
+        # the failing chunk is never skipped
+        with pytest.raises(InvalidTag):
+            decryptor.read()
+
+
+@pytest.mark.parametrize("size", [0, 100, PLAINTEXT_BLOCK_SIZE, 3 * PLAINTEXT_BLOCK_SIZE + 5])
+@pytest.mark.parametrize("workers", [1, 4])
+def test_encrypt_decrypt_file(tmp_path, size, workers):
+    key = AgePrivateKey.generate()
+    data = os.urandom(size)
+
+    plaintext_path = tmp_path / "plain"
+    ciphertext_path = tmp_path / "plain.age"
+    decrypted_path = tmp_path / "decrypted"
+    plaintext_path.write_bytes(data)
+
+    encrypt_file(plaintext_path, ciphertext_path, [key.public_key()], workers=workers)
+
+    with open(ciphertext_path, "rb") as ciphertext_file:
+        with Decryptor([key], ciphertext_file) as decryptor:
+            assert decryptor.read() == data
+
+    decrypt_file(ciphertext_path, decrypted_path, [key], workers=workers)
+    assert decrypted_path.read_bytes() == data
+
+
+def test_decrypt_file_corrupted(tmp_path):
+    key = AgePrivateKey.generate()
+
+    plaintext_path = tmp_path / "plain"
+    ciphertext_path = tmp_path / "plain.age"
+    decrypted_path = tmp_path / "decrypted"
+    plaintext_path.write_bytes(os.urandom(3 * PLAINTEXT_BLOCK_SIZE))
+
+    encrypt_file(plaintext_path, ciphertext_path, [key.public_key()])
+    ciphertext = bytearray(ciphertext_path.read_bytes())
+    ciphertext[-100] ^= 1
+    ciphertext_path.write_bytes(ciphertext)
+
+    with pytest.raises(InvalidTag):
+        decrypt_file(ciphertext_path, decrypted_path, [key])
+    assert not decrypted_path.exists()
+
+    # a final chunk shorter than its tag
+    ciphertext_path.write_bytes(ciphertext[: -2 * CIPHERTEXT_BLOCK_SIZE + 5])
+    with pytest.raises(InvalidTag):
+        decrypt_file(ciphertext_path, decrypted_path, [key])
+    assert not decrypted_path.exists()
+
+    with Decryptor([key], io.BytesIO(ciphertext[: -2 * CIPHERTEXT_BLOCK_SIZE + 5])) as decryptor:
+        assert decryptor.seek(0, io.SEEK_END) == PLAINTEXT_BLOCK_SIZE
+
+
+@pytest.mark.parametrize("stream_type", [io.BytesIO, _NonSeekable])
+def test_decryptor_decrypt_into(stream_type):
+    key = AgePrivateKey.generate()
+    data = os.urandom(3 * PLAINTEXT_BLOCK_SIZE + 10)
+    ciphertext = _encrypt([key.public_key()], data, 3 * PLAINTEXT_BLOCK_SIZE)
+
+    with Decryptor([key], stream_type(ciphertext)) as decryptor:
+        assert decryptor.read(100) == data[:100]
+
+        buffer = bytearray(len(data))
+        assert decryptor.decrypt_into(buffer) == len(data) - 100
+        assert buffer[: len(data) - 100] == data[100:]
+        assert decryptor.tell() == len(data)
+        assert decryptor.read() == b""
+
+    if stream_type is io.BytesIO:
+        with Decryptor([key], stream_type(ciphertext)) as decryptor:
+            assert decryptor.read(10) == data[:10]
+            assert decryptor.decrypt_into(bytearray(len(data))) == len(data) - 10
+
+            # the chunks read before decrypt_into() must not be continued after seeking back
+            decryptor.seek(0)
+            assert decryptor.read(PLAINTEXT_BLOCK_SIZE) == data[:PLAINTEXT_BLOCK_SIZE]
+            assert decryptor.read() == data[PLAINTEXT_BLOCK_SIZE:]
+
+    with Decryptor([key], stream_type(ciphertext)) as decryptor:
+        with pytest.raises(ValueError):
+            decryptor.decrypt_into(bytearray(len(data) - 1))
+
+
+def test_closed():
+    key = AgePrivateKey.generate()
+    ciphertext = _encrypt([key.public_key()], b"data", 1000)
+
+    # the pooled buffers of a closed encryptor must not be written to another encryptor's file
+    first = Encryptor([key.public_key()], io.BytesIO())
+    first.close()
+    stream = io.BytesIO()
+    with Encryptor([key.public_key()], stream) as second:
+        second.write(b"A" * 100)
+        with pytest.raises(ValueError):
+            first.write(b"EVIL")
+
+    with Decryptor([key], io.BytesIO(stream.getvalue())) as decryptor:
+        assert decryptor.read() == b"A" * 100
+
+    decryptor = Decryptor([key], io.BytesIO(ciphertext))
+    decryptor.close()
+    for operation in [
+        lambda: decryptor.read(10),
+        lambda: decryptor.readinto(bytearray(10)),
+        lambda: decryptor.decrypt_into(bytearray(10)),
+        lambda: decryptor.seek(0),
+        lambda: decryptor.read_range(0, 10),
+    ]:
+        with pytest.raises(ValueError):
+            operation()
+
+
+def test_armored_roundtrip():
+    key = AgePrivateKey.generate()
+    data = os.urandom(2 * PLAINTEXT_BLOCK_SIZE + 10)
+
+    stream = io.BytesIO()
+    armored_output = AsciiArmoredOutput(AGE_PEM_LABEL, stream)
+    with Encryptor([key.public_key()], armored_output) as encryptor:
+        encryptor.write(data)
+    armored_output.close()
+
+    # armored input is not seekable, so chunks are read into pooled buffers with readinto()
+    armored_input = AsciiArmoredInput(AGE_PEM_LABEL, io.BytesIO(stream.getvalue()))
+    with Decryptor([key], armored_input) as decryptor:
+        assert not decryptor.seekable()
+        assert decryptor.read() == data
+
+
+@pytest.mark.parametrize("stream_type", [io.BytesIO, _NonSeekable])
+def test_buffers_reused(stream_type):
+    key = AgePrivateKey.generate()
+    data = os.urandom(2 * PLAINTEXT_BLOCK_SIZE + 10)
+
+    # warm up the pools
+    ciphertext = _encrypt([key.public_key()], data, 1000)
+    with Decryptor([key], stream_type(ciphertext)) as decryptor:
+        assert decryptor.read() == data
+
+    misses = PLAINTEXT_BUFFERS.misses, CIPHERTEXT_BUFFERS.misses
+    hits = PLAINTEXT_BUFFERS.hits, CIPHERTEXT_BUFFERS.hits
+
+    for _ in range(3):
+        assert _encrypt([key.public_key()], data, 1000) != ciphertext
+        with Decryptor([key], stream_type(ciphertext)) as decryptor:
+            assert decryptor.read() == data
+
+    assert (PLAINTEXT_BUFFERS.misses, CIPHERTEXT_BUFFERS.misses) == misses
+    assert PLAINTEXT_BUFFERS.hits > hits[0]
+    assert CIPHERTEXT_BUFFERS.hits > hits[1]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_verify_file(tmp_path, workers, monkeypatch):
+    monkeypatch.setattr("age.file.VERIFY_BATCH_SIZE", 2)
+    key = AgePrivateKey.generate()
+    data = os.urandom(5 * PLAINTEXT_BLOCK_SIZE + 10)
+
+    path = tmp_path / "data.age"
+    path.write_bytes(_encrypt([key.public_key()], data, PLAINTEXT_BLOCK_SIZE))
+    assert verify_file(path, [key], workers=workers) is None
+
+    ciphertext = bytearray(path.read_bytes())
+    payload_start = len(ciphertext) - 5 * CIPHERTEXT_BLOCK_SIZE - 10 - 16
+    for index in [4, 1]:
+        ciphertext[payload_start + index * CIPHERTEXT_BLOCK_SIZE + 5] ^= 1
+        path.write_bytes(ciphertext)
+        assert (
+            verify_file(path, [key], workers=workers)
+            == payload_start + index * CIPHERTEXT_BLOCK_SIZE
+        )
+
+    # a truncated file fails at the chunk which is now the last one
+    path.write_bytes(_encrypt([key.public_key()], data, PLAINTEXT_BLOCK_SIZE)[:-26])
+    assert verify_file(path, [key], workers=workers) == payload_start + 4 * CIPHERTEXT_BLOCK_SIZE
+
+    # an empty plaintext still has one chunk, which must not be cut off, nor the nonce
+    ciphertext = _encrypt([key.public_key()], b"", PLAINTEXT_BLOCK_SIZE)
+    nonce_start = len(ciphertext) - 32
+    path.write_bytes(ciphertext)
+    assert verify_file(path, [key], workers=workers) is None
+    path.write_bytes(ciphertext[:-16])
+    assert verify_file(path, [key], workers=workers) == nonce_start + 16
+    path.write_bytes(ciphertext[:-24])
+    assert verify_file(path, [key], workers=workers) == nonce_start
+
+
+def test_decrypt_header_non_canonical():
+    """The MAC is verified over the header as read, even if it would be written differently"""
+
+    key = AgePrivateKey.generate()
+    file_key = os.urandom(16)
+
+    stream = io.BytesIO()
+    write_header([key.public_key()], file_key, stream)
+    header = stream.getvalue()
+
+    # a body of 64 characters without the final empty line, which dump_header would write
+    raw = header[: header.rindex(b"---")] + b"-> future-stanza arg\n" + b"A" * 64 + b"\n---"
+    mac = HMAC(hkdf(b"", b"header", file_key, 32)).generate(raw)
+    stream = io.BytesIO(raw + b" " + encode(mac).encode("ascii") + b"\n")
+
+    assert decrypt_header([key], stream) == file_key
+
+
+def test_inspect_header():
+    age_key = AgePrivateKey.generate()
+    ssh_key = Ed25519PrivateKey.generate()
+    password = PasswordKey(b"password", log_cost=10)
+    data = _encrypt([age_key.public_key(), ssh_key.public_key(), password], b"x" * 1000, 1000)
+
+    stream = io.BytesIO(data)
+    info = inspect_header(stream)
+    assert [stanza.type for stanza in info.stanzas] == ["X25519", "ssh-ed25519", "scrypt"]
+    assert info.stanzas[0].fingerprint is None
+    assert info.stanzas[1].fingerprint == ssh_key.stanza_fingerprint()
+    assert info.stanzas[2].log_cost == 10
+    assert info.header_size == stream.tell() == data.index(b"---") + 48
+    assert info.identity is None
+
+    info = inspect_header(io.BytesIO(data), [AgePrivateKey.generate(), ssh_key])
+    assert info.identity is ssh_key
+    assert info.stanza_index == 1
+
+    info = inspect_header(io.BytesIO(data), [AgePrivateKey.generate()])
+    assert info.identity is None and info.stanza_index is None
+
+
+def test_write_header_parallel():
+    identities = [
+        AgePrivateKey.generate() if i else Ed25519PrivateKey.generate() for i in range(10)
+    ]
+    keys = [identity.public_key() for identity in identities]
+    file_key = os.urandom(16)
+
+    stream = io.BytesIO()
+    write_header(keys, file_key, stream, workers=4)
+
+    stream.seek(0)
+    header, _ = load_header(stream)
+    assert [recipient.type for recipient in header.recipients] == [
+        b"X25519" if i else b"ssh-ed25519" for i in range(10)
+    ]
+
+    for identity in identities:
+        stream.seek(0)
+        assert decrypt_header([identity], stream) == file_key
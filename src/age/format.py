@@ -1,78 +1,276 @@
-import textwrap
 import typing
 
 from age.exceptions import ParserError
 from age.primitives.encode import decode, encode
+from age.primitives.hmac import HMAC
 
-__all__ = ["Recipient", "Header", "load_header", "dump_header"]
+__all__ = [
+    "Recipient",
+    "Header",
+    "load_header",
+    "dump_header",
+    "MAX_HEADER_SIZE",
+    "MAX_STANZAS",
+    "MAX_LINE_LENGTH",
+]
 
 
 class Recipient:
+    """Recipient stanza as it appears in the header
+
+    All fields are kept in their (ASCII) wire encoding: ``type`` and ``arguments`` as they appear
+    on the ``->`` line, and ``body`` as unwrapped, unpadded base64.
+    """
+
+    __slots__ = ("type", "arguments", "body")
+
     def __init__(
-        self, type: str = "", arguments: typing.Optional[typing.List[str]] = None, body: str = ""
+        self,
+        type: bytes = b"",
+        arguments: typing.Optional[typing.List[bytes]] = None,
+        body: bytes = b"",
     ):
         if arguments is None:
             arguments = []
 
-        self.type: str = type
-        self.arguments: typing.List[str] = arguments
-        self.body: str = body
+        self.type: bytes = type
+        self.arguments: typing.List[bytes] = arguments
+        self.body: bytes = body
 
 
 class Header:
-    def __init__(self, recipients: typing.Optional[typing.List[Recipient]] = None):
+    """Header of an age file
+
+    :param recipients: Recipient stanzas
+    :param raw: Header bytes the MAC is computed over (see :attr:`raw`)
+    :param size: Size of the header in the file (see :attr:`size`)
+    """
+
+    def __init__(
+        self,
+        recipients: typing.Optional[typing.List[Recipient]] = None,
+        raw: typing.Optional[bytes] = None,
+        size: typing.Optional[int] = None,
+    ):
         if recipients is None:
             recipients = []
 
         self.recipients: typing.List[Recipient] = recipients
 
+        #: Exact bytes read by :func:`load_header`, from the start of the file up to and
+        #: including ``---``, i.e. the data covered by the header MAC (``None`` for headers which
+        #: were not read from a file)
+        self.raw: typing.Optional[bytes] = raw
+
+        #: Number of bytes read by :func:`load_header`, including the MAC line, i.e. the offset
+        #: of the payload nonce in the file (``None`` for headers which were not read from a file)
+        self.size: typing.Optional[int] = size
+
 
-AGE_INTRO = "age-encryption.org/v1"
-RECIPIENT_PREFIX = "->"
-FOOTER_PREFIX = "---"
+AGE_INTRO = b"age-encryption.org/v1"
+RECIPIENT_PREFIX = b"->"
+FOOTER_PREFIX = b"---"
 AEAD = "ChaChaPoly"
 
+BODY_COLUMNS = 64
+"""Stanza bodies are wrapped after this many characters"""
 
-def load_header(stream: typing.BinaryIO) -> typing.Tuple[Header, bytes]:
-    first_line = stream.readline().strip()
+MAX_HEADER_SIZE = 16 * 1024 * 1024
+"""Default limit for the size of the header in bytes"""
 
-    if first_line.decode("utf-8", "replace") != AGE_INTRO:
-        raise ParserError("File signature not found.")
+MAX_STANZAS = 65536
+"""Default limit for the number of recipient stanzas"""
+
+MAX_LINE_LENGTH = 4096
+"""Default limit for the length of a header line in bytes (without the line break)"""
+
+_INTRO_LINE = AGE_INTRO + b"\n"
+_RECIPIENT_LINE_PREFIX = RECIPIENT_PREFIX + b" "
+_FOOTER_LINE_PREFIX = FOOTER_PREFIX + b" "
 
-    header = Header()
 
-    line = ""
-    for raw_line in stream:
-        line = raw_line.decode("utf-8")
+def _read_header_seekable(stream: typing.BinaryIO, max_header_size: int) -> bytes:
+    # read ahead in growing blocks, then seek back to the end of the footer line
+    start = stream.tell()
+    data = b""
+    block_size = 4096
+    footer = end = -1
 
-        if line.startswith(RECIPIENT_PREFIX):
-            type, *args = line[len(RECIPIENT_PREFIX) :].split()
-            header.recipients.append(Recipient(type, args))
-        elif line.startswith(FOOTER_PREFIX):
+    while end < 0:
+        block = stream.read(min(block_size, max_header_size + 1 - len(data)))
+        if not block:
             break
-        elif len(header.recipients) > 0:
-            header.recipients[-1].body += line.strip()
 
-    assert line.startswith(FOOTER_PREFIX)
-    prefix, encoded_mac = line.split()
-    assert prefix == FOOTER_PREFIX
-    mac = decode(encoded_mac)
+        search_start = max(len(data) - len(FOOTER_PREFIX), 0)
+        data += block
+        if not data.startswith(_INTRO_LINE[: len(data)]):
+            raise ParserError("File signature not found.")
+
+        if footer < 0:
+            footer = data.find(b"\n" + FOOTER_PREFIX, search_start)
+        if footer >= 0:
+            end = data.find(b"\n", footer + 1)
+        if len(data) > max_header_size:
+            raise ParserError("Header too large.")
+
+        block_size = min(2 * block_size, 1024 * 1024)
+
+    if footer < 0:
+        raise ParserError("Unexpected end of header.")
+
+    # the footer line may also end the stream, without a line break
+    end = len(data) if end < 0 else end + 1
+    if end > max_header_size:
+        raise ParserError("Header too large.")
+
+    stream.seek(start + end)
+    return data[:end]
+
+
+def _read_header_lines(stream: typing.BinaryIO, max_header_size: int, line_limit: int) -> bytes:
+    # never read past the header, the payload follows
+    readline = stream.readline
+    lines = [readline(len(_INTRO_LINE))]
+    header_size = len(lines[0])
+    if lines[0] != _INTRO_LINE:
+        raise ParserError("File signature not found.")
+
+    while True:
+        line = readline(line_limit)
+        header_size += len(line)
+        if header_size > max_header_size:
+            raise ParserError("Header too large.")
+
+        lines.append(line)
+        if line.startswith(FOOTER_PREFIX):
+            break
+        if not line.endswith(b"\n"):
+            if len(line) == line_limit:
+                raise ParserError("Header line too long.")
+            raise ParserError("Unexpected end of header.")
+
+    return b"".join(lines)
+
+
+def _parse_body(body: bytes) -> bytes:
+    # all lines but the last one have exactly BODY_COLUMNS characters, so the line breaks are at
+    # fixed positions
+    line_breaks = body[BODY_COLUMNS :: BODY_COLUMNS + 1]
+    if line_breaks.count(b"\n") != len(line_breaks) or body.count(b"\n") != len(line_breaks):
+        raise ParserError("Malformed stanza body.")
+    return body.replace(b"\n", b"")
+
+
+def load_header(
+    stream: typing.BinaryIO,
+    max_header_size: int = MAX_HEADER_SIZE,
+    max_stanzas: int = MAX_STANZAS,
+    max_line_length: int = MAX_LINE_LENGTH,
+) -> typing.Tuple[Header, bytes]:
+    """Read the header from ``stream``, up to and including the ``---`` line
+
+    Seekable streams are read in blocks, and positioned right after the header afterwards. Other
+    streams are read line by line, so that no byte after the header is consumed.
+
+    :param stream: Input stream, positioned at the start of the file
+    :param max_header_size: Maximum size of the header in bytes
+    :param max_stanzas: Maximum number of recipient stanzas
+    :param max_line_length: Maximum length of a header line in bytes
+    :returns: The header and its MAC
+    :raises age.exceptions.ParserError: if the header is malformed or exceeds one of the limits
+    """
+    if stream.seekable():
+        data = _read_header_seekable(stream, max_header_size)
+    else:
+        data = _read_header_lines(stream, max_header_size, max_line_length + 1)
+
+    if not data.startswith(_INTRO_LINE):
+        raise ParserError("File signature not found.")
+    if not data.isascii():
+        raise ParserError("Header contains non-ASCII characters.")
+
+    footer_start = data.rfind(b"\n" + FOOTER_PREFIX) + 1
+    footer = data[footer_start:].rstrip(b"\n")
+    if len(footer) > max_line_length:
+        raise ParserError("Header line too long.")
+
+    encoded_mac = footer[len(_FOOTER_LINE_PREFIX) :]
+    if not footer.startswith(_FOOTER_LINE_PREFIX) or not encoded_mac or b" " in encoded_mac:
+        raise ParserError("Malformed header MAC.")
+    try:
+        mac = decode(encoded_mac.decode("ascii"))
+    except ValueError:
+        raise ParserError("Malformed header MAC.")
+
+    header = Header(raw=data[: footer_start + len(FOOTER_PREFIX)], size=len(data))
+    # the stanzas without the line break before the footer
+    stanzas = data[len(_INTRO_LINE) : footer_start - 1]
+    if not stanzas:
+        return header, mac
+    if not stanzas.startswith(_RECIPIENT_LINE_PREFIX):
+        raise ParserError("Unexpected line in header.")
+
+    stanza_list = stanzas[len(_RECIPIENT_LINE_PREFIX) :].split(b"\n" + _RECIPIENT_LINE_PREFIX)
+    if len(stanza_list) > max_stanzas:
+        raise ParserError("Too many recipient stanzas.")
+
+    append = header.recipients.append
+    for stanza in stanza_list:
+        line, _, body = stanza.partition(b"\n")
+        arguments = line.split(b" ")
+        if len(line) + len(_RECIPIENT_LINE_PREFIX) > max_line_length:
+            raise ParserError("Header line too long.")
+        if b"" in arguments:
+            raise ParserError("Malformed recipient line.")
+
+        if len(body) > BODY_COLUMNS or b"\n" in body:
+            body = _parse_body(body)
+        append(Recipient(arguments.pop(0), arguments, body))
 
     return header, mac
 
 
-def dump_header(header: Header, stream: typing.BinaryIO, mac: typing.Optional[bytes] = None):
-    stream.write(AGE_INTRO.encode("utf-8") + b"\n")
+def dump_header(
+    header: Header,
+    stream: typing.BinaryIO,
+    mac: typing.Optional[bytes] = None,
+    hmac: typing.Optional[HMAC] = None,
+) -> None:
+    """Write ``header`` to ``stream``, ending with the ``---`` line (without a line break)
+
+    Stanza bodies are wrapped at :data:`BODY_COLUMNS` characters. As the spec requires, the last
+    body line is always shorter than that, so it is empty if the length of the body is a multiple
+    of :data:`BODY_COLUMNS` (including an empty body).
+
+    With ``hmac``, the header is serialised only once: the bytes up to and including ``---`` are
+    fed to ``hmac`` and written to ``stream``, followed by the resulting MAC.
+
+    :param header: Header to write
+    :param stream: Output stream
+    :param mac: Header MAC, omitted if ``None``
+    :param hmac: HMAC computing the header MAC, replaces ``mac``
+    """
+    parts = [_INTRO_LINE]
 
     for recipient in header.recipients:
-        line = RECIPIENT_PREFIX + " " + recipient.type + " " + " ".join(recipient.arguments) + "\n"
-        stream.write(line.encode("utf-8"))
-        if recipient.body:
-            wrapped = textwrap.fill(recipient.body, break_on_hyphens=False, width=64)
-            stream.write(wrapped.encode("utf-8") + b"\n")
+        parts.append(b" ".join([RECIPIENT_PREFIX, recipient.type, *recipient.arguments]))
+        parts.append(b"\n")
 
-    footer = FOOTER_PREFIX
-    if mac:
-        footer += " " + encode(mac)
+        body = recipient.body
+        full_lines = len(body) - len(body) % BODY_COLUMNS
+        for offset in range(0, full_lines, BODY_COLUMNS):
+            parts.append(body[offset : offset + BODY_COLUMNS])
+            parts.append(b"\n")
+        parts.append(body[full_lines:])
+        parts.append(b"\n")
+
+    parts.append(FOOTER_PREFIX)
+    data = b"".join(parts)
 
-    stream.write(footer.encode("utf-8"))
+    if hmac is not None:
+        hmac.update(data)
+        mac = hmac.finalize()
+
+    stream.write(data)
+    if mac:
+        stream.write(b" " + encode(mac).encode("ascii"))
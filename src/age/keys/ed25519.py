@@ -20,13 +20,30 @@ from nacl.bindings import crypto_sign_ed25519_pk_to_curve25519, crypto_sign_ed25
 
 from age.keys.agekey import AgePrivateKey, AgePublicKey
 from age.openssh_keys import load_openssh_private_key
+from age.primitives.hashes import sha256
+from age.primitives.hkdf import hkdf
+from age.primitives.x25519 import ECPoint, ECScalar, x25519_reduce, x25519_scalarmult
 
 from .base import DecryptionKey, EncryptionKey
 
-__all__ = ["Ed25519PrivateKey", "Ed25519PublicKey"]
+__all__ = ["Ed25519PrivateKey", "Ed25519PublicKey", "StanzaMaterial"]
 
 OPENSSH_DEFAULT_KEY_COMMENT = "age"
 ED25519_KEY_SIZE = 256
+AGE_ED25519_LABEL = b"age-encryption.org/v1/ssh-ed25519"
+
+
+class StanzaMaterial(typing.NamedTuple):
+    """Values derived from an Ed25519 private key to unwrap ``ssh-ed25519`` stanzas"""
+
+    private_key_bytes: ECScalar
+    """X25519 private key converted from the Ed25519 private key"""
+
+    tweak: ECScalar
+    """Tweak of the public key (see :meth:`Ed25519PublicKey.stanza_tweak`)"""
+
+    pk_conv_tweak: ECPoint
+    """Converted X25519 public key, multiplied by the tweak"""
 
 
 class Ed25519PrivateKey(DecryptionKey):
@@ -35,6 +52,10 @@ class Ed25519PrivateKey(DecryptionKey):
         assert isinstance(key, Ed25519PrivateKey_)
         self._key: Ed25519PrivateKey_ = key
 
+        self._binary_encoding: typing.Optional[bytes] = None
+        self._stanza_fingerprint: typing.Optional[bytes] = None
+        self._stanza_material: typing.Optional[StanzaMaterial] = None
+
     def __repr__(self) -> str:
         clsname = self.__class__.__name__
         return f"<{clsname} {self.public_key().fingerprint()}>"
@@ -55,6 +76,33 @@ class Ed25519PrivateKey(DecryptionKey):
         assert isinstance(private_key, Ed25519PrivateKey_)
         return cls(private_key)
 
+    def binary_encoding(self) -> bytes:
+        """Binary encoding of the public key (see :meth:`public_key`), computed only once"""
+        if self._binary_encoding is None:
+            self._binary_encoding = self.public_key().binary_encoding()
+        return self._binary_encoding
+
+    def stanza_fingerprint(self) -> bytes:
+        """Fingerprint identifying the public key in ``ssh-ed25519`` stanzas, computed only once"""
+        if self._stanza_fingerprint is None:
+            self._stanza_fingerprint = sha256(self.binary_encoding())[:4]
+        return self._stanza_fingerprint
+
+    def stanza_material(self) -> StanzaMaterial:
+        """Values needed to unwrap ``ssh-ed25519`` stanzas, computed only once"""
+        if self._stanza_material is None:
+            tweak = self.public_key().stanza_tweak()
+
+            age_private_key = self.to_age_private_key()
+            pk_conv: ECPoint = age_private_key.public_key().public_bytes()
+
+            self._stanza_material = StanzaMaterial(
+                private_key_bytes=age_private_key.private_bytes(),
+                tweak=tweak,
+                pk_conv_tweak=x25519_scalarmult(tweak, pk_conv),
+            )
+        return self._stanza_material
+
     def public_key(self):
         return Ed25519PublicKey(self._key.public_key())
 
@@ -98,6 +146,12 @@ class Ed25519PublicKey(EncryptionKey):
         assert type_ == b"ssh-ed25519"
         return base64.b64decode(base64encoded_data + b"===")
 
+    def stanza_tweak(self) -> ECScalar:
+        """Scalar tweaking the converted X25519 key in ``ssh-ed25519`` stanzas"""
+        return x25519_reduce(
+            ECScalar(hkdf(salt=self.binary_encoding(), label=AGE_ED25519_LABEL, key=b"", len=64))
+        )
+
     def fingerprint_line(
         self, algorithm: str = "MD5", comment: str = OPENSSH_DEFAULT_KEY_COMMENT
     ) -> str:
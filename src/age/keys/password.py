@@ -1,9 +1,17 @@
+import typing
+
 from .base import DecryptionKey, EncryptionKey
 
 
 class PasswordKey(EncryptionKey, DecryptionKey):
-    def __init__(self, value: bytes):
+    def __init__(self, value: bytes, log_cost: typing.Optional[int] = None):
+        """
+        :param value: Password
+        :param log_cost: scrypt work factor used when encrypting (defaults to
+            :data:`age.algorithms.scrypt.DEFAULT_LOG_COST`)
+        """
         self.value = value
+        self.log_cost = log_cost
 
     def __str__(self):
         return str(self.value)
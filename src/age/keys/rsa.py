@@ -14,6 +14,7 @@ from cryptography.hazmat.primitives.serialization import (
 )
 
 from age.openssh_keys import load_openssh_private_key
+from age.primitives.hashes import sha256
 
 from .base import DecryptionKey, EncryptionKey
 
@@ -29,6 +30,9 @@ class RSAPrivateKey(DecryptionKey):
         assert isinstance(key, RSAPrivateKey_)
         self._key: RSAPrivateKey_ = key
 
+        self._binary_encoding: typing.Optional[bytes] = None
+        self._stanza_fingerprint: typing.Optional[bytes] = None
+
     def __repr__(self) -> str:
         clsname = self.__class__.__name__
         return f"<{clsname} {self.public_key().fingerprint()}>"
@@ -52,6 +56,18 @@ class RSAPrivateKey(DecryptionKey):
         assert isinstance(private_key, RSAPrivateKey_)
         return cls(private_key)
 
+    def binary_encoding(self) -> bytes:
+        """Binary encoding of the public key (see :meth:`public_key`), computed only once"""
+        if self._binary_encoding is None:
+            self._binary_encoding = self.public_key().binary_encoding()
+        return self._binary_encoding
+
+    def stanza_fingerprint(self) -> bytes:
+        """Fingerprint identifying the public key in ``ssh-rsa`` stanzas, computed only once"""
+        if self._stanza_fingerprint is None:
+            self._stanza_fingerprint = sha256(self.binary_encoding())[:4]
+        return self._stanza_fingerprint
+
     def public_key(self):
         return RSAPublicKey(self._key.public_key())
 
@@ -0,0 +1,298 @@
+import abc
+import contextlib
+import os
+import time
+import typing
+
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import ChaCha20Poly1305
+from nacl.bindings import (  # importing nacl.bindings also runs sodium_init()
+    crypto_aead_chacha20poly1305_ietf_decrypt,
+    crypto_aead_chacha20poly1305_ietf_encrypt,
+)
+from nacl.exceptions import CryptoError
+
+try:
+    # The public PyNaCl bindings only accept bytes, so every chunk would be copied on the way in
+    # and out. PyNaCl's compiled cffi module can pass any buffer to libsodium, but it is private
+    # to PyNaCl: if it is missing (or cffi cannot release buffers), the public bindings are used.
+    from nacl._sodium import ffi as _sodium_ffi
+    from nacl._sodium import lib as _sodium_lib
+
+    if not hasattr(_sodium_ffi, "release"):
+        raise ImportError("cffi too old")
+except ImportError:
+    _sodium_ffi = _sodium_lib = None
+
+__all__ = [
+    "AEAD",
+    "CryptographyAEAD",
+    "NaClAEAD",
+    "AEAD_BACKENDS",
+    "new_aead",
+    "get_backend",
+    "set_backend",
+    "benchmark_backends",
+    "select_fastest_backend",
+]
+
+BACKEND_ENVIRONMENT_VARIABLE = "PYAGE_AEAD_BACKEND"
+"""Environment variable to choose the backend: a name from :data:`AEAD_BACKENDS` or ``auto``"""
+
+DEFAULT_BENCHMARK_SIZE = 64 * 1024
+"""Message size used to select the backend if the environment variable is set to ``auto``"""
+
+
+class AEAD:
+    """ChaCha20 + Poly1305 (:rfc:`7539`) with a fixed 32-byte key
+
+    The interface follows :class:`cryptography.hazmat.primitives.ciphers.aead.ChaCha20Poly1305`.
+    All methods raise :class:`cryptography.exceptions.InvalidTag` if authentication fails,
+    regardless of the backend.
+    """
+
+    NAME: str
+
+    @abc.abstractmethod
+    def __init__(self, key: bytes):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def encrypt(self, nonce, data, associated_data) -> bytes:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def decrypt(self, nonce, data, associated_data) -> bytes:
+        raise NotImplementedError
+
+    def encrypt_into(self, nonce, data, associated_data, buf) -> int:
+        ciphertext = self.encrypt(nonce, data, associated_data)
+        memoryview(buf)[:] = ciphertext
+        return len(ciphertext)
+
+    def decrypt_into(self, nonce, data, associated_data, buf) -> int:
+        plaintext = self.decrypt(nonce, data, associated_data)
+        memoryview(buf)[:] = plaintext
+        return len(plaintext)
+
+
+class CryptographyAEAD(AEAD):
+    """Backend using ``cryptography`` (OpenSSL)"""
+
+    NAME: str = "cryptography"
+
+    def __init__(self, key: bytes):
+        self._cipher = ChaCha20Poly1305(key)
+
+    def encrypt(self, nonce, data, associated_data) -> bytes:
+        return self._cipher.encrypt(nonce, data, associated_data)
+
+    def decrypt(self, nonce, data, associated_data) -> bytes:
+        return self._cipher.decrypt(nonce, data, associated_data)
+
+    def encrypt_into(self, nonce, data, associated_data, buf) -> int:
+        if hasattr(self._cipher, "encrypt_into"):
+            return self._cipher.encrypt_into(nonce, data, associated_data, buf)
+        return super().encrypt_into(nonce, data, associated_data, buf)
+
+    def decrypt_into(self, nonce, data, associated_data, buf) -> int:
+        if hasattr(self._cipher, "decrypt_into"):
+            return self._cipher.decrypt_into(nonce, data, associated_data, buf)
+        return super().decrypt_into(nonce, data, associated_data, buf)
+
+
+class NaClAEAD(AEAD):
+    """Backend using PyNaCl (libsodium)
+
+    If PyNaCl's cffi module is available, libsodium is called directly with the caller's buffers:
+    :meth:`encrypt_into` and :meth:`decrypt_into` do not copy. Otherwise, data is copied to and
+    from :class:`bytes` for the public PyNaCl bindings.
+    """
+
+    NAME: str = "nacl"
+
+    TAG_SIZE: int = 16
+
+    def __init__(self, key: bytes):
+        if len(key) != 32:
+            raise ValueError("ChaCha20Poly1305 key must be 32 bytes.")
+        self._key: bytes = bytes(key)
+
+    def encrypt(self, nonce, data, associated_data) -> bytes:
+        if _sodium_lib is None:
+            return crypto_aead_chacha20poly1305_ietf_encrypt(
+                bytes(data), _optional_bytes(associated_data), _nonce(nonce), self._key
+            )
+
+        ciphertext = _sodium_ffi.new("unsigned char[]", len(data) + self.TAG_SIZE)
+        self.encrypt_into(nonce, data, associated_data, ciphertext)
+        return _sodium_ffi.buffer(ciphertext)[:]
+
+    def decrypt(self, nonce, data, associated_data) -> bytes:
+        if _sodium_lib is None:
+            try:
+                return crypto_aead_chacha20poly1305_ietf_decrypt(
+                    bytes(data), _optional_bytes(associated_data), _nonce(nonce), self._key
+                )
+            except CryptoError:
+                raise InvalidTag()
+
+        plaintext = _sodium_ffi.new("unsigned char[]", max(len(data) - self.TAG_SIZE, 0))
+        self.decrypt_into(nonce, data, associated_data, plaintext)
+        return _sodium_ffi.buffer(plaintext)[:]
+
+    def encrypt_into(self, nonce, data, associated_data, buf) -> int:
+        if _sodium_lib is None:
+            return super().encrypt_into(nonce, data, associated_data, buf)
+
+        size = len(data) + self.TAG_SIZE
+        with _sodium_buffers(buf, size, data, associated_data) as (out, message, ad):
+            _sodium_lib.crypto_aead_chacha20poly1305_ietf_encrypt(
+                out,
+                _sodium_ffi.NULL,
+                message,
+                len(data),
+                ad,
+                len(associated_data or b""),
+                _sodium_ffi.NULL,
+                _nonce(nonce),
+                self._key,
+            )
+        return size
+
+    def decrypt_into(self, nonce, data, associated_data, buf) -> int:
+        if len(data) < self.TAG_SIZE:
+            raise InvalidTag()
+        if _sodium_lib is None:
+            return super().decrypt_into(nonce, data, associated_data, buf)
+
+        size = len(data) - self.TAG_SIZE
+        with _sodium_buffers(buf, size, data, associated_data) as (out, ciphertext, ad):
+            result = _sodium_lib.crypto_aead_chacha20poly1305_ietf_decrypt(
+                out,
+                _sodium_ffi.NULL,
+                _sodium_ffi.NULL,
+                ciphertext,
+                len(data),
+                ad,
+                len(associated_data or b""),
+                _nonce(nonce),
+                self._key,
+            )
+        if result != 0:
+            raise InvalidTag()
+        return size
+
+
+@contextlib.contextmanager
+def _sodium_buffers(buf, size: int, data, associated_data) -> typing.Iterator[typing.Tuple]:
+    # the buffers are released on exit: if an exception's traceback kept them exported, the
+    # garbage collector could not clear the underlying memoryviews (and crashes on it)
+    ffi = _sodium_ffi
+    with contextlib.ExitStack() as stack:
+        if isinstance(buf, ffi.CData):
+            out = buf
+        else:
+            out = stack.enter_context(ffi.from_buffer(buf, require_writable=True))
+            if len(out) != size:
+                raise ValueError(f"buffer must be {size} bytes")
+
+        ad = ffi.NULL
+        if associated_data:
+            ad = stack.enter_context(ffi.from_buffer(associated_data))
+
+        yield out, stack.enter_context(ffi.from_buffer(data)), ad
+
+
+def _optional_bytes(data) -> typing.Optional[bytes]:
+    return None if data is None else bytes(data)
+
+
+def _nonce(nonce) -> bytes:
+    if len(nonce) != 12:
+        raise ValueError("Nonce must be 12 bytes.")
+    return bytes(nonce)
+
+
+AEAD_BACKENDS: typing.Dict[str, typing.Type[AEAD]] = {
+    CryptographyAEAD.NAME: CryptographyAEAD,
+    NaClAEAD.NAME: NaClAEAD,
+}
+"""Registry of available backends by name"""
+
+_backend: typing.Optional[typing.Type[AEAD]] = None
+
+
+def benchmark_backends(size: int, rounds: int = 100) -> typing.Dict[str, float]:
+    """Measure how long each backend takes to encrypt and decrypt a message of ``size`` bytes
+
+    :param size: Message size
+    :param rounds: Number of encryptions and decryptions per backend
+    :returns: Average time per round trip in seconds, by backend name
+    """
+    key = os.urandom(32)
+    nonce = os.urandom(12)
+    message = os.urandom(size)
+
+    timings = {}
+    for name, backend in AEAD_BACKENDS.items():
+        aead = backend(key)
+        start = time.perf_counter()
+        for _ in range(rounds):
+            aead.decrypt(nonce, aead.encrypt(nonce, message, None), None)
+        timings[name] = (time.perf_counter() - start) / rounds
+
+    return timings
+
+
+def select_fastest_backend(size: int = DEFAULT_BENCHMARK_SIZE, rounds: int = 100) -> str:
+    """Benchmark all backends for messages of ``size`` bytes and use the fastest one
+
+    :returns: Name of the selected backend
+    """
+    timings = benchmark_backends(size, rounds)
+    name = min(timings, key=timings.__getitem__)
+    set_backend(name)
+    return name
+
+
+def set_backend(name: str) -> None:
+    """Use the backend ``name`` (see :data:`AEAD_BACKENDS`) for all subsequent operations
+
+    :raises ValueError: if there is no such backend
+    """
+    global _backend
+
+    try:
+        _backend = AEAD_BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown AEAD backend: {name}")
+
+
+def get_backend() -> typing.Type[AEAD]:
+    """Return the backend in use
+
+    Unless :func:`set_backend` has been called, the backend is chosen by the environment
+    variable ``PYAGE_AEAD_BACKEND``: a backend name, or ``auto`` to run
+    :func:`select_fastest_backend` once. The default is ``cryptography``.
+    """
+    if _backend is None:
+        name = os.environ.get(BACKEND_ENVIRONMENT_VARIABLE, CryptographyAEAD.NAME)
+        if name == "auto":
+            select_fastest_backend()
+        else:
+            set_backend(name)
+
+    assert _backend is not None
+    return _backend
+
+
+def new_aead(key: bytes, backend: typing.Optional[str] = None) -> AEAD:
+    """Create an AEAD instance for ``key``
+
+    :param key: 32-byte key
+    :param backend: Name of the backend to use instead of the one returned by :func:`get_backend`
+    """
+    if backend is not None:
+        return AEAD_BACKENDS[backend](key)
+    return get_backend()(key)
@@ -0,0 +1,130 @@
+import gc
+
+import pytest
+from cryptography.exceptions import InvalidTag
+
+from ..stream import CIPHERTEXT_BLOCK_SIZE, PLAINTEXT_BLOCK_SIZE, stream_decrypt, stream_encrypt
+from . import aead
+from .aead import AEAD_BACKENDS, get_backend, new_aead, select_fastest_backend, set_backend
+
+KEY = bytes(range(32))
+NONCE = bytes(12)
+
+
+@pytest.fixture
+def restore_backend(monkeypatch):
+    monkeypatch.setattr(aead, "_backend", None)
+
+
+def test_rfc7539_vector():
+    """Test vector from RFC 7539, section 2.8.2"""
+
+    key = bytes(range(0x80, 0xA0))
+    nonce = bytes.fromhex("070000004041424344454647")
+    associated_data = bytes.fromhex("50515253c0c1c2c3c4c5c6c7")
+    plaintext = (
+        b"Ladies and Gentlemen of the class of '99: If I could offer you only one tip for the "
+        b"future, sunscreen would be it."
+    )
+    tag = bytes.fromhex("1ae10b594f09e26a7e902ecbd0600691")
+
+    for name in AEAD_BACKENDS:
+        ciphertext = new_aead(key, backend=name).encrypt(nonce, plaintext, associated_data)
+        assert ciphertext[:4] == bytes.fromhex("d31a8d34")
+        assert ciphertext[-16:] == tag
+
+
+@pytest.mark.parametrize("name", list(AEAD_BACKENDS))
+def test_backends_interoperate(name):
+    data = b"x" * 1000
+    ciphertext = new_aead(KEY, backend=name).encrypt(NONCE, memoryview(data), None)
+
+    for other in AEAD_BACKENDS:
+        cipher = new_aead(KEY, backend=other)
+        assert cipher.decrypt(NONCE, ciphertext, None) == data
+
+        plaintext = bytearray(len(data))
+        assert cipher.decrypt_into(NONCE, memoryview(ciphertext), None, plaintext) == len(data)
+        assert plaintext == data
+
+        encrypted = bytearray(len(ciphertext))
+        assert cipher.encrypt_into(NONCE, data, None, encrypted) == len(ciphertext)
+        assert encrypted == ciphertext
+
+
+@pytest.mark.parametrize("name", list(AEAD_BACKENDS))
+def test_into_slices(name):
+    cipher = new_aead(KEY, backend=name)
+    data = bytearray(b"x" * 1000)
+    ciphertext = cipher.encrypt(NONCE, data, None)
+
+    # the chunk paths pass slices of larger pooled buffers
+    out = bytearray(2100)
+    with memoryview(data) as source, memoryview(out) as view:
+        assert cipher.encrypt_into(NONCE, source[:], None, view[10:1026]) == 1016
+        assert out[10:1026] == ciphertext
+        assert cipher.decrypt_into(NONCE, view[10:1026], None, view[1100:]) == 1000
+        assert out[1100:] == data
+
+        with pytest.raises(ValueError):
+            cipher.decrypt_into(NONCE, view[10:1026], None, view[1100:1200])
+
+
+def test_nacl_buffers_released(restore_backend):
+    set_backend("nacl")
+    ciphertext = stream_encrypt(KEY, b"x" * (2 * PLAINTEXT_BLOCK_SIZE))
+
+    # the exception's traceback must not keep the chunk buffers exported
+    with pytest.raises(InvalidTag):
+        stream_decrypt(KEY, ciphertext[: CIPHERTEXT_BLOCK_SIZE + 16], workers=2)
+    gc.collect()
+
+
+def test_nacl_public_bindings(monkeypatch):
+    ciphertext = new_aead(KEY, backend="cryptography").encrypt(NONCE, b"data", b"ad")
+
+    # without PyNaCl's cffi module, the public (copying) bindings are used
+    monkeypatch.setattr(aead, "_sodium_ffi", None)
+    monkeypatch.setattr(aead, "_sodium_lib", None)
+    cipher = new_aead(KEY, backend="nacl")
+    assert cipher.encrypt(NONCE, memoryview(b"data"), b"ad") == ciphertext
+    assert cipher.decrypt(NONCE, ciphertext, b"ad") == b"data"
+
+    plaintext = bytearray(4)
+    assert cipher.decrypt_into(NONCE, memoryview(ciphertext), b"ad", plaintext) == 4
+    assert plaintext == b"data"
+    with pytest.raises(InvalidTag):
+        cipher.decrypt(NONCE, ciphertext, b"other")
+
+
+@pytest.mark.parametrize("name", list(AEAD_BACKENDS))
+def test_invalid_tag(name):
+    ciphertext = bytearray(new_aead(KEY, backend=name).encrypt(NONCE, b"data", None))
+    ciphertext[0] ^= 1
+
+    with pytest.raises(InvalidTag):
+        new_aead(KEY, backend=name).decrypt(NONCE, bytes(ciphertext), None)
+
+
+def test_set_backend(restore_backend):
+    set_backend("nacl")
+    assert get_backend() is AEAD_BACKENDS["nacl"]
+    assert isinstance(new_aead(KEY), AEAD_BACKENDS["nacl"])
+
+    with pytest.raises(ValueError):
+        set_backend("rot13")
+
+
+def test_backend_environment(restore_backend, monkeypatch):
+    monkeypatch.setenv("PYAGE_AEAD_BACKEND", "nacl")
+    assert get_backend() is AEAD_BACKENDS["nacl"]
+
+
+def test_backend_environment_auto(restore_backend, monkeypatch):
+    monkeypatch.setenv("PYAGE_AEAD_BACKEND", "auto")
+    assert get_backend() in AEAD_BACKENDS.values()
+
+
+def test_select_fastest_backend(restore_backend):
+    name = select_fastest_backend(1024, rounds=2)
+    assert get_backend() is AEAD_BACKENDS[name]
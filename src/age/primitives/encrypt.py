@@ -1,4 +1,4 @@
-from cryptography.hazmat.primitives.ciphers.aead import ChaCha20Poly1305
+from age.primitives.aead import AEAD, new_aead
 
 __all__ = ["encrypt", "decrypt"]
 
@@ -6,8 +6,8 @@ __all__ = ["encrypt", "decrypt"]
 ZERO_NONCE = b"\00" * 12
 
 
-def _cipher(key: bytes) -> ChaCha20Poly1305:
-    return ChaCha20Poly1305(key=key)
+def _cipher(key: bytes) -> AEAD:
+    return new_aead(key)
 
 
 def encrypt(key: bytes, plaintext: bytes) -> bytes:
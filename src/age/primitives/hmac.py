@@ -26,6 +26,22 @@ class HMAC:
             key=key, algorithm=hashes.SHA256(), backend=default_backend()
         )
 
+    def update(self, message: bytes) -> None:
+        """Feed the next part of a message, to be authenticated with :meth:`finalize`
+
+        :param message: Part of the message
+        """
+
+        self.mac.update(message)
+
+    def finalize(self) -> bytes:
+        """Generate authentication value for all parts fed with :meth:`update`
+
+        :returns: 32-byte authentication tag (HMAC)
+        """
+
+        return self.mac.finalize()
+
     def generate(self, message: bytes) -> bytes:
         """Generate authentication value for the given message
 
@@ -98,3 +98,13 @@ def test_hmac_verify():
     assert not HMAC(key).is_valid(data, invalid_mac)
     assert not HMAC(key).is_valid(invalid_data, mac)
     assert not HMAC(invalid_key).is_valid(data, mac)
+
+
+def test_hmac_incremental():
+    key = b"This is a key"
+    data = b"This is data to be authenticated in parts."
+
+    hmac = HMAC(key)
+    for offset in range(0, len(data), 5):
+        hmac.update(data[offset : offset + 5])
+    assert hmac.finalize() == HMAC(key).generate(data)
@@ -1,7 +1,24 @@
+import concurrent.futures
+import threading
+import time
+import typing
+
 from cryptography.hazmat.backends import default_backend
 from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
 
-__all__ = ["scrypt"]
+__all__ = [
+    "scrypt",
+    "scrypt_memory",
+    "ScryptScheduler",
+    "SchedulerStats",
+    "get_scheduler",
+    "set_scheduler",
+]
+
+SCRYPT_R = 8
+
+DEFAULT_MEMORY_BUDGET = 1024 * 1024 * 1024
+"""Default memory budget of the :class:`ScryptScheduler` (1 GiB)"""
 
 
 def scrypt(salt: bytes, N: int, password: bytes) -> bytes:
@@ -9,9 +26,159 @@ def scrypt(salt: bytes, N: int, password: bytes) -> bytes:
 
     For the choise of `N`, see `<https://blog.filippo.io/the-scrypt-parameters/>`_.
 
+    The derivation is run by the scheduler returned by :func:`get_scheduler`, so that concurrent
+    derivations stay within its memory budget.
+
     :param salt: Salt
     :param N: Scrypt cost
     :param password: Password
     """
-    kdf = Scrypt(salt=salt, length=32, n=N, r=8, p=1, backend=default_backend())
+    return get_scheduler().derive(salt, N, password)
+
+
+def scrypt_memory(N: int) -> int:
+    """Memory in bytes used by :func:`scrypt` with cost `N`
+
+    >>> scrypt_memory(2 ** 18) // 2 ** 20
+    256
+    """
+    return 128 * SCRYPT_R * N
+
+
+def _derive(salt: bytes, N: int, password: bytes) -> bytes:
+    kdf = Scrypt(salt=salt, length=32, n=N, r=SCRYPT_R, p=1, backend=default_backend())
     return kdf.derive(password)
+
+
+class SchedulerStats(typing.NamedTuple):
+    """Statistics of a :class:`ScryptScheduler`"""
+
+    queue_depth: int
+    """Number of derivations currently waiting for memory"""
+
+    max_queue_depth: int
+    """Largest number of derivations waiting at the same time"""
+
+    running: int
+    """Number of derivations currently running"""
+
+    memory_in_use: int
+    """Memory in bytes reserved by the running derivations"""
+
+    completed: int
+    """Number of finished derivations"""
+
+    total_wait: float
+    """Total time in seconds derivations waited for memory"""
+
+    max_wait: float
+    """Longest time in seconds a single derivation waited for memory"""
+
+
+class ScryptScheduler:
+    """Admit scrypt derivations against a memory budget
+
+    A derivation reserves :func:`scrypt_memory` bytes while it runs. Derivations which do not fit
+    into the remaining budget wait in first-come, first-served order. A derivation larger than the
+    whole budget is admitted once nothing else is running.
+
+    :param memory_budget: Memory in bytes available to concurrent derivations
+    :param processes: Run derivations on a pool of this many processes instead of the calling
+        thread (``0`` disables the pool)
+    """
+
+    def __init__(self, memory_budget: int = DEFAULT_MEMORY_BUDGET, processes: int = 0):
+        if memory_budget < 1 or processes < 0:
+            raise ValueError("memory_budget must be positive and processes must not be negative")
+
+        self.memory_budget: int = memory_budget
+
+        self._executor: typing.Optional[concurrent.futures.ProcessPoolExecutor] = None
+        if processes > 0:
+            self._executor = concurrent.futures.ProcessPoolExecutor(processes)
+
+        self._condition = threading.Condition()
+        self._queue: typing.List[object] = []
+        self._memory_in_use: int = 0
+        self._running: int = 0
+
+        self._max_queue_depth: int = 0
+        self._completed: int = 0
+        self._total_wait: float = 0.0
+        self._max_wait: float = 0.0
+
+    def derive(self, salt: bytes, N: int, password: bytes) -> bytes:
+        """Derive a key like :func:`scrypt`, waiting for memory to become available first"""
+        memory = scrypt_memory(N)
+        self._acquire(memory)
+        try:
+            if self._executor is not None:
+                return self._executor.submit(_derive, salt, N, password).result()
+            return _derive(salt, N, password)
+        finally:
+            self._release(memory)
+
+    def stats(self) -> SchedulerStats:
+        """Return the current statistics"""
+        with self._condition:
+            return SchedulerStats(
+                queue_depth=len(self._queue),
+                max_queue_depth=self._max_queue_depth,
+                running=self._running,
+                memory_in_use=self._memory_in_use,
+                completed=self._completed,
+                total_wait=self._total_wait,
+                max_wait=self._max_wait,
+            )
+
+    def shutdown(self) -> None:
+        """Shut down the process pool, if any"""
+        if self._executor is not None:
+            self._executor.shutdown()
+
+    def _fits(self, ticket: object, memory: int) -> bool:
+        if self._queue[0] is not ticket:
+            return False
+        return self._running == 0 or self._memory_in_use + memory <= self.memory_budget
+
+    def _acquire(self, memory: int) -> None:
+        ticket = object()
+        start = time.perf_counter()
+
+        with self._condition:
+            self._queue.append(ticket)
+            self._max_queue_depth = max(self._max_queue_depth, len(self._queue))
+            try:
+                self._condition.wait_for(lambda: self._fits(ticket, memory))
+            finally:
+                self._queue.remove(ticket)
+                # the next derivation in line may fit as well
+                self._condition.notify_all()
+
+            self._memory_in_use += memory
+            self._running += 1
+
+            wait = time.perf_counter() - start
+            self._total_wait += wait
+            self._max_wait = max(self._max_wait, wait)
+
+    def _release(self, memory: int) -> None:
+        with self._condition:
+            self._memory_in_use -= memory
+            self._running -= 1
+            self._completed += 1
+            self._condition.notify_all()
+
+
+_scheduler: ScryptScheduler = ScryptScheduler()
+
+
+def get_scheduler() -> ScryptScheduler:
+    """Return the scheduler used by :func:`scrypt`"""
+    return _scheduler
+
+
+def set_scheduler(scheduler: ScryptScheduler) -> None:
+    """Replace the scheduler used by :func:`scrypt`, e.g. to change the memory budget"""
+    global _scheduler
+    _scheduler = scheduler
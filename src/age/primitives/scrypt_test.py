@@ -1,4 +1,7 @@
-from .scrypt import scrypt
+import threading
+import time
+
+from .scrypt import ScryptScheduler, get_scheduler, scrypt, scrypt_memory, set_scheduler
 
 # vectors 1 & 2 are not applicable because of different r, p settings
 
@@ -15,3 +18,54 @@ def test_scrypt_vector3():
 
 
 # vector 4 is (probably) too many rounds
+
+
+def test_scheduler_process_pool():
+    scheduler = ScryptScheduler(processes=1)
+    try:
+        assert scheduler.derive(b"salt", 1024, b"password") == scrypt(b"salt", 1024, b"password")
+    finally:
+        scheduler.shutdown()
+
+
+def test_scheduler_memory_budget(monkeypatch):
+    running = []
+    peak = []
+
+    def derive(salt, N, password):
+        running.append(N)
+        peak.append(sum(scrypt_memory(n) for n in running))
+        time.sleep(0.01)
+        running.remove(N)
+        return b"k" * 32
+
+    monkeypatch.setattr("age.primitives.scrypt._derive", derive)
+
+    # room for two small derivations, but not for a small and a large one
+    scheduler = ScryptScheduler(memory_budget=2 * scrypt_memory(1024))
+    costs = [1024, 1024, 4096, 1024, 1024, 1024]
+    threads = [threading.Thread(target=scheduler.derive, args=(b"", N, b"")) for N in costs]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # the large derivation exceeds the budget on its own, it runs alone
+    assert max(peak) == scrypt_memory(4096)
+
+    stats = scheduler.stats()
+    assert stats.completed == len(costs)
+    assert stats.queue_depth == stats.running == stats.memory_in_use == 0
+    assert stats.max_queue_depth >= 1
+    assert stats.max_wait > 0
+
+
+def test_scheduler_global():
+    scheduler = ScryptScheduler()
+    previous = get_scheduler()
+    set_scheduler(scheduler)
+    try:
+        scrypt(b"salt", 1024, b"password")
+        assert scheduler.stats().completed == 1
+    finally:
+        set_scheduler(previous)
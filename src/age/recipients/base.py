@@ -9,6 +9,14 @@ class Recipient:
     ENCRYPTION_KEY_TYPE: typing.Type[EncryptionKey]
     DECRYPTION_KEY_TYPE: typing.Type[DecryptionKey]
 
+    # identifies the public key a stanza was created for, if the recipient type has one
+    fingerprint: typing.Optional[bytes] = None
+
+    @classmethod
+    def identity_fingerprint(cls, key: DecryptionKey) -> typing.Optional[bytes]:
+        """Fingerprint that stanzas created for the public key of ``key`` carry, if any"""
+        return None
+
     @abc.abstractmethod
     def decrypt(self, key: DecryptionKey) -> bytes:
         raise NotImplementedError
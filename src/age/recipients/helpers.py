@@ -1,3 +1,5 @@
+import concurrent.futures
+import threading
 import typing
 
 from cryptography.exceptions import InvalidTag
@@ -20,20 +22,152 @@ from age.recipients.x25519 import X25519Recipient  # noqa: F401
 # off black formatting for that section.
 
 
-def _filter_keys_for_recipient(recipient: Recipient, keys: typing.Collection[DecryptionKey]):
-    return set(k for k in keys if isinstance(k, recipient.DECRYPTION_KEY_TYPE))
+class IdentityStore:
+    """Collection of identities (private keys), indexed for matching them to recipient stanzas
+
+    Identities are indexed once when they are added: by the recipient types they can decrypt and,
+    for stanza types which identify the public key (such as ``ssh-rsa`` and ``ssh-ed25519``), by
+    fingerprint. Looking up the identities for a stanza is then a dictionary lookup, no matter how
+    many identities are stored.
+
+    An identity store can be passed wherever a collection of identities is expected, e.g. to
+    :class:`age.file.Decryptor`.
+
+    :param identities: Initial identities
+    """
+
+    def __init__(self, identities: typing.Iterable[DecryptionKey] = ()):
+        self._identities: typing.List[DecryptionKey] = []
+        self._seen: typing.Set[DecryptionKey] = set()
+        self._by_type: typing.Dict[str, typing.List[DecryptionKey]] = {}
+        self._by_fingerprint: typing.Dict[typing.Tuple[str, bytes], typing.List[DecryptionKey]] = {}
+
+        self.update(identities)
+
+    def __len__(self) -> int:
+        return len(self._identities)
+
+    def __iter__(self) -> typing.Iterator[DecryptionKey]:
+        return iter(self._identities)
+
+    def __contains__(self, identity) -> bool:
+        return identity in self._seen
+
+    def add(self, identity: DecryptionKey) -> None:
+        """Add ``identity`` to the store (adding an identity twice has no effect)"""
+        if identity in self._seen:
+            return
+        self._seen.add(identity)
+        self._identities.append(identity)
+
+        for subclass in Recipient.__subclasses__():
+            if isinstance(identity, subclass.DECRYPTION_KEY_TYPE):
+                fingerprint = subclass.identity_fingerprint(identity)
+                if fingerprint is None:
+                    self._by_type.setdefault(subclass.TAG, []).append(identity)
+                else:
+                    index = (subclass.TAG, fingerprint)
+                    self._by_fingerprint.setdefault(index, []).append(identity)
+
+    def update(self, identities: typing.Iterable[DecryptionKey]) -> None:
+        """Add all ``identities`` to the store"""
+        for identity in identities:
+            self.add(identity)
+
+    def candidates(self, recipient: Recipient) -> typing.List[DecryptionKey]:
+        """Identities which may be able to decrypt the stanza ``recipient``, in insertion order"""
+        if recipient.fingerprint is not None:
+            return self._by_fingerprint.get((recipient.TAG, recipient.fingerprint), [])
+        return self._by_type.get(recipient.TAG, [])
 
 
 def decrypt_file_key(
+    recipients: typing.Collection[Recipient],
+    keys: typing.Collection[DecryptionKey],
+    workers: int = 1,
+) -> bytes:
+    """Try to unwrap the file key from any of the ``recipients`` with any of the ``keys``
+
+    With ``workers`` greater than one, the (stanza, identity) pairs are tried concurrently on a
+    thread pool, and all workers stop as soon as one pair succeeds. This pays off for headers with
+    many stanzas without a fingerprint (e.g. ``X25519``) and many identities. The file key from
+    any successful pair is returned, which is only different from the sequential result for
+    headers whose MAC will not verify anyway.
+
+    :param recipients: Recipient stanzas of the header
+    :param keys: Identities to try, preferably as an :class:`IdentityStore`
+    :param workers: Number of threads trying pairs
+    :returns: File key
+    :raises age.exceptions.NoIdentity: if none of the ``keys`` can unwrap the file key
+    """
+    if workers > 1:
+        pairs = _candidate_pairs(recipients, keys)
+        if len(pairs) > 1:
+            return _decrypt_file_key_concurrently(pairs, min(workers, len(pairs)))
+
+    return unwrap_file_key(recipients, keys)[2]
+
+
+def unwrap_file_key(
+    recipients: typing.Collection[Recipient], keys: typing.Collection[DecryptionKey]
+) -> typing.Tuple[Recipient, DecryptionKey, bytes]:
+    """Find the first stanza and identity which unwrap the file key
+
+    Stanzas are tried in order, each with the identities which may match it.
+
+    :param recipients: Recipient stanzas of the header
+    :param keys: Identities to try, preferably as an :class:`IdentityStore`
+    :returns: The stanza, the identity and the file key
+    :raises age.exceptions.NoIdentity: if none of the ``keys`` can unwrap the file key
+    """
+    for recipient, key in _candidate_pairs(recipients, keys):
+        try:
+            return recipient, key, recipient.decrypt(key)
+        except InvalidTag:
+            continue
+
+    raise NoIdentity("No matching key")
+
+
+def _candidate_pairs(
     recipients: typing.Collection[Recipient], keys: typing.Collection[DecryptionKey]
+) -> typing.List[typing.Tuple[Recipient, DecryptionKey]]:
+    store = keys if isinstance(keys, IdentityStore) else IdentityStore(keys)
+    return [(recipient, key) for recipient in recipients for key in store.candidates(recipient)]
+
+
+def _decrypt_file_key_concurrently(
+    pairs: typing.List[typing.Tuple[Recipient, DecryptionKey]], workers: int
 ) -> bytes:
-    for recipient in recipients:
-        for key in _filter_keys_for_recipient(recipient, keys):
+    found = threading.Event()
+    file_keys: typing.List[bytes] = []
+
+    def work(offset: int) -> None:
+        # every worker takes every n-th pair, so all of them start at the front of the header
+        for recipient, key in pairs[offset::workers]:
+            if found.is_set():
+                return
             try:
-                return recipient.decrypt(key)
+                file_key = recipient.decrypt(key)
             except InvalidTag:
                 continue
+            file_keys.append(file_key)
+            found.set()
+
+    failures: typing.List[BaseException] = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(work, offset) for offset in range(workers)]
+        for future in concurrent.futures.as_completed(futures):
+            exception = future.exception()
+            if exception is not None:
+                # stop the other workers early, an unexpected error ends the search
+                failures.append(exception)
+                found.set()
 
+    if file_keys:
+        return file_keys[0]
+    if failures:
+        raise failures[0]
     raise NoIdentity("No matching key")
 
 
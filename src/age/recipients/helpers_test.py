@@ -5,7 +5,14 @@ from pytest import raises
 from age.exceptions import NoIdentity, UnknownRecipient
 from age.keys.agekey import AgePrivateKey
 from age.keys.base import EncryptionKey
-from age.recipients.helpers import decrypt_file_key, generate_recipient_from_key, get_recipient
+from age.keys.ed25519 import Ed25519PrivateKey
+from age.recipients.helpers import (
+    IdentityStore,
+    decrypt_file_key,
+    generate_recipient_from_key,
+    get_recipient,
+)
+from age.recipients.ssh_ed25519 import SSHED25519Recipient
 from age.recipients.x25519 import X25519Recipient
 
 
@@ -47,3 +54,58 @@ def test_recipient_from_key():
 
     with raises(UnknownRecipient):
         generate_recipient_from_key(EncryptionKey(), file_key)
+
+
+def test_identity_store():
+    file_key = os.urandom(16)
+
+    age_keys = [AgePrivateKey.generate() for _ in range(3)]
+    ssh_keys = [Ed25519PrivateKey.generate() for _ in range(3)]
+    store = IdentityStore(age_keys + ssh_keys)
+    store.add(age_keys[0])
+
+    assert len(store) == 6
+    assert list(store) == age_keys + ssh_keys
+    assert ssh_keys[1] in store
+
+    x25519_recipient = X25519Recipient.generate(age_keys[1].public_key(), file_key)
+    assert store.candidates(x25519_recipient) == age_keys
+
+    # stanzas with a fingerprint only match the identity with that fingerprint
+    ssh_recipient = SSHED25519Recipient.generate(ssh_keys[1].public_key(), file_key)
+    assert store.candidates(ssh_recipient) == [ssh_keys[1]]
+    assert (
+        store.candidates(
+            SSHED25519Recipient.generate(Ed25519PrivateKey.generate().public_key(), file_key)
+        )
+        == []
+    )
+
+    assert decrypt_file_key([ssh_recipient, x25519_recipient], store) == file_key
+    assert decrypt_file_key([x25519_recipient], store) == file_key
+
+    with raises(NoIdentity):
+        decrypt_file_key([ssh_recipient], IdentityStore(ssh_keys[2:]))
+
+
+def test_decrypt_file_key_concurrently():
+    file_key = os.urandom(16)
+
+    identities = [AgePrivateKey.generate() for _ in range(10)]
+    recipients = [
+        X25519Recipient.generate(AgePrivateKey.generate().public_key(), file_key) for _ in range(5)
+    ]
+    recipients.append(X25519Recipient.generate(identities[-1].public_key(), file_key))
+
+    assert decrypt_file_key(recipients, identities, workers=4) == file_key
+
+    with raises(NoIdentity):
+        decrypt_file_key(recipients, identities[:-1], workers=4)
+
+    class BrokenRecipient(X25519Recipient):
+        def decrypt(self, private_key):
+            raise RuntimeError("broken")
+
+    broken = BrokenRecipient(recipients[0].derived_secret, recipients[0].encrypted_file_key)
+    with raises(RuntimeError):
+        decrypt_file_key([broken] + recipients[:-1], identities, workers=4)
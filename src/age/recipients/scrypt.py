@@ -1,6 +1,6 @@
 import typing
 
-from age.algorithms.scrypt import scrypt_decrypt_file_key, scrypt_encrypt_file_key
+from age.algorithms.scrypt import DEFAULT_LOG_COST, scrypt_decrypt_file_key, scrypt_encrypt_file_key
 from age.keys.base import DecryptionKey, EncryptionKey
 from age.keys.password import PasswordKey
 from age.primitives.encode import decode, encode
@@ -20,7 +20,10 @@ class SCryptRecipient(Recipient):
     @classmethod
     def generate(cls, password_key: EncryptionKey, file_key: bytes):
         assert isinstance(password_key, PasswordKey)
-        salt, cost, encrypted_file_key = scrypt_encrypt_file_key(password_key, file_key)
+        log_cost = password_key.log_cost
+        if log_cost is None:
+            log_cost = DEFAULT_LOG_COST
+        salt, cost, encrypted_file_key = scrypt_encrypt_file_key(password_key, file_key, log_cost)
         return cls(salt, cost, encrypted_file_key)
 
     @classmethod
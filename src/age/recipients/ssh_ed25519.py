@@ -26,6 +26,11 @@ class SSHED25519Recipient(Recipient):
         )
         return cls(fingerprint, derived_secret, encrypted_file_key)
 
+    @classmethod
+    def identity_fingerprint(cls, key: DecryptionKey) -> typing.Optional[bytes]:
+        assert isinstance(key, Ed25519PrivateKey)
+        return key.stanza_fingerprint()
+
     @classmethod
     def load(cls, args: typing.List[str], body: str):
         return cls(decode(args[0]), ECPoint(decode(args[1])), decode(body))
@@ -22,6 +22,11 @@ class SSHRSARecipient(Recipient):
         fingerprint, encrypted_file_key = ssh_rsa_encrypt_file_key(password_key, file_key)
         return cls(fingerprint, encrypted_file_key)
 
+    @classmethod
+    def identity_fingerprint(cls, key: DecryptionKey) -> typing.Optional[bytes]:
+        assert isinstance(key, RSAPrivateKey)
+        return key.stanza_fingerprint()
+
     @classmethod
     def load(cls, args: typing.List[str], body: str):
         return cls(decode(args[0]), decode(body))
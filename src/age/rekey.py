@@ -0,0 +1,158 @@
+"""Change the recipients of encrypted files without re-encrypting the payload
+
+The payload of an age file only depends on the file key and the payload nonce. Adding or removing
+recipients therefore only requires a new header: :func:`rekey_file` unwraps the file key with a
+local identity, wraps it for the new recipients, authenticates the new header and keeps the
+payload bytes as they are.
+
+If the new header has the same size as the old one (e.g. when one ``X25519`` recipient is
+replaced by another), it is written over the old header in place. Otherwise, the new header and
+the payload are streamed to a temporary file, which then replaces the original file.
+"""
+
+import concurrent.futures
+import io
+import os
+import shutil
+import tempfile
+import typing
+
+from age.file import decrypt_header, write_header
+from age.keys.base import DecryptionKey, EncryptionKey
+
+__all__ = ["RekeyResult", "rekey_file", "rekey_files", "rekey_tree"]
+
+COPY_BUFFER_SIZE = 1024 * 1024
+"""Size of the buffer used to copy the payload when the header size changes"""
+
+PathType = typing.Union[str, os.PathLike]
+
+
+class RekeyResult(typing.NamedTuple):
+    """Outcome of rekeying a single file in :func:`rekey_files` and :func:`rekey_tree`"""
+
+    path: PathType
+    """Path of the file"""
+
+    in_place: bool
+    """Whether the header was replaced in place (see :func:`rekey_file`)"""
+
+    error: typing.Optional[Exception] = None
+    """Error which prevented rekeying the file, if any (the file is left unchanged)"""
+
+
+def _replace_file(path: PathType, header: bytes, payload_start: int) -> None:
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temporary_path = tempfile.mkstemp(dir=directory, prefix=".rekey-")
+
+    try:
+        with os.fdopen(fd, "wb") as dst, open(path, "rb") as src:
+            dst.write(header)
+            src.seek(payload_start)
+            shutil.copyfileobj(src, dst, COPY_BUFFER_SIZE)
+            dst.flush()
+            os.fsync(dst.fileno())
+
+        shutil.copymode(path, temporary_path)
+        os.replace(temporary_path, path)
+    except BaseException:
+        os.remove(temporary_path)
+        raise
+
+
+def rekey_file(
+    path: PathType,
+    identities: typing.Collection[DecryptionKey],
+    keys: typing.Collection[EncryptionKey],
+    workers: int = 1,
+) -> bool:
+    """Replace the recipients of the file at ``path`` with ``keys``
+
+    The file key is unwrapped with ``identities`` and the header MAC is verified before anything
+    is written. A header of unchanged size is overwritten in place, which is not atomic; a header
+    of different size is written with a copy of the payload to a temporary file in the same
+    directory, which atomically replaces ``path``. The file must not be modified concurrently.
+
+    :param path: Ciphertext file
+    :param identities: Private keys to try (or an :class:`age.recipients.helpers.IdentityStore`)
+    :param keys: Public keys of all recipients of the rekeyed file
+    :param workers: Number of threads unwrapping and wrapping the file key
+    :returns: ``True`` if the header was replaced in place, ``False`` if the file was rewritten
+    :raises ValueError: if ``keys`` is empty
+    :raises age.exceptions.NoIdentity: if none of the ``identities`` matches
+    :raises cryptography.exceptions.InvalidSignature: if the header MAC does not verify
+    """
+    if not keys:
+        raise ValueError("At least one recipient is required")
+
+    with open(path, "rb") as file:
+        file_key = decrypt_header(identities, file, workers)
+        payload_start = file.tell()
+
+    header_stream = io.BytesIO()
+    write_header(keys, file_key, header_stream, workers)
+    header_stream.write(b"\n")
+    header = header_stream.getvalue()
+
+    if len(header) != payload_start:
+        _replace_file(path, header, payload_start)
+        return False
+
+    with open(path, "r+b") as file:
+        file.write(header)
+        file.flush()
+        os.fsync(file.fileno())
+    return True
+
+
+def rekey_files(
+    paths: typing.Iterable[PathType],
+    identities: typing.Collection[DecryptionKey],
+    keys: typing.Collection[EncryptionKey],
+    workers: int = 1,
+) -> typing.List[RekeyResult]:
+    """Rekey all files in ``paths`` (see :func:`rekey_file`), ``workers`` files at a time
+
+    A file which cannot be rekeyed does not stop the others; its error is reported in the result.
+
+    :param paths: Ciphertext files
+    :param identities: Private keys to try (or an :class:`age.recipients.helpers.IdentityStore`)
+    :param keys: Public keys of all recipients of the rekeyed files
+    :param workers: Number of threads rekeying files in parallel
+    :returns: One result per file, in the order of ``paths``
+    """
+
+    def rekey(path: PathType) -> RekeyResult:
+        try:
+            return RekeyResult(path, rekey_file(path, identities, keys))
+        except Exception as e:
+            return RekeyResult(path, False, e)
+
+    paths = list(paths)
+    if workers > 1 and len(paths) > 1:
+        with concurrent.futures.ThreadPoolExecutor(min(workers, len(paths))) as executor:
+            return list(executor.map(rekey, paths))
+    return [rekey(path) for path in paths]
+
+
+def rekey_tree(
+    root: PathType,
+    identities: typing.Collection[DecryptionKey],
+    keys: typing.Collection[EncryptionKey],
+    workers: int = 1,
+    suffix: str = ".age",
+) -> typing.List[RekeyResult]:
+    """Rekey all files ending in ``suffix`` below the directory ``root`` (see :func:`rekey_files`)
+
+    :param root: Directory to search recursively
+    :param identities: Private keys to try (or an :class:`age.recipients.helpers.IdentityStore`)
+    :param keys: Public keys of all recipients of the rekeyed files
+    :param workers: Number of threads rekeying files in parallel
+    :param suffix: File name suffix of the files to rekey
+    :returns: One result per file, sorted by path
+    """
+    paths: typing.List[str] = []
+    for directory, _, filenames in os.walk(os.fspath(root)):
+        paths.extend(os.path.join(directory, name) for name in filenames if name.endswith(suffix))
+
+    return rekey_files(sorted(paths), identities, keys, workers)
@@ -0,0 +1,93 @@
+import io
+import os
+
+import pytest
+
+from age.exceptions import NoIdentity
+from age.file import Decryptor, Encryptor
+from age.keys.agekey import AgePrivateKey
+from age.keys.ed25519 import Ed25519PrivateKey
+from age.rekey import rekey_file, rekey_tree
+
+DATA = os.urandom(200_000)
+
+
+def _create(path, keys) -> bytes:
+    stream = io.BytesIO()
+    with Encryptor(keys, stream) as encryptor:
+        encryptor.write(DATA)
+
+    with open(path, "wb") as file:
+        file.write(stream.getvalue())
+    return stream.getvalue()
+
+
+def _decrypt(path, identities) -> bytes:
+    with open(path, "rb") as file, Decryptor(identities, file) as decryptor:
+        return decryptor.read()
+
+
+def test_rekey_in_place(tmp_path):
+    old_key, new_key = AgePrivateKey.generate(), AgePrivateKey.generate()
+    path = tmp_path / "file.age"
+    ciphertext = _create(path, [old_key.public_key()])
+
+    assert rekey_file(path, [old_key], [new_key.public_key()])
+
+    rekeyed = path.read_bytes()
+    assert len(rekeyed) == len(ciphertext)
+    # the payload nonce and the payload are unchanged
+    assert rekeyed[-len(DATA) :] == ciphertext[-len(DATA) :]
+
+    assert _decrypt(path, [new_key]) == DATA
+    with pytest.raises(NoIdentity):
+        _decrypt(path, [old_key])
+
+
+def test_rekey_rewrite(tmp_path):
+    old_key, new_key = AgePrivateKey.generate(), Ed25519PrivateKey.generate()
+    path = tmp_path / "file.age"
+    ciphertext = _create(path, [old_key.public_key()])
+    os.chmod(path, 0o600)
+
+    assert not rekey_file(path, [old_key], [old_key.public_key(), new_key.public_key()])
+
+    rekeyed = path.read_bytes()
+    assert len(rekeyed) > len(ciphertext)
+    assert rekeyed[-len(DATA) :] == ciphertext[-len(DATA) :]
+    assert os.stat(path).st_mode & 0o777 == 0o600
+    assert os.listdir(tmp_path) == ["file.age"]
+
+    assert _decrypt(path, [old_key]) == DATA
+    assert _decrypt(path, [new_key]) == DATA
+
+
+def test_rekey_wrong_identity(tmp_path):
+    key = AgePrivateKey.generate()
+    path = tmp_path / "file.age"
+    ciphertext = _create(path, [key.public_key()])
+
+    with pytest.raises(NoIdentity):
+        rekey_file(path, [AgePrivateKey.generate()], [key.public_key()])
+    assert path.read_bytes() == ciphertext
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_rekey_tree(tmp_path, workers):
+    old_key, new_key = AgePrivateKey.generate(), AgePrivateKey.generate()
+
+    (tmp_path / "a" / "b").mkdir(parents=True)
+    paths = [tmp_path / "x.age", tmp_path / "a" / "y.age", tmp_path / "a" / "b" / "z.age"]
+    for path in paths:
+        _create(path, [old_key.public_key()])
+    _create(tmp_path / "a" / "foreign.age", [AgePrivateKey.generate().public_key()])
+    (tmp_path / "a" / "plain.txt").write_bytes(b"not encrypted")
+
+    results = rekey_tree(tmp_path, [old_key], [new_key.public_key()], workers=workers)
+
+    failed = [result.path for result in results if result.error is not None]
+    assert failed == [str(tmp_path / "a" / "foreign.age")]
+    assert len(results) == 4
+
+    for path in paths:
+        assert _decrypt(path, [new_key]) == DATA
@@ -1,10 +1,21 @@
 import math
+import typing
 
-from cryptography.hazmat.primitives.ciphers.aead import ChaCha20Poly1305
+from cryptography.exceptions import InvalidTag
+
+from age.primitives.aead import AEAD, new_aead
+from age.utils.bufferpool import BufferPool
+from age.utils.concurrency import OrderedExecutor
 
 PLAINTEXT_BLOCK_SIZE = 64 * 1024
 CIPHERTEXT_BLOCK_SIZE = PLAINTEXT_BLOCK_SIZE + 16
 
+PLAINTEXT_BUFFERS = BufferPool(PLAINTEXT_BLOCK_SIZE)
+"""Pool of plaintext chunk buffers shared by all encryptors and decryptors"""
+
+CIPHERTEXT_BUFFERS = BufferPool(CIPHERTEXT_BLOCK_SIZE)
+"""Pool of ciphertext chunk buffers shared by all encryptors and decryptors"""
+
 NONCE_COUNTER_MAX = 2 ** (8 * 11) - 1
 
 
@@ -13,38 +24,313 @@ def _pack_nonce(nonce: int, last_block: bool = False) -> bytes:
     return nonce.to_bytes(11, byteorder="big", signed=False) + (b"\x01" if last_block else b"\x00")
 
 
+def _increment_nonce(nonce: bytearray) -> None:
+    # big-endian increment of the 11-byte counter in place, usually touching a single byte
+    for i in range(10, -1, -1):
+        if nonce[i] != 0xFF:
+            nonce[i] += 1
+            return
+        nonce[i] = 0
+    raise AssertionError("Stream nonce wrapped around")
+
+
 def _chunk(data, size):
-    for i in range(0, len(data), size):
-        yield data[i : i + size]
+    view = memoryview(data).cast("B")
+    for i in range(0, len(view), size):
+        yield view[i : i + size]
+
+
+def chunk_count(ciphertext_size: int) -> int:
+    """Number of chunks in a payload of ``ciphertext_size`` bytes (excluding the nonce)"""
+    return math.ceil(ciphertext_size / CIPHERTEXT_BLOCK_SIZE)
+
+
+def ciphertext_size(plaintext_size: int) -> int:
+    """Size of the payload (excluding the nonce) for ``plaintext_size`` bytes of plaintext"""
+    # an empty plaintext is encrypted as a single empty chunk
+    return plaintext_size + 16 * max(math.ceil(plaintext_size / PLAINTEXT_BLOCK_SIZE), 1)
+
+
+def plaintext_size(ciphertext_size: int) -> int:
+    """Size of the plaintext of a payload of ``ciphertext_size`` bytes (excluding the nonce)"""
+    count = chunk_count(ciphertext_size)
+    if count == 0:
+        return 0
+
+    # a final chunk shorter than its tag is invalid, but must not shrink the chunks before it
+    last_chunk_size = ciphertext_size - (count - 1) * CIPHERTEXT_BLOCK_SIZE
+    return (count - 1) * PLAINTEXT_BLOCK_SIZE + max(last_chunk_size - 16, 0)
+
+
+def _read_full(stream: typing.BinaryIO, size: int) -> bytes:
+    data = stream.read(size)
+    if not data or len(data) == size:
+        return data
+
+    # raw streams may return less data than requested before reaching EOF
+    parts = [data]
+    missing = size - len(data)
+    while missing > 0:
+        data = stream.read(missing)
+        if not data:
+            break
+        parts.append(data)
+        missing -= len(data)
+    return b"".join(parts)
+
+
+def read_chunks(
+    stream: typing.BinaryIO, size: int = CIPHERTEXT_BLOCK_SIZE
+) -> typing.Iterator[typing.Tuple[bytes, bool]]:
+    """Read consecutive chunks of ``size`` bytes from ``stream``
+
+    The stream is read one chunk ahead, so that the last chunk can be recognized even if it is
+    exactly ``size`` bytes long.
+
+    :param stream: Stream to read from
+    :param size: Chunk size
+    :returns: Iterator over tuples of chunk data and a flag indicating the last chunk
+    """
+    current = _read_full(stream, size)
+    while current:
+        following = _read_full(stream, size)
+        yield current, not following
+        current = following
+
+
+def _readinto_full(stream, view: memoryview) -> int:
+    length = 0
+    while length < len(view):
+        n = stream.readinto(view[length:])
+        if not n:
+            break
+        length += n
+    return length
+
+
+def read_chunks_pooled(stream: typing.BinaryIO) -> typing.Iterator[typing.Tuple[memoryview, bool]]:
+    """Like :func:`read_chunks`, but read into two buffers from :data:`CIPHERTEXT_BUFFERS`
+
+    Each chunk is only valid until the next one is requested. The buffers are returned to the
+    pool once the iterator is exhausted or closed.
+    """
+    buffers = [CIPHERTEXT_BUFFERS.acquire(), CIPHERTEXT_BUFFERS.acquire()]
+    views = [memoryview(buffer) for buffer in buffers]
+    try:
+        current = views[0][: _readinto_full(stream, views[0])]
+        while current:
+            views.reverse()
+            following = views[0][: _readinto_full(stream, views[0])]
+            yield current, not following
+            current = following
+    finally:
+        for buffer in buffers:
+            CIPHERTEXT_BUFFERS.release(buffer)
+
+
+def encrypt_chunk(
+    aead: AEAD, nonce: int, block: typing.Union[bytes, memoryview], last_block: bool
+) -> bytes:
+    """Encrypt a single payload chunk
+
+    :param aead: Cipher instance for the payload key
+    :param nonce: Chunk counter (index of the chunk in the payload)
+    :param block: Plaintext of at most :data:`PLAINTEXT_BLOCK_SIZE` bytes
+    :param last_block: Whether this is the final chunk of the payload
+    :returns: Ciphertext of the chunk (``len(block) + 16`` bytes)
+    """
+    packed_nonce = _pack_nonce(nonce, last_block=last_block)
+    return aead.encrypt(nonce=packed_nonce, data=block, associated_data=None)
+
+
+def decrypt_chunk(
+    aead: AEAD, nonce: int, block: typing.Union[bytes, memoryview], last_block: bool
+) -> bytes:
+    """Decrypt and authenticate a single payload chunk
+
+    :param aead: Cipher instance for the payload key
+    :param nonce: Chunk counter (index of the chunk in the payload)
+    :param block: Ciphertext of at most :data:`CIPHERTEXT_BLOCK_SIZE` bytes
+    :param last_block: Whether this is the final chunk of the payload
+    :returns: Plaintext of the chunk
+    :raises cryptography.exceptions.InvalidTag: if authentication fails
+    """
+    packed_nonce = _pack_nonce(nonce, last_block=last_block)
+    return aead.decrypt(nonce=packed_nonce, data=block, associated_data=None)
+
 
+def encrypt_chunk_into(aead: AEAD, nonce: int, block, last_block: bool, out) -> int:
+    """Like :func:`encrypt_chunk`, but write the ciphertext into ``out``
 
-def stream_encrypt(key: bytes, data: bytes) -> bytes:
+    :returns: Number of bytes written (``len(block) + 16``)
+    """
+    size = len(block) + 16
+    with memoryview(out) as view:
+        _encrypt_into(aead, _pack_nonce(nonce, last_block=last_block), block, view[:size])
+    return size
+
+
+def decrypt_chunk_into(aead: AEAD, nonce: int, block, last_block: bool, out) -> int:
+    """Like :func:`decrypt_chunk`, but write the plaintext into ``out``
+
+    :returns: Number of bytes written (``len(block) - 16``)
+    :raises cryptography.exceptions.InvalidTag: if authentication fails
+    """
+    size = max(len(block) - 16, 0)
+    with memoryview(out) as view:
+        _decrypt_into(aead, _pack_nonce(nonce, last_block=last_block), block, view[:size])
+    return size
+
+
+def _encrypt_into(aead: AEAD, nonce, block, out: memoryview) -> None:
+    aead.encrypt_into(nonce, block, None, out)
+
+
+def _decrypt_into(aead: AEAD, nonce, block, out: memoryview) -> None:
+    if len(block) < 16:
+        # too short to even contain the tag
+        raise InvalidTag()
+    aead.decrypt_into(nonce, block, None, out)
+
+
+def _stream_encrypt_into(key: bytes, data, out, workers: int) -> None:
     assert len(key) == 32
 
-    aead = ChaCha20Poly1305(key)
-    blocks = math.ceil(len(data) / PLAINTEXT_BLOCK_SIZE)
+    aead = new_aead(key)
+    out = memoryview(out).cast("B")
+    blocks = chunk_count(len(out))
 
-    encrypted = b""
-    for nonce, block in enumerate(_chunk(data, PLAINTEXT_BLOCK_SIZE)):
-        last_block = nonce == blocks - 1
-        packed_nonce = _pack_nonce(nonce, last_block=last_block)
+    chunks = enumerate(_chunk(data, PLAINTEXT_BLOCK_SIZE) if len(data) else [b""])
+    if workers > 1:
 
-        encrypted += aead.encrypt(nonce=packed_nonce, data=block, associated_data=None)
+        def encrypt(args: typing.Tuple[int, memoryview]) -> None:
+            nonce, block = args
+            start = nonce * CIPHERTEXT_BLOCK_SIZE
+            packed_nonce = _pack_nonce(nonce, last_block=nonce == blocks - 1)
+            _encrypt_into(aead, packed_nonce, block, out[start : start + len(block) + 16])
 
-    return encrypted
+        with OrderedExecutor(workers) as executor:
+            for _ in executor.map(encrypt, chunks):
+                pass
+    else:
+        packed_nonce = bytearray(12)
+        for nonce, block in chunks:
+            if nonce > 0:
+                _increment_nonce(packed_nonce)
+            if nonce == blocks - 1:
+                packed_nonce[11] = 1
 
+            start = nonce * CIPHERTEXT_BLOCK_SIZE
+            _encrypt_into(aead, packed_nonce, block, out[start : start + len(block) + 16])
 
-def stream_decrypt(key: bytes, data: bytes) -> bytes:
+
+def _stream_decrypt_into(key: bytes, data, out, workers: int) -> None:
     assert len(key) == 32
 
-    aead = ChaCha20Poly1305(key)
-    blocks = math.ceil(len(data) / CIPHERTEXT_BLOCK_SIZE)
+    aead = new_aead(key)
+    out = memoryview(out).cast("B")
+    blocks = chunk_count(len(data))
+
+    chunks = enumerate(_chunk(data, CIPHERTEXT_BLOCK_SIZE))
+    if workers > 1:
+
+        def decrypt(args: typing.Tuple[int, memoryview]) -> None:
+            nonce, block = args
+            start = nonce * PLAINTEXT_BLOCK_SIZE
+            packed_nonce = _pack_nonce(nonce, last_block=nonce == blocks - 1)
+            _decrypt_into(aead, packed_nonce, block, out[start : start + len(block) - 16])
+
+        with OrderedExecutor(workers) as executor:
+            for _ in executor.map(decrypt, chunks):
+                pass
+    else:
+        packed_nonce = bytearray(12)
+        for nonce, block in chunks:
+            if nonce > 0:
+                _increment_nonce(packed_nonce)
+            if nonce == blocks - 1:
+                packed_nonce[11] = 1
+
+            start = nonce * PLAINTEXT_BLOCK_SIZE
+            _decrypt_into(aead, packed_nonce, block, out[start : start + len(block) - 16])
+
+
+def _writable_view(buffer, size: int) -> memoryview:
+    view = memoryview(buffer).cast("B")
+    if view.readonly:
+        raise TypeError("output buffer is not writable")
+    if len(view) < size:
+        raise ValueError(f"output buffer too small ({len(view)} < {size} bytes)")
+    return view[:size]
+
+
+def stream_encrypt_into(key: bytes, src, dst, workers: int = 1) -> int:
+    """Encrypt ``src`` with the payload ``key`` into the caller-provided buffer ``dst``
+
+    No memory is allocated per chunk if the AEAD implementation supports encrypting in place.
+
+    :param key: 32-byte payload key
+    :param src: Plaintext (any bytes-like object)
+    :param dst: Writable buffer of at least :func:`ciphertext_size` (``len(src)``) bytes
+    :param workers: Number of threads encrypting chunks in parallel
+    :returns: Number of bytes written to ``dst``
+    :raises TypeError: if ``dst`` is not writable
+    :raises ValueError: if ``dst`` is too small
+    """
+    src = memoryview(src).cast("B")
+    out = _writable_view(dst, ciphertext_size(len(src)))
+    _stream_encrypt_into(key, src, out, workers)
+    return len(out)
+
+
+def stream_decrypt_into(key: bytes, src, dst, workers: int = 1) -> int:
+    """Decrypt ``src`` with the payload ``key`` into the caller-provided buffer ``dst``
+
+    If authentication fails, ``dst`` may contain partially decrypted data, which must not be used.
+
+    :param key: 32-byte payload key
+    :param src: Ciphertext (any bytes-like object)
+    :param dst: Writable buffer of at least :func:`plaintext_size` (``len(src)``) bytes
+    :param workers: Number of threads decrypting chunks in parallel
+    :returns: Number of bytes written to ``dst``
+    :raises TypeError: if ``dst`` is not writable
+    :raises ValueError: if ``dst`` is too small
+    :raises cryptography.exceptions.InvalidTag: if authentication of any chunk fails
+    """
+    src = memoryview(src).cast("B")
+    out = _writable_view(dst, plaintext_size(len(src)))
+    _stream_decrypt_into(key, src, out, workers)
+    return len(out)
+
+
+def stream_encrypt(key: bytes, data: bytes, workers: int = 1) -> bytearray:
+    """Encrypt ``data`` with the payload ``key``
+
+    Chunks are sliced from ``data`` without copying and their ciphertext is written into a single
+    preallocated buffer.
+
+    :param key: 32-byte payload key
+    :param data: Plaintext (any bytes-like object)
+    :param workers: Number of threads encrypting chunks in parallel
+    :returns: Ciphertext (as :class:`bytearray`)
+    """
+    encrypted = bytearray(ciphertext_size(len(data)))
+    _stream_encrypt_into(key, data, encrypted, workers)
+    return encrypted
+
 
-    decrypted = b""
-    for nonce, block in enumerate(_chunk(data, CIPHERTEXT_BLOCK_SIZE)):
-        last_block = nonce == blocks - 1
-        packed_nonce = _pack_nonce(nonce, last_block=last_block)
+def stream_decrypt(key: bytes, data: bytes, workers: int = 1) -> bytearray:
+    """Decrypt ``data`` with the payload ``key``
 
-        decrypted += aead.decrypt(nonce=packed_nonce, data=block, associated_data=None)
+    Chunks are sliced from ``data`` without copying and their plaintext is written into a single
+    preallocated buffer.
 
+    :param key: 32-byte payload key
+    :param data: Ciphertext (any bytes-like object)
+    :param workers: Number of threads decrypting chunks in parallel
+    :returns: Plaintext (as :class:`bytearray`)
+    :raises cryptography.exceptions.InvalidTag: if authentication of any chunk fails
+    """
+    decrypted = bytearray(plaintext_size(len(data)))
+    _stream_decrypt_into(key, data, decrypted, workers)
     return decrypted
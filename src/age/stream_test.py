@@ -1,8 +1,25 @@
+import io
 import os
 
+from cryptography.exceptions import InvalidTag
 from pytest import raises
 
-from .stream import _chunk, _pack_nonce, stream_decrypt, stream_encrypt
+from .stream import (
+    CIPHERTEXT_BLOCK_SIZE,
+    CIPHERTEXT_BUFFERS,
+    PLAINTEXT_BLOCK_SIZE,
+    _chunk,
+    _increment_nonce,
+    _pack_nonce,
+    ciphertext_size,
+    plaintext_size,
+    read_chunks,
+    read_chunks_pooled,
+    stream_decrypt,
+    stream_decrypt_into,
+    stream_encrypt,
+    stream_encrypt_into,
+)
 
 
 def test_chunk():
@@ -40,6 +57,52 @@ def test_pack_nonce():
         _pack_nonce(0x665544332211AABBCCDDEEFF, True)
 
 
+def test_increment_nonce():
+    nonce = bytearray(_pack_nonce(0))
+    for i in range(1, 1000):
+        _increment_nonce(nonce)
+        assert nonce == _pack_nonce(i)
+
+    nonce = bytearray(_pack_nonce(0xFFFF))
+    _increment_nonce(nonce)
+    assert nonce == _pack_nonce(0x10000)
+
+    nonce = bytearray(_pack_nonce(2 ** 88 - 1))
+    with raises(AssertionError):
+        _increment_nonce(nonce)
+
+
+def test_sizes():
+    for size in [0, 1, PLAINTEXT_BLOCK_SIZE, PLAINTEXT_BLOCK_SIZE + 1, 10 * PLAINTEXT_BLOCK_SIZE]:
+        assert plaintext_size(ciphertext_size(size)) == size
+
+    assert ciphertext_size(0) == 16
+    assert ciphertext_size(PLAINTEXT_BLOCK_SIZE) == CIPHERTEXT_BLOCK_SIZE
+
+    # a final chunk shorter than the tag does not count against the previous chunk
+    assert plaintext_size(0) == 0
+    assert plaintext_size(5) == 0
+    assert plaintext_size(CIPHERTEXT_BLOCK_SIZE + 5) == PLAINTEXT_BLOCK_SIZE
+
+
+def test_stream_empty():
+    key = os.urandom(32)
+
+    ciphertext = stream_encrypt(key, b"")
+    assert len(ciphertext) == 16
+    assert stream_decrypt(key, ciphertext) == b""
+
+
+def test_stream_truncated():
+    key = os.urandom(32)
+    ciphertext = stream_encrypt(key, os.urandom(2 * PLAINTEXT_BLOCK_SIZE))
+
+    for workers in [1, 2]:
+        for size in [CIPHERTEXT_BLOCK_SIZE + 5, CIPHERTEXT_BLOCK_SIZE + 16, 5]:
+            with raises(InvalidTag):
+                stream_decrypt(key, ciphertext[:size], workers)
+
+
 def test_stream():
     key = os.urandom(32)
     data = os.urandom(100 * 1024)
@@ -50,3 +113,59 @@ def test_stream():
     plaintext = stream_decrypt(key, ciphertext)
     assert len(data) == len(plaintext)
     assert data == plaintext
+
+
+def test_read_chunks():
+    assert list(read_chunks(io.BytesIO(b""), 4)) == []
+    assert list(read_chunks(io.BytesIO(b"123"), 4)) == [(b"123", True)]
+    assert list(read_chunks(io.BytesIO(b"1234"), 4)) == [(b"1234", True)]
+    assert list(read_chunks(io.BytesIO(b"123456789"), 4)) == [
+        (b"1234", False),
+        (b"5678", False),
+        (b"9", True),
+    ]
+
+
+def test_read_chunks_pooled():
+    data = os.urandom(2 * CIPHERTEXT_BLOCK_SIZE + 1)
+    expected = list(read_chunks(io.BytesIO(data)))
+
+    # the chunks are only valid until the next one is read
+    chunks = [(bytes(chunk), last) for chunk, last in read_chunks_pooled(io.BytesIO(data))]
+    assert chunks == expected
+    assert list(read_chunks_pooled(io.BytesIO(b""))) == []
+
+    idle = len(CIPHERTEXT_BUFFERS)
+    for _ in read_chunks_pooled(io.BytesIO(data)):
+        assert len(CIPHERTEXT_BUFFERS) == max(idle - 2, 0)
+    assert len(CIPHERTEXT_BUFFERS) >= 2
+
+
+def test_stream_parallel():
+    key = os.urandom(32)
+    data = os.urandom(10 * 64 * 1024 + 123)
+
+    ciphertext = stream_encrypt(key, data, workers=4)
+    assert ciphertext == stream_encrypt(key, data)
+    assert stream_decrypt(key, ciphertext, workers=4) == data
+    assert stream_decrypt(key, ciphertext) == data
+
+
+def test_stream_into():
+    key = os.urandom(32)
+    data = os.urandom(3 * PLAINTEXT_BLOCK_SIZE + 10)
+
+    ciphertext = bytearray(ciphertext_size(len(data)) + 5)
+    assert stream_encrypt_into(key, data, ciphertext) == ciphertext_size(len(data))
+    assert ciphertext[-5:] == bytes(5)
+
+    plaintext = bytearray(len(data))
+    assert stream_decrypt_into(key, memoryview(ciphertext)[:-5], plaintext, workers=2) == len(data)
+    assert plaintext == data
+
+    with raises(ValueError):
+        stream_encrypt_into(key, data, bytearray(len(data)))
+    with raises(ValueError):
+        stream_decrypt_into(key, ciphertext[:-5], bytearray(len(data) - 1))
+    with raises(TypeError):
+        stream_decrypt_into(key, ciphertext[:-5], bytes(len(data)))
@@ -1,4 +1,5 @@
 import base64
+import binascii
 import io
 import re
 import typing
@@ -9,6 +10,9 @@ END_RE = re.compile(r"^-----END ([^-]*)-----\n?$")
 PEM_LINE_LENGTH = 64
 AGE_PEM_LABEL = "AGE ENCRYPTED FILE"
 
+ENCODE_BLOCK_SIZE = 48 * 1024
+"""Bytes base64-encoded at a time by :class:`AsciiArmoredOutput`, a multiple of 48 (one line)"""
+
 
 def _is_valid_label(label: str) -> bool:
     if label.upper() != label:
@@ -80,24 +84,72 @@ def write_ascii_armored(file: typing.TextIO, label: str, data: bytes) -> None:
     file.write(f"-----END {label}-----\n")
 
 
+def _encode_lines(data) -> bytes:
+    """Base64-encode ``data`` into lines of :data:`PEM_LINE_LENGTH` characters
+
+    If the length of ``data`` is a multiple of 48, all lines are full.
+    """
+    encoded = binascii.b2a_base64(data, newline=False)
+    lines = [encoded[i : i + PEM_LINE_LENGTH] for i in range(0, len(encoded), PEM_LINE_LENGTH)]
+    lines.append(b"")
+    return b"\n".join(lines)
+
+
 class AsciiArmoredOutput(io.RawIOBase, typing.BinaryIO):
+    """Write data ASCII-armored to ``stream``
+
+    Data is base64-encoded in blocks of :data:`ENCODE_BLOCK_SIZE` bytes as it is written, so at
+    most one block is held in memory. The end marker is written on :meth:`close`.
+
+    :param label: Label of the armored section
+    :param stream: Binary output stream
+    :raises ValueError: if ``label`` is not a valid label
+    """
+
     def __init__(self, label: str, stream: typing.BinaryIO):
+        if not _is_valid_label(label):
+            raise ValueError(f"invalid label: {label}")
+
         self._stream: typing.BinaryIO = stream
-        self._text_stream: typing.TextIO = io.TextIOWrapper(stream, "utf-8")
-        self._plaintext_buffer: bytes = b""
+        self._buffer: bytearray = bytearray()
         self._label: str = label
 
+        self._stream.write(f"-----BEGIN {label}-----\n".encode("ascii"))
+
     def writable(self):
         return True
 
     def write(self, data):
-        self._plaintext_buffer += data
-        return len(data)
+        view = memoryview(data).cast("B")
+        size = len(view)
+
+        if self._buffer:
+            n = min(ENCODE_BLOCK_SIZE - len(self._buffer), len(view))
+            self._buffer += view[:n]
+            view = view[n:]
+            if len(self._buffer) < ENCODE_BLOCK_SIZE:
+                return size
+
+            self._stream.write(_encode_lines(self._buffer))
+            self._buffer.clear()
+
+        # whole blocks are encoded without copying them to the buffer first
+        whole = len(view) - len(view) % ENCODE_BLOCK_SIZE
+        for offset in range(0, whole, ENCODE_BLOCK_SIZE):
+            self._stream.write(_encode_lines(view[offset : offset + ENCODE_BLOCK_SIZE]))
+
+        self._buffer += view[whole:]
+        return size
 
     def close(self):
         if not self.closed:
-            self._encode_buffer()
-            super().close()
+            try:
+                self._stream.write(_encode_lines(self._buffer))
+                self._buffer.clear()
+                self._stream.write(f"-----END {self._label}-----\n".encode("ascii"))
+                self._stream.flush()
+            finally:
+                super().close()
 
     def read(self, n):
         # Needed to implement typing.BinaryIO
@@ -111,10 +163,6 @@ class AsciiArmoredOutput(io.RawIOBase, typing.BinaryIO):
         # Needed to implement typing.BinaryIO
         raise NotImplementedError()
 
-    def _encode_buffer(self):
-        write_ascii_armored(self._text_stream, self._label, self._plaintext_buffer)
-        self._plaintext_buffer = b""
-
 
 class AsciiArmoredInput(io.RawIOBase, typing.BinaryIO):
     def __init__(self, label: str, stream: typing.BinaryIO):
@@ -132,6 +180,10 @@ class AsciiArmoredInput(io.RawIOBase, typing.BinaryIO):
         assert self._plaintext_stream is not None
         return self._plaintext_stream.read(size)
 
+    def readinto(self, buffer):
+        assert self._plaintext_stream is not None
+        return self._plaintext_stream.readinto(buffer)
+
     def write(self, data):
         # Needed to implement typing.BinaryIO
         raise NotImplementedError()
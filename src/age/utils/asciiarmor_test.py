@@ -3,7 +3,12 @@ import os
 
 import pytest
 
-from age.utils.asciiarmor import read_ascii_armored, write_ascii_armored
+from age.utils.asciiarmor import (
+    ENCODE_BLOCK_SIZE,
+    AsciiArmoredOutput,
+    read_ascii_armored,
+    write_ascii_armored,
+)
 
 TEST_DOCUMENT = """
 This is just some garbage...
@@ -49,6 +54,34 @@ def test_roundtrip():
         assert gotdata == data
 
 
+@pytest.mark.parametrize(
+    "size", [0, 1, 47, 48, 49, ENCODE_BLOCK_SIZE - 1, ENCODE_BLOCK_SIZE, 3 * ENCODE_BLOCK_SIZE + 5]
+)
+@pytest.mark.parametrize("write_size", [1, 1000, 65552, 4 * ENCODE_BLOCK_SIZE])
+def test_streaming_output(size, write_size):
+    if write_size == 1 and size > ENCODE_BLOCK_SIZE:
+        pytest.skip("too slow")
+
+    data = os.urandom(size)
+
+    expected = io.StringIO()
+    write_ascii_armored(expected, "TEST DATA", data)
+
+    stream = io.BytesIO()
+    output = AsciiArmoredOutput("TEST DATA", stream)
+    for i in range(0, size, write_size):
+        assert output.write(data[i : i + write_size]) == len(data[i : i + write_size])
+    output.close()
+
+    assert stream.getvalue() == expected.getvalue().encode("ascii")
+    assert not stream.closed
+
+
+def test_streaming_output_invalid_label():
+    with pytest.raises(ValueError):
+        AsciiArmoredOutput("test data", io.BytesIO())
+
+
 def test_invalid():
     with pytest.raises(ValueError):
         for _ in read_ascii_armored(
@@ -0,0 +1,80 @@
+import contextlib
+import threading
+import typing
+
+__all__ = ["BufferPool"]
+
+
+class BufferPool:
+    """Thread-safe pool of reusable, equally sized buffers
+
+    :meth:`acquire` hands out a pooled buffer if one is available (a hit) and allocates a new one
+    otherwise (a miss). Buffers given back with :meth:`release` are kept for reuse, unless the pool
+    already holds ``max_buffers`` buffers, in which case the buffer is dropped (an eviction).
+
+    Buffers are zeroed when they are released, so that no plaintext is kept in idle buffers.
+
+    :param size: Size of every buffer in bytes
+    :param max_buffers: Maximum number of idle buffers kept in the pool
+    """
+
+    def __init__(self, size: int, max_buffers: int = 32):
+        if size < 1 or max_buffers < 0:
+            raise ValueError("size must be positive and max_buffers must not be negative")
+
+        self.size: int = size
+        self.max_buffers: int = max_buffers
+
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+
+        self._lock = threading.Lock()
+        self._buffers: typing.List[bytearray] = []
+        self._zeros: bytes = bytes(size)
+
+    def __len__(self) -> int:
+        """Number of idle buffers in the pool"""
+        return len(self._buffers)
+
+    def acquire(self) -> bytearray:
+        """Take a buffer of :attr:`size` bytes from the pool, allocating it if the pool is empty"""
+        with self._lock:
+            if self._buffers:
+                self.hits += 1
+                return self._buffers.pop()
+            self.misses += 1
+
+        return bytearray(self.size)
+
+    def release(self, buffer: bytearray) -> None:
+        """Zero ``buffer`` and give it back to the pool
+
+        The buffer must not be used by the caller afterwards.
+
+        :raises ValueError: if ``buffer`` was not created by this pool
+        """
+        if len(buffer) != self.size:
+            raise ValueError(f"buffer size {len(buffer)} does not match pool size {self.size}")
+
+        buffer[:] = self._zeros
+        with self._lock:
+            if len(self._buffers) < self.max_buffers:
+                self._buffers.append(buffer)
+            else:
+                self.evictions += 1
+
+    @contextlib.contextmanager
+    def buffer(self) -> typing.Iterator[bytearray]:
+        """Context manager acquiring a buffer and releasing it on exit"""
+        buffer = self.acquire()
+        try:
+            yield buffer
+        finally:
+            self.release(buffer)
+
+    def clear(self) -> None:
+        """Drop all idle buffers and reset the counters"""
+        with self._lock:
+            self._buffers.clear()
+            self.hits = self.misses = self.evictions = 0
@@ -0,0 +1,66 @@
+import threading
+
+from pytest import raises
+
+from age.utils.bufferpool import BufferPool
+
+
+def test_reuse():
+    pool = BufferPool(16, max_buffers=1)
+
+    buffer = pool.acquire()
+    assert len(buffer) == 16
+    pool.release(buffer)
+    assert pool.acquire() is buffer
+
+    assert (pool.hits, pool.misses, pool.evictions) == (1, 1, 0)
+
+
+def test_zeroed():
+    pool = BufferPool(16)
+
+    buffer = pool.acquire()
+    buffer[:] = b"secret plaintext"
+    pool.release(buffer)
+    assert buffer == bytes(16)
+
+
+def test_eviction():
+    pool = BufferPool(16, max_buffers=2)
+
+    buffers = [pool.acquire() for _ in range(3)]
+    for buffer in buffers:
+        pool.release(buffer)
+
+    assert len(pool) == 2
+    assert (pool.hits, pool.misses, pool.evictions) == (0, 3, 1)
+
+    pool.clear()
+    assert len(pool) == 0
+    assert (pool.hits, pool.misses, pool.evictions) == (0, 0, 0)
+
+
+def test_invalid():
+    with raises(ValueError):
+        BufferPool(0)
+
+    with raises(ValueError):
+        BufferPool(16).release(bytearray(8))
+
+
+def test_threads():
+    pool = BufferPool(16, max_buffers=4)
+
+    def work():
+        for _ in range(1000):
+            with pool.buffer() as buffer:
+                assert len(buffer) == 16
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert pool.hits + pool.misses == 4000
+    assert pool.misses - pool.evictions == len(pool) <= 4
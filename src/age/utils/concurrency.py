@@ -0,0 +1,110 @@
+import collections
+import concurrent.futures
+import os
+import typing
+
+__all__ = ["OrderedExecutor", "default_workers"]
+
+T = typing.TypeVar("T")
+
+
+def default_workers() -> int:
+    """Number of worker threads to use if none is given (the number of CPUs)"""
+    return os.cpu_count() or 1
+
+
+class OrderedExecutor:
+    """Run tasks on a thread pool and collect their results in submission order
+
+    At most ``window`` tasks are in flight at any time: :meth:`submit` blocks until the oldest
+    task has finished if the window is full, so memory usage stays bounded no matter how many
+    tasks are submitted.
+
+    As soon as any task in flight fails, all other pending tasks are cancelled and the exception
+    is raised, even if older tasks are still running.
+
+    :param workers: Number of worker threads (defaults to the number of CPUs)
+    :param window: Maximum number of tasks in flight (defaults to twice the number of workers)
+    """
+
+    def __init__(self, workers: typing.Optional[int] = None, window: typing.Optional[int] = None):
+        if workers is None:
+            workers = default_workers()
+        if window is None:
+            window = 2 * workers
+        if workers < 1 or window < 1:
+            raise ValueError("workers and window must be positive")
+
+        self.workers: int = workers
+        self.window: int = window
+
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+        self._pending: typing.Deque[concurrent.futures.Future] = collections.deque()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown(cancel=exc_type is not None)
+
+    def submit(self, fn: typing.Callable[..., T], *args) -> typing.List[T]:
+        """Schedule ``fn(*args)``
+
+        :returns: Results of the oldest tasks that had to be completed to make room in the window
+        """
+        results: typing.List[T] = []
+        while len(self._pending) >= self.window:
+            results.append(self._pop())
+
+        self._pending.append(self._executor.submit(fn, *args))
+        return results
+
+    def drain(self) -> typing.List[typing.Any]:
+        """Wait for all submitted tasks
+
+        :returns: Results of all outstanding tasks, in submission order
+        """
+        results: typing.List[typing.Any] = []
+        while self._pending:
+            results.append(self._pop())
+        return results
+
+    def map(self, fn: typing.Callable[..., T], iterable: typing.Iterable) -> typing.Iterator[T]:
+        """Like :func:`map`, but with ``fn`` running on the worker threads"""
+        for item in iterable:
+            yield from self.submit(fn, item)
+        yield from self.drain()
+
+    def cancel(self) -> None:
+        """Cancel all tasks which have not started yet and forget about all outstanding tasks"""
+        for future in self._pending:
+            future.cancel()
+        self._pending.clear()
+
+    def shutdown(self, cancel: bool = False) -> None:
+        """Shut down the worker threads
+
+        :param cancel: Cancel tasks which have not started yet instead of waiting for them
+        """
+        if cancel:
+            self.cancel()
+        self._pending.clear()
+        self._executor.shutdown(wait=True)
+
+    def _pop(self) -> typing.Any:
+        oldest = self._pending[0]
+        while not oldest.done():
+            running = [future for future in self._pending if not future.done()]
+            concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+            self._raise_failure()
+
+        self._raise_failure()
+        return self._pending.popleft().result()
+
+    def _raise_failure(self) -> None:
+        for future in self._pending:
+            if future.done() and not future.cancelled():
+                exception = future.exception()
+                if exception is not None:
+                    self.cancel()
+                    raise exception
@@ -0,0 +1,77 @@
+import threading
+import time
+
+from pytest import raises
+
+from age.utils.concurrency import OrderedExecutor
+
+
+def test_map_order():
+    def work(i):
+        # later tasks finish first
+        time.sleep((10 - i) * 0.001)
+        return i * i
+
+    with OrderedExecutor(workers=4) as executor:
+        assert list(executor.map(work, range(10))) == [i * i for i in range(10)]
+
+
+def test_window():
+    in_flight = 0
+    max_in_flight = 0
+    lock = threading.Lock()
+
+    def work(i):
+        nonlocal in_flight, max_in_flight
+        with lock:
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+        time.sleep(0.001)
+        with lock:
+            in_flight -= 1
+        return i
+
+    with OrderedExecutor(workers=8, window=3) as executor:
+        results = []
+        for i in range(20):
+            results.extend(executor.submit(work, i))
+            assert len(executor._pending) <= 3
+        results.extend(executor.drain())
+
+    assert results == list(range(20))
+    assert max_in_flight <= 3
+
+
+def test_invalid_arguments():
+    with raises(ValueError):
+        OrderedExecutor(workers=0)
+    with raises(ValueError):
+        OrderedExecutor(workers=1, window=0)
+
+
+def test_fail_fast():
+    release = threading.Event()
+    started = []
+
+    def work(i):
+        started.append(i)
+        if i == 0:
+            # the oldest task blocks until the failure has been reported
+            release.wait(5)
+        elif i == 1:
+            raise KeyError(i)
+        return i
+
+    executor = OrderedExecutor(workers=2, window=4)
+    try:
+        with raises(KeyError):
+            for i in range(10):
+                executor.submit(work, i)
+            executor.drain()
+        assert not release.is_set()
+        assert not executor._pending
+    finally:
+        release.set()
+        executor.shutdown()
+
+    assert 9 not in started